@@ -0,0 +1,348 @@
+#!/bin/python3
+
+"""
+About this Script
+
+Differential harness for optimized answer-parsing code. The reference implementations of
+derive_answers, cleanup_values, parse_nominations, and parse_race (wellping/answers.py) and
+any alternative engine run over the same exports, synthetic and recorded; the aggregates are
+compared cell by cell (column order, row order, and dtypes normalized away) and each engine's
+timings are reported next to any divergences
+
+An engine is a module (dotted name or path to a .py file) defining any of those four
+functions with the same signatures; whatever it leaves out falls back to the reference.
+With no engine the reference runs against itself, which checks the harness is deterministic
+
+NOTE: run the following at the command line
+`python3 benchmarks/equivalence.py --engine fast_answers.py [ recorded_export.json ... ]`
+
+Exits 1 when any engine diverges from the reference
+
+Ian Ferguson | Stanford University
+"""
+
+# ----------- Imports
+import io, os, sys, math, pathlib, argparse, importlib, importlib.util
+from contextlib import contextmanager
+from time import perf_counter
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+from wellping import jsonio, answers, typed, pipeline, get_profile, concat_categorical, validate_participant, PROFILES
+from synthetic import synthetic_export
+
+
+# ----------- Definitions
+ENGINE_FUNCTIONS = ["derive_answers", "cleanup_values", "parse_nominations", "parse_race"]
+
+# Stages timed per engine (cleanup_values runs per cell, inside derive_answers)
+TIMED_STAGES = ["derive_answers", "parse_race", "parse_nominations"]
+
+ROW_KEYS = ["username", "login-node", "id"]
+MAX_EXAMPLES = 5
+
+
+def load_engine(SPEC):
+    """
+    SPEC => Dotted module name, or path to a .py file
+
+    Returns tuple of (label, dictionary of function name => replacement)
+    """
+
+    if os.path.isfile(SPEC):
+        label = pathlib.Path(SPEC).stem
+        spec = importlib.util.spec_from_file_location(f"engine_{label}", SPEC)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    else:
+        label = SPEC
+        module = importlib.import_module(SPEC)
+
+    functions = {x: getattr(module, x) for x in ENGINE_FUNCTIONS if hasattr(module, x)}
+
+    if not functions:
+        raise ValueError(f"{SPEC} defines none of {', '.join(ENGINE_FUNCTIONS)}")
+
+    return label, functions
+
+
+@contextmanager
+def swap_engine(FUNCTIONS, TIMINGS=None):
+    """
+    FUNCTIONS => Dictionary of function name => replacement
+    TIMINGS => Optional dictionary, accumulates seconds per TIMED_STAGES entry
+
+    Every module that bound the reference by name sees the replacement until exit
+    """
+
+    references = {x: getattr(answers, x) for x in ENGINE_FUNCTIONS}
+    originals = []
+
+    for module in (answers, typed, pipeline):
+        for name in ENGINE_FUNCTIONS:
+            if not hasattr(module, name):
+                continue
+
+            replacement = FUNCTIONS.get(name, references[name])
+
+            if TIMINGS is not None and name in TIMED_STAGES and module is pipeline:
+                replacement = timed(replacement, name, TIMINGS)
+
+            originals.append((module, name, getattr(module, name)))
+            setattr(module, name, replacement)
+
+    try:
+        yield
+    finally:
+        for module, name, original in reversed(originals):
+            setattr(module, name, original)
+
+
+def timed(FUNC, NAME, TIMINGS):
+    """
+    Returns FUNC, adding its wall time to TIMINGS[NAME] on every call
+    """
+
+    def wrapper(*args, **kwargs):
+        start = perf_counter()
+
+        try:
+            return FUNC(*args, **kwargs)
+        finally:
+            TIMINGS[NAME] = TIMINGS.get(NAME, 0.0) + perf_counter() - start
+
+    return wrapper
+
+
+def run_engine(DATA, FUNCTIONS, PROFILE, TYPED=False):
+    """
+    DATA => Decoded export (dictionary of key => participant)
+    FUNCTIONS => Dictionary of function name => replacement ({} => reference)
+    PROFILE => StudyProfile object
+    TYPED => Boolean, typed answer columns (see typed.py)
+
+    The same per-participant path as run_study, in memory (nothing written)
+    Returns tuple of (aggregate DataFrame, error log text, dictionary of timings)
+    """
+
+    log, frames, timings = io.StringIO(), [], {}
+
+    with swap_engine(FUNCTIONS, timings):
+        start = perf_counter()
+
+        for key, subset in DATA.items():
+            if validate_participant(subset) or not subset['answers']:
+                continue
+
+            try:
+                frames.append(pipeline.parse_responses(key, subset, log, None, False, PROFILE, TYPED))
+            except Exception as e:
+                log.write(f"\nCaught @ {key.split('-')[0]}: {e}\n\n")
+
+        timings["total"] = perf_counter() - start
+
+    return concat_categorical(frames) if frames else pd.DataFrame(columns=ROW_KEYS), log.getvalue(), timings
+
+
+def normal_cell(x):
+    """
+    Returns one cell as a comparable string ... missing values are empty, 3.0 and 3 agree
+    """
+
+    if x is None or x is pd.NA or x is pd.NaT or (isinstance(x, float) and math.isnan(x)):
+        return ""
+
+    if isinstance(x, (bool, np.bool_)):
+        return str(bool(x))
+
+    if isinstance(x, (float, np.floating)) and float(x).is_integer():
+        return str(int(x))
+
+    return str(x)
+
+
+def normalize(DF):
+    """
+    DF => Aggregate DataFrame
+
+    Returns DataFrame of strings, columns sorted, rows sorted by ROW_KEYS
+    """
+
+    frame = DF.reindex(sorted(DF.columns), axis=1).astype(object)
+    frame = frame.apply(lambda column: column.map(normal_cell))
+
+    keys = [x for x in ROW_KEYS if x in frame.columns]
+
+    return frame.sort_values(keys, kind="stable").reset_index(drop=True) if keys else frame
+
+
+def compare_aggregates(REFERENCE, CANDIDATE):
+    """
+    REFERENCE => Aggregate from the reference implementations
+    CANDIDATE => Aggregate from the engine under test
+
+    Returns dictionary of column / row / cell differences (empty lists and zeros when equivalent)
+    """
+
+    reference, candidate = normalize(REFERENCE), normalize(CANDIDATE)
+
+    report = {"missing_columns": sorted(set(reference.columns) - set(candidate.columns)),
+              "extra_columns": sorted(set(candidate.columns) - set(reference.columns)),
+              "dtype_changes": {x: [str(REFERENCE[x].dtype), str(CANDIDATE[x].dtype)]
+                                for x in sorted(set(REFERENCE.columns) & set(CANDIDATE.columns))
+                                if REFERENCE[x].dtype != CANDIDATE[x].dtype},
+              "rows": [len(reference), len(candidate)],
+              "cells": 0,
+              "columns": {},
+              "examples": []}
+
+    if len(reference) != len(candidate):
+        return report
+
+    shared = [x for x in reference.columns if x in candidate.columns]
+    differs = reference[shared].ne(candidate[shared])
+
+    report["cells"] = int(differs.to_numpy().sum())
+    report["columns"] = {x: int(y) for x, y in differs.sum().items() if y}
+
+    for row, column in zip(*np.nonzero(differs.to_numpy())):
+        if len(report["examples"]) >= MAX_EXAMPLES:
+            break
+
+        column = shared[column]
+        report["examples"].append({"row": {x: reference.at[row, x] for x in ROW_KEYS if x in reference.columns},
+                                   "column": column,
+                                   "reference": reference.at[row, column],
+                                   "candidate": candidate.at[row, column]})
+
+    return report
+
+
+def diverges(REPORT):
+    """
+    Returns True when a comparison found anything other than dtype changes
+    """
+
+    return bool(REPORT["missing_columns"] or REPORT["extra_columns"] or REPORT["cells"]
+                or REPORT["rows"][0] != REPORT["rows"][1])
+
+
+def check_export(NAME, DATA, ENGINES, PROFILE, TYPED=False):
+    """
+    NAME => Label for the export
+    DATA => Decoded export
+    ENGINES => List of (label, functions) from load_engine
+    PROFILE => StudyProfile object
+    TYPED => Boolean, typed answer columns
+
+    Returns list of result dictionaries, one per engine
+    """
+
+    reference, reference_log, reference_times = run_engine(DATA, {}, PROFILE, TYPED)
+    results = []
+
+    print(f"\n{NAME}: {len(DATA)} participants, {len(reference)} pings\n")
+    print(f"  {'reference':<20} {reference_times['total']:8.3f}s   " +
+          "   ".join(f"{x} {reference_times.get(x, 0):.3f}s" for x in TIMED_STAGES))
+
+    for label, functions in ENGINES or [("reference (again)", {})]:
+        aggregate, log, times = run_engine(DATA, functions, PROFILE, TYPED)
+        report = compare_aggregates(reference, aggregate)
+
+        report.update({"export": NAME,
+                       "engine": label,
+                       "log_differs": log != reference_log,
+                       "seconds": {x: [reference_times.get(x, 0.0), times.get(x, 0.0)]
+                                   for x in ["total"] + TIMED_STAGES}})
+        results.append(report)
+
+        speedup = reference_times["total"] / max(times["total"], 1e-9)
+        status = "DIVERGES" if diverges(report) else "equivalent"
+
+        print(f"  {label:<20} {times['total']:8.3f}s   x{speedup:.2f}   {status}" +
+              ("   (error log differs)" if report["log_differs"] else ""))
+
+        for stage in TIMED_STAGES:
+            before, after = report["seconds"][stage]
+            print(f"      {stage:<18} {before:7.3f}s => {after:7.3f}s")
+
+        for column, dtypes in report["dtype_changes"].items():
+            print(f"      dtype {column}: {dtypes[0]} => {dtypes[1]}")
+
+        if report["missing_columns"] or report["extra_columns"]:
+            print(f"      missing columns {report['missing_columns']}, extra columns {report['extra_columns']}")
+
+        if report["rows"][0] != report["rows"][1]:
+            print(f"      rows {report['rows'][0]} => {report['rows'][1]}")
+
+        if report["cells"]:
+            print(f"      {report['cells']} cells differ: " +
+                  ", ".join(f"{x} ({y})" for x, y in report["columns"].items()))
+
+        for example in report["examples"]:
+            print(f"        {example['row']} {example['column']}: "
+                  f"{example['reference']!r} => {example['candidate']!r}")
+
+    return results
+
+
+def parse_args():
+    """
+    Returns argparse Namespace of command line options
+    """
+
+    cli = argparse.ArgumentParser(description="Checks alternative answer-parsing engines against the reference")
+
+    cli.add_argument("exports", nargs="*",
+                     help="Recorded Wellping exports to check (in addition to the synthetic ones)")
+
+    cli.add_argument("--engine", action="append", default=[],
+                     help=f"Module or .py file defining any of {', '.join(ENGINE_FUNCTIONS)} (repeatable)")
+
+    cli.add_argument("--synthetic", default="300",
+                     help="Comma-separated synthetic export sizes (empty for none)")
+
+    cli.add_argument("--seed", type=int, default=0,
+                     help="Random seed for the synthetic exports")
+
+    cli.add_argument("--profile", choices=list(PROFILES), default="scp-2021",
+                     help="Study profile (nomination / multi-select columns)")
+
+    cli.add_argument("--typed", action="store_true",
+                     help="Compare typed answers instead of cleaned strings")
+
+    cli.add_argument("--report", default=None,
+                     help="Save every comparison as JSON here")
+
+    return cli.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    engines = [load_engine(x) for x in args.engine]
+    profile = get_profile(args.profile)
+    results = []
+
+    for size in [int(x) for x in args.synthetic.split(",") if x.strip()]:
+        results += check_export(f"synthetic-{size}", synthetic_export(size, args.seed), engines, profile, args.typed)
+
+    for export in args.exports:
+        with open(export, "rb") as incoming:
+            data = jsonio.load(incoming)
+
+        results += check_export(os.path.basename(export), data, engines, profile, args.typed)
+
+    if args.report:
+        with open(args.report, "wb") as outgoing:
+            jsonio.dump(results, outgoing, INDENT=2)
+
+    failed = [x for x in results if diverges(x)]
+    print(f"\n{len(results) - len(failed)} of {len(results)} comparisons equivalent\n")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
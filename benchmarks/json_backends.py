@@ -0,0 +1,92 @@
+#!/bin/python3
+
+"""
+About this Script
+
+Benchmarks every installed JSON backend (see wellping/jsonio.py) against the standard library
+on synthetic exports, and checks that each one decodes to the same data and
+encodes to the same bytes once whitespace is removed
+
+NOTE: run the following at the command line `python3 benchmarks/json_backends.py`
+
+Ian Ferguson | Stanford University
+"""
+
+# ----------- Imports
+import os, sys, pathlib, tempfile
+from time import perf_counter
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+from wellping import jsonio
+from synthetic import synthetic_export
+
+
+# ----------- Definitions
+def available_backends():
+    """
+    Returns list of installed backends (stdlib first)
+    """
+
+    keepers = ["stdlib"]
+
+    for backend in ["orjson", "simdjson"]:
+        try:
+            jsonio.resolve_backend(backend)
+            keepers.append(backend)
+        except ImportError:
+            continue
+
+    return keepers
+
+
+def best_of(FUNC, REPEAT=3):
+    """
+    Returns best wall time of FUNC in seconds
+    """
+
+    times = []
+
+    for _ in range(REPEAT):
+        start = perf_counter()
+        FUNC()
+        times.append(perf_counter() - start)
+
+    return min(times)
+
+
+def main(SIZES=(500, 2000)):
+    for size in SIZES:
+        with tempfile.TemporaryDirectory() as tmp:
+            export_path = os.path.join(tmp, "export.json")
+
+            with open(export_path, "wb") as outgoing:
+                jsonio.dump(synthetic_export(size), outgoing, "stdlib")
+
+            megabytes = os.path.getsize(export_path) / 1e6
+            print(f"\n{size} participants ({megabytes:.1f} MB)")
+
+            with open(export_path, "rb") as incoming:
+                raw = incoming.read()
+
+            reference = jsonio.loads(raw, "stdlib")
+            reference_bytes = jsonio.dumps(reference, "stdlib")
+            baseline = None
+
+            for backend in available_backends():
+                decoded = jsonio.loads(raw, backend)
+                encoded = jsonio.dumps(decoded, backend)
+
+                # Same data in, same bytes out (compact output has no whitespace to differ)
+                assert decoded == reference, f"{backend} decoded different data"
+                assert encoded == reference_bytes, f"{backend} encoded different bytes"
+
+                decode = best_of(lambda: jsonio.loads(raw, backend))
+                encode = best_of(lambda: jsonio.dumps(decoded, backend, INDENT=4))
+                baseline = baseline or decode + encode
+
+                print(f"  {backend:<9} decode {decode:7.3f}s   encode {encode:7.3f}s   "
+                      f"speedup x{baseline / (decode + encode):.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+#!/bin/python3
+
+"""
+About this Script
+
+Generates synthetic Wellping exports with the same shape as the real thing, so parser
+changes can be benchmarked and checked without participant data. Includes
+repeated logins, non-responders, PNA answers, multi-select and nomination questions,
+and non-ASCII names
+
+NOTE: run the following at the command line `python3 synthetic.py { n_participants } { output.json }`
+
+Ian Ferguson | Stanford University
+"""
+
+# ----------- Imports
+import sys, json, random
+from datetime import datetime, timedelta, timezone
+
+
+# ----------- Definitions
+NAMES = ["Alice Smith", "Bob Jones", "Carla Díaz", "Dan O'Neil", "Eve Park",
+         "Femi Adeyemi", "Gus Lee", "Hana Kim", "Iñigo Ruiz", "Jo Chen"]
+
+RACES = ["White", "Asian", "Black", "Hispanic", "Native American", "Other"]
+
+STREAMS = ["modalStream", "dailyStream", "weeklyStream"]
+
+
+def synthetic_participant(USERNAME, N_PINGS, RNG, RESPONDER=True):
+    """
+    USERNAME => Participant username
+    N_PINGS => Number of scheduled pings
+    RNG => random.Random instance
+    RESPONDER => Boolean, if False the participant answers nothing
+
+    Returns dictionary shaped like one participant of a Wellping export
+    """
+
+    start = datetime(2023, 7, 1, 9, tzinfo=timezone.utc)
+    pings, answers = [], []
+
+    for ix in range(N_PINGS):
+        stream = RNG.choice(STREAMS)
+        ping_id = f"{stream}{ix}"
+        notified = start + timedelta(hours=6 * ix, minutes=RNG.randint(0, 30))
+        started = notified + timedelta(minutes=RNG.randint(0, 45))
+        ended = started + timedelta(minutes=RNG.randint(1, 8))
+
+        pings.append({"id": ping_id,
+                      "streamName": stream,
+                      "notificationTime": notified.isoformat(),
+                      "startTime": started.isoformat(),
+                      "endTime": ended.isoformat(),
+                      "tzOffset": 420,
+                      "startedWithNotification": RNG.random() < 0.8})
+
+        # Roughly a quarter of scheduled pings go unanswered
+        if not RESPONDER or RNG.random() < 0.25:
+            continue
+
+        stamp = started
+
+        def answer(question, value, pna=False):
+            nonlocal stamp
+            stamp += timedelta(seconds=RNG.randint(2, 20))
+            answers.append({"pingId": ping_id,
+                            "questionId": question,
+                            "date": stamp.isoformat(),
+                            "preferNotToAnswer": pna,
+                            "data": value})
+
+        answer("Stressed", {"value": RNG.randint(0, 100)})
+        answer("Happy", {"value": RNG.randint(0, 100)}, pna=RNG.random() < 0.05)
+        answer("Social", {"value": RNG.choice([True, False])})
+        answer("SU_Nom", {"value": RNG.sample(NAMES, RNG.randint(1, 6))})
+
+        if RNG.random() < 0.5:
+            answer("NSU_Rel", {"value": RNG.sample(NAMES, RNG.randint(1, 3))})
+
+        if RNG.random() < 0.2:
+            answer("SU_Nom_None_Nom", {"value": RNG.sample(NAMES, 1)})
+
+        if stream == "weeklyStream":
+            answer("Race", {"value": [[race, RNG.random() < 0.3] for race in RACES]})
+            answer("SU_Most_Meaningful", {"value": [RNG.choice(NAMES)]})
+            answer("ladderUS", {"value": [RNG.randint(1, 10)]})
+            answer("Comment", {"value": "all good, thanks"})
+
+    return {"pings": pings,
+            "answers": answers,
+            "user": {"username": USERNAME,
+                     "installation": {"id": f"{USERNAME}-install",
+                                      "device": {"brand": RNG.choice(["Apple", "Samsung"]),
+                                                 "manufacturer": "Apple",
+                                                 "modelName": RNG.choice(["iPhone 12", "iPhone 13"]),
+                                                 "osName": "iOS",
+                                                 "osVersion": RNG.choice(["16.5", "16.6"])},
+                                      "app": {"version": "1.4.0", "nativeBuildVersion": "33"}}}}
+
+
+def synthetic_export(N_PARTICIPANTS, SEED=0, MAX_PINGS=40):
+    """
+    N_PARTICIPANTS => Number of top-level participant keys
+    SEED => Random seed
+    MAX_PINGS => Upper bound on scheduled pings per participant
+
+    About 1 in 20 participants logs in twice (same username, new key)
+    and about 1 in 10 never answers anything
+    Returns dictionary shaped like a Wellping export
+    """
+
+    rng = random.Random(SEED)
+    export = {}
+
+    for ix in range(N_PARTICIPANTS):
+        login_time = 1688000000000 + ix * 1000
+        username = f"scp{ix:05d}"
+
+        # Repeated login => reuse a previous username under a new key
+        if ix > 0 and rng.random() < 0.05:
+            username = f"scp{rng.randrange(ix):05d}"
+
+        export[f"{username}-{login_time}"] = synthetic_participant(username,
+                                                                   rng.randint(2, MAX_PINGS),
+                                                                   rng,
+                                                                   RESPONDER=rng.random() > 0.1)
+
+    return export
+
+
+if __name__ == "__main__":
+    with open(sys.argv[2], "w") as outgoing:
+        json.dump(synthetic_export(int(sys.argv[1])), outgoing)
@@ -3,132 +3,580 @@
 """
 About this Script
 
-This script wraps helper functions defined in `parser.py` and
+This script wraps the `wellping` package and
 is fully-executable from the command line
 
 NOTE: run the following at the command line `python3 ripper.py { target_directory }
 
+Large studies can be parsed with bounded memory via `--chunk-size N`, which flushes
+every N participants to disk and reconciles the aggregate columns at the end
+
+`--progress events.jsonl` writes machine-readable progress (stage, done / remaining, rows/s, RSS, ETA) for schedulers;
+`--progress-format prometheus` rewrites a node-exporter textfile instead
+
+`--compliance` saves per-participant response rates, latency, duration, and streaks in the same pass
+
+`--sample N` / `--participants id1,id2` parse just those participants into `03-Preview` and print the columns found
+
+`--subjects zip` packs every subject-wise CSV into one indexed `00-Subjects/subjects.zip`
+
+Chunked runs checkpoint after every chunk; rerun with `--resume` to pick up where a crashed run stopped
+
+Pings repeated across several logins of one username are merged via `--dedup { first | latest | complete }`
+
+JSON is decoded with orjson or simdjson when installed, see `--json-backend`
+
+Participants with no answers are streamed to `parent-errors.jsonl` as they're found, see `--parent-errors`
+
+Study-specific columns (nominations, multi-select questions) come from `--profile`
+
+Nominees are resolved to roster IDs with `--roster roster.csv` (see `--roster-id-column`, `--roster-name-columns`)
+
+The nomination network (edge list + sparse adjacency per time window) is saved with `--network`
+
+`--format parquet` writes the aggregates as parquet, with repeated strings dictionary-encoded
+
+`--layout long` streams one row per answer (username, login, ping, question, value, date) with no pivot
+
+`--sparse` holds the mostly-empty answers block as sparse codes until it is written, to cut peak memory
+
+`--typed` keeps answers as typed columns (int, float, bool, categorical) instead of strings
+
+`python3 ripper.py watch { target_directory }` keeps running, and parses each export that lands in (or is
+re-exported to) the directory once it's fully written ... outputs are updated in place, no reset.sh needed
+
+`python3 ripper.py diff { target_directory } --previous { old_export.json }` writes only the pings that are new or
+changed since the previous snapshot to 01-Aggregate/delta_{ filename }.csv; the index it saves makes `--previous` optional next time
+
+`python3 ripper.py plan { target_directory }` pre-scans the export, estimates runtime and peak memory, and recommends
+workers and `--chunk-size` for `--memory` / `--cpus`; add `--apply` to run with those settings
+
+`python3 ripper.py serve` keeps exports and parsed tables in memory for repeated questions; ask it with
+`python3 ripper_client.py { participant | aggregate | keys } { target_directory } ...`
+
+Big exports can be split across workers (this machine or several) via the `split` and `merge` commands:
+
+      python3 ripper.py split { target_directory }
+      python3 ripper.py parse { target_directory } --worker 1/4      # ... through 4/4
+      python3 ripper.py merge { target_directory }
+
 Ian Ferguson | Stanford University
 """
 
 # ----- Imports
-import os, sys, json
-from time import sleep
-from tqdm import tqdm
+import os, sys, glob, argparse
+from argparse import Namespace
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
-from parser import setup, sanity_check, isolate_json_file, parse_responses
-from devices import parse_device_info
+from wellping import (setup, isolate_json_file, run_study, merge_workers, diff_study, split_export, assign_keys,
+                      select_keys, describe_schema, aggregate_columns, get_profile, ShardedExport, RosterIndex,
+                      ParseService, watch_exports, serve_exports, PROFILES, DEDUP_POLICIES, PARENT_ERROR_MODES,
+                      OUTPUT_FORMATS, LAYOUTS, SHARD_MODES, MANIFEST_NAME, SUBJECT_CONTAINERS, SUBJECT_ARCHIVE_NAME,
+                      PING_INDEX_NAME, DEFAULT_HOST, DEFAULT_PORT, ProgressReporter, PROGRESS_FORMATS, plan_study,
+                      save_plan, CALIBRATION_SAMPLE)
+from wellping import jsonio
+
+
+COMMANDS = ["parse", "split", "merge", "watch", "diff", "serve", "plan"]
+
+
+# ----- Command Line
+def parse_args(ARGV=None):
+      """
+      ARGV => Optional list of arguments (defaults to sys.argv)
+
+      `python3 ripper.py { target }` with no command still means parse
+      Returns argparse Namespace of command line options
+      """
+
+      argv = sys.argv[1:] if ARGV is None else list(ARGV)
+
+      if not argv or argv[0] not in COMMANDS + ["-h", "--help"]:
+            argv = ["parse"] + argv
+
+      # Options shared by parse and merge
+      shared = argparse.ArgumentParser(add_help=False)
+
+      shared.add_argument("target_path",
+                          help="Relative path to project directory (one JSON file)")
+
+      shared.add_argument("--profile", choices=list(PROFILES), default="scp-2021",
+                          help="Study profile (nomination / multi-select columns)")
+
+      shared.add_argument("--format", choices=OUTPUT_FORMATS, default="csv",
+                          help="File format for the pings and devices aggregates (parquet requires pyarrow)")
+
+      shared.add_argument("--subjects", choices=SUBJECT_CONTAINERS, default="csv",
+                          help="csv => one file per subject; zip => every subject in 00-Subjects/subjects.zip")
+
+      shared.add_argument("--dedup", choices=DEDUP_POLICIES, default=None,
+                          help="Merge pings repeated across logins of one username")
+
+      shared.add_argument("--json-backend", choices=jsonio.BACKENDS, default="auto",
+                          help="JSON decoder / encoder (auto picks the fastest installed)")
+
+      shared.add_argument("--roster", default=None,
+                          help="Roster CSV to match nominees against")
+
+      shared.add_argument("--roster-id-column", default="id",
+                          help="Roster column holding the roster ID")
+
+      shared.add_argument("--roster-name-columns", default="name",
+                          help="Roster column(s) holding the name, comma-separated (e.g., first,last)")
+
+      shared.add_argument("--roster-threshold", type=float, default=0.5,
+                          help="Minimum trigram similarity (0-1) to accept a roster match")
+
+      shared.add_argument("--network", action="store_true",
+                          help="Save nomination edge list and per-window sparse adjacency matrices")
+
+      shared.add_argument("--network-window", default="W",
+                          help="Time window for adjacency matrices (pandas period alias, e.g. D, W, M)")
+
+      # Options shared by parse and watch
+      parse = argparse.ArgumentParser(add_help=False)
+
+      parse.add_argument("--layout", choices=LAYOUTS, default="wide",
+                         help="wide => one row per ping; long => one row per answer, streamed with no pivot")
+
+      parse.add_argument("--typed", action="store_true",
+                         help="Keep answers typed (int, float, bool, categorical) instead of cleaned strings")
+
+      parse.add_argument("--sparse", action="store_true",
+                         help="Hold the answers block as sparse codes until it is written (less memory for multi-stream studies)")
+
+      parse.add_argument("--compliance", action="store_true",
+                         help="Save response rate, latency, duration, and streak metrics per participant")
+
+      parse.add_argument("--chunk-size", type=int, default=None,
+                         help="Flush every N participants to disk to bound memory")
+
+      parse.add_argument("--resume", action="store_true",
+                         help="Pick up an interrupted run from its last checkpoint (implies --chunk-size)")
+
+      parse.add_argument("--progress", default=None,
+                         help="Write progress events (stage, participants done / remaining, rows/s, RSS, ETA) here")
+
+      parse.add_argument("--progress-format", choices=PROGRESS_FORMATS, default="jsonl",
+                         help="jsonl => one event per line (file or FIFO); prometheus => textfile collector gauges")
+
+      parse.add_argument("--progress-interval", type=float, default=1.0,
+                         help="Minimum seconds between progress events")
+
+      parse.add_argument("--parent-errors", choices=PARENT_ERROR_MODES, default="full",
+                         help="Record full data or a summary for participants with no answers")
+
+      parse.add_argument("--sample", type=int, default=None,
+                         help="Preview: parse N participants picked at random (see --seed) into 03-Preview")
+
+      parse.add_argument("--participants", default=None,
+                         help="Preview: parse only these usernames / keys, comma-separated, into 03-Preview")
+
+      parse.add_argument("--seed", type=int, default=0,
+                         help="Random seed for --sample (same seed, same participants)")
+
+      parse.add_argument("--worker", default=None,
+                         help="Parse only this worker's share, e.g. 2/4 (requires `split` first)")
+
+      cli = argparse.ArgumentParser(description="Converts Wellping EMA data from JSON to CSV")
+      commands = cli.add_subparsers(dest="command")
+
+      ###
+
+      commands.add_parser("parse", parents=[shared, parse],
+                          help="Parse the export (default command)")
+
+      ###
+
+      watch = commands.add_parser("watch", parents=[shared, parse],
+                                  help="Parse new or updated exports as they land in the target directory")
+
+      watch.add_argument("--interval", type=float, default=30,
+                         help="Seconds between polls of the target directory")
+
+      watch.add_argument("--settle", type=int, default=2,
+                         help="Polls an export must go unchanged before it counts as fully written")
+
+      watch.add_argument("--once", action="store_true",
+                         help="Exit after the first export is parsed (e.g., from cron)")
+
+      ###
+
+      plan = commands.add_parser("plan", parents=[shared, parse],
+                                 help="Pre-scan the export, estimate runtime + peak memory, recommend workers / chunk size")
+
+      plan.add_argument("--memory", default=None,
+                        help="Memory budget for the whole job, e.g. 16G (defaults to what's available)")
+
+      plan.add_argument("--cpus", type=int, default=None,
+                        help="CPUs for the whole job (defaults to this machine's)")
+
+      plan.add_argument("--calibrate", type=int, default=CALIBRATION_SAMPLE,
+                        help="Participants timed through the pipeline to calibrate the estimates")
+
+      plan.add_argument("--apply", action="store_true",
+                        help="Run with the recommended settings (split + workers + merge when more than one)")
+
+      ###
+
+      split = commands.add_parser("split",
+                                  help="One pass over the export => byte-offset manifest (+ shards)")
+
+      split.add_argument("target_path",
+                         help="Relative path to project directory (one JSON file)")
+
+      split.add_argument("--mode", choices=SHARD_MODES, default="index",
+                         help="index => offsets into the export; shards => one file per participant")
+
+      split.add_argument("--json-backend", choices=jsonio.BACKENDS, default="auto",
+                         help="JSON encoder for the manifest")
+
+      ###
+
+      commands.add_parser("merge", parents=[shared],
+                          help="Combine the outputs of `parse --worker` runs")
+
+      ###
+
+      diff = commands.add_parser("diff",
+                                 help="Only the pings that are new or changed (new or edited answers) since the previous snapshot")
+
+      diff.add_argument("target_path",
+                        help="Relative path to project directory (one JSON file, the new snapshot)")
+
+      diff.add_argument("--previous", default=None,
+                        help="Previous export (.json) or ping index (defaults to the index saved by the last diff)")
+
+      diff.add_argument("--profile", choices=list(PROFILES), default="scp-2021",
+                        help="Study profile (nomination / multi-select columns)")
+
+      diff.add_argument("--format", choices=OUTPUT_FORMATS, default="csv",
+                        help="File format for the delta table (parquet requires pyarrow)")
+
+      diff.add_argument("--typed", action="store_true",
+                        help="Keep answers typed (int, float, bool, categorical) instead of cleaned strings")
+
+      diff.add_argument("--json-backend", choices=jsonio.BACKENDS, default="auto",
+                        help="JSON decoder / encoder (auto picks the fastest installed)")
+
+      ###
+
+      serve = commands.add_parser("serve",
+                                  help="Local parse service that keeps exports and tables in memory (see ripper_client.py)")
+
+      serve.add_argument("--host", default=DEFAULT_HOST,
+                         help="Interface to listen on (localhost only by default)")
+
+      serve.add_argument("--port", type=int, default=DEFAULT_PORT,
+                         help="Port to listen on")
+
+      serve.add_argument("--max-exports", type=int, default=2,
+                         help="Exports kept indexed in memory")
+
+      serve.add_argument("--max-tables", type=int, default=32,
+                         help="Parsed tables (participants + aggregates) kept in memory")
+
+      serve.add_argument("--json-backend", choices=jsonio.BACKENDS, default="auto",
+                         help="JSON decoder (auto picks the fastest installed)")
+
+      return cli.parse_args(argv)
+
+
+def load_roster(args):
+      """
+      Returns RosterIndex object, or None without --roster
+      """
+
+      if not args.roster:
+            return None
+
+      return RosterIndex.from_csv(args.roster,
+                                  ID_COLUMN=args.roster_id_column,
+                                  NAME_COLUMNS=args.roster_name_columns.split(","),
+                                  THRESHOLD=args.roster_threshold)
 
 
 # ----- Run Script
-def main():
-      target_path = sys.argv[1]                                               # Isolate relative path to data
-      setup(target_path)                                                      # Create output directories
+def split(args):
+      target_path = args.target_path
       sub_data, output_filename = isolate_json_file(target_path)              # Isolate JSON file
 
+      shard_directory = os.path.join(".", target_path, "02-Shards")
+      manifest = split_export(sub_data, shard_directory, args.mode, args.json_backend)
+
+      print(f"\nSplit {output_filename} => {manifest}\n")
+
+
+def parse(args, export=None, roster=None):
+      """
+      export => Optional path to the export (watch mode), otherwise the one JSON file in the target
+      roster => Optional RosterIndex already loaded (watch mode), otherwise built from --roster
+      """
+
+      target_path = args.target_path                                          # Isolate relative path to data
+      setup(target_path)                                                      # Create output directories
+
+      if export is None:
+            sub_data, output_filename = isolate_json_file(target_path)        # Isolate JSON file
+      else:
+            sub_data, output_filename = export, os.path.basename(export).split('.json')[0]
+
       # These output directories will hold parsed data
       subject_output_directory = os.path.join(".", target_path, "00-Subjects")
       aggregate_output_directory = os.path.join(".", target_path, "01-Aggregate")
+      log_directory = os.path.join(".", target_path)
+
+      manifest = os.path.join(".", target_path, "02-Shards", MANIFEST_NAME)
+      index, keys = None, None
 
-      sanity_check(sub_data, aggregate_output_directory)
+      # Workers seek to their own participants and write to their own aggregate directory
+      if args.worker:
+            worker, workers = (int(x) for x in args.worker.split("/"))
 
-      # I/O JSON file
-      with open(sub_data) as incoming:
+            if not os.path.exists(manifest):
+                  raise OSError(f"No manifest at {manifest} ... run `python3 ripper.py split {target_path}` first")
 
-            # I/O new text file for exception logging
-            with open(f"./{target_path}/{output_filename}.txt", "w") as log:
-                  
-                  data = json.load(incoming)                                  # Read JSON as Python dictionary
+            index = manifest
+            keys = assign_keys(list(ShardedExport(manifest, args.json_backend)), worker, workers)
 
-                  keepers = []                                                # Empty list to append subject data into
-                  parent_errors = {}                                          # Empty dictionary to append sparse data into
+            aggregate_output_directory = os.path.join(aggregate_output_directory, f"worker-{worker}of{workers}")
+            log_directory = aggregate_output_directory
+            os.makedirs(aggregate_output_directory, exist_ok=True)
 
-                  print("\nParsing participant data...\n")
-                  sleep(1)
+            # One zip can't take writes from several workers ... each packs its own, merge combines them
+            if args.subjects == "zip":
+                subject_output_directory = os.path.join(subject_output_directory, f"worker-{worker}of{workers}")
+                os.makedirs(subject_output_directory, exist_ok=True)
 
-                  # Key == Subject and login ID (we'll separate these later)
-                  for key in tqdm(list(data.keys())):
+      preview = args.sample or args.participants
 
-                        subset = data[key]                                    # Reduced data for one participant
+      # Preview => only the chosen participants, read by seeking, kept apart from the full outputs
+      if preview:
+            if args.worker:
+                  raise ValueError("--sample / --participants can't be combined with --worker")
 
-                        # If participant completed no pings, push them to parent dict
-                        if len(subset['answers']) == 0:
-                              parent_errors[key] = subset
-                              continue
-                        
-                        try:
+            export = ShardedExport(manifest, args.json_backend) if os.path.exists(manifest) \
+                     else ShardedExport.scan(sub_data, args.json_backend)
 
-                              # Run parse_responses function to isolate participant data
-                              parsed_data = parse_responses(key, subset, log, 
-                                                            subject_output_directory, True)
+            participants = args.participants.split(",") if args.participants else None
 
-                        except Exception as e:
+            index = export
+            keys = select_keys(list(export), participants, args.sample, args.seed)
 
-                              # Catch exceptions as they occur
-                              log.write(f"\nCaught @ {key.split('-')[0]}: {e}\n\n")
-                              continue
+            log_directory = os.path.join(".", target_path, "03-Preview")
+            subject_output_directory = os.path.join(log_directory, "00-Subjects")
+            aggregate_output_directory = os.path.join(log_directory, "01-Aggregate")
 
-                        keepers.append(parsed_data)                           # Add participant DF to keepers list
+            for directory in (subject_output_directory, aggregate_output_directory):
+                  os.makedirs(directory, exist_ok=True)
 
-                  sleep(1)
-                  print("\nAggregating participant data...\n")
+            print(f"\nPreviewing {len(keys)} of {len(export)} keys...\n")
 
-                  try:
+      label = f"{output_filename}-worker-{worker}of{workers}" if args.worker else output_filename
 
-                        # Stack all DFs into one
-                        aggregate = pd.concat(keepers)
+      run_study(sub_data,
+                subject_output_directory,
+                aggregate_output_directory,
+                LOG_NAME=f"{log_directory}/{output_filename}.txt",
+                DEVICE_LOG_NAME=f"{log_directory}/device-error-log.txt",
+                PROFILE=get_profile(args.profile),
+                CHUNK_SIZE=args.chunk_size,
+                DEDUP=args.dedup,
+                JSON_BACKEND=args.json_backend,
+                PARENT_ERRORS=args.parent_errors,
+                ROSTER=roster if roster is not None else load_roster(args),
+                NETWORK_WINDOW=args.network_window if args.network else None,
+                FORMAT=args.format,
+                TYPED=args.typed,
+                LAYOUT=args.layout,
+                INDEX=index,
+                KEYS=keys,
+                RESUME=args.resume,
+                SUBJECTS=args.subjects,
+                COMPLIANCE=args.compliance,
+                SPARSE=args.sparse,
+                PROGRESS=ProgressReporter(args.progress, args.progress_format, args.progress_interval,
+                                          label, args.json_backend))
 
-                        # Push to local CSV
-                        aggregate.to_csv(f'./{target_path}/01-Aggregate/pings_{output_filename}.csv',
-                                          index=False, encoding="utf-8-sig")
+      if preview and args.layout == "wide":
+            report_schema(aggregate_output_directory, output_filename, args)
 
-                  except Exception as e:
 
-                        # Something has gone wrong here and you have no participant data ... check the log
-                        print(f"{e}")
-                        print("\nNo objects to concatenate...\n")
-                        sys.exit(1)
+def report_schema(aggregate_output_directory, output_filename, args):
+      """
+      Prints (and saves) every column the preview found, with its role under the
+      current profile, so nomination / multi-select lists can be checked at a glance
+      """
 
-                  print("\nSaving parent errors...\n")
+      pings_name = os.path.join(aggregate_output_directory, f"pings_{output_filename}.{args.format}")
+      devices_name = os.path.join(aggregate_output_directory, f"devices_{output_filename}.{args.format}")
 
-                  # Push parent errors (no pings) to local JSON
-                  with open(f'./{target_path}/01-Aggregate/parent-errors.json', 'w') as outgoing:
-                        json.dump(parent_errors, outgoing, indent=4)
+      if args.format == "parquet":
+            pings = pd.read_parquet(pings_name)
+      else:
+            pings = pd.read_csv(pings_name, dtype=str, keep_default_na=False)
 
-                  print("\nParsing device information...\n")
+      devices = aggregate_columns(devices_name) if os.path.exists(devices_name) else []
 
-                  # I/O new text file for device parsing errors
-                  with open(f"./{target_path}/device-error-log.txt", 'w') as log:
+      schema = describe_schema(pings, get_profile(args.profile), [x for x in devices if x != "username"])
+      schema.to_csv(os.path.join(aggregate_output_directory, f"schema_{output_filename}.csv"),
+                    index=False, encoding="utf-8-sig")
 
-                        device_output = []                                    # Empty list to append into
+      print("\n" + schema.to_string(index=False) + "\n")
 
-                        # Same process as before, we'll loop through each subject
-                        for key in tqdm(list(data.keys())):
 
-                              username = key.split('-')[0]                    # Isolate username from key naming convention
+def watch(args):
+      """
+      Long-running parse of a drop folder ... the interpreter, libraries, and roster index
+      stay loaded between exports, and outputs are updated in place (no reset.sh)
+      """
 
-                              try:
+      if args.worker or args.sample or args.participants:
+            raise ValueError("watch parses whole exports ... --worker / --sample / --participants don't apply")
 
-                                    # Isolate participant dictionary
-                                    subset = data[key]
-                                    device_output.append(parse_device_info(subset, key))
+      # Load everything up front so each export starts parsing straight away
+      if args.format == "parquet":
+            import pyarrow.parquet                                            # noqa: F401
 
-                              except Exception as e:
+      roster = load_roster(args)
 
-                                    # Catch exceptions as they occur
-                                    log.write(f"\nCaught {username} @ device parser: {e}\n\n")
+      watch_exports(os.path.join(".", args.target_path),
+                    lambda export: parse(args, export, roster),
+                    INTERVAL=args.interval,
+                    SETTLE=args.settle,
+                    ONCE=args.once,
+                    JSON_BACKEND=args.json_backend)
 
-                        # Stack participant device info into one DF
-                        devices = pd.concat(device_output)
 
-                        # Push to local CSV
-                        devices.to_csv(f'./{target_path}/01-Aggregate/devices_{output_filename}.csv',
-                                      index=False, encoding="utf-8-sig")
+def merge(args):
+      target_path = args.target_path
+      sub_data, output_filename = isolate_json_file(target_path)              # Isolate JSON file
+
+      subject_output_directory = os.path.join(".", target_path, "00-Subjects")
+      aggregate_output_directory = os.path.join(".", target_path, "01-Aggregate")
+      manifest = os.path.join(".", target_path, "02-Shards", MANIFEST_NAME)
+
+      worker_directories = sorted(glob.glob(os.path.join(aggregate_output_directory, "worker-*of*")))
+
+      if not worker_directories:
+            raise OSError(f"No worker outputs in {aggregate_output_directory} ... run `parse --worker i/n` first")
+
+      merge_workers(worker_directories,
+                    aggregate_output_directory,
+                    output_filename,
+                    KEYS=list(ShardedExport(manifest, args.json_backend)),
+                    PROFILE=get_profile(args.profile),
+                    DEDUP=args.dedup,
+                    JSON_BACKEND=args.json_backend,
+                    ROSTER=load_roster(args),
+                    NETWORK_WINDOW=args.network_window if args.network else None,
+                    FORMAT=args.format,
+                    SUBJECT_ARCHIVES=sorted(glob.glob(os.path.join(subject_output_directory, "worker-*of*",
+                                                                   SUBJECT_ARCHIVE_NAME))),
+                    SUBJECT_DIR=subject_output_directory)
+
+
+def diff(args):
+      target_path = args.target_path
+      setup(target_path)                                                      # Create output directories
+      sub_data, output_filename = isolate_json_file(target_path)              # Isolate JSON file
+
+      aggregate_output_directory = os.path.join(".", target_path, "01-Aggregate")
+      previous = args.previous or os.path.join(aggregate_output_directory, PING_INDEX_NAME)
+
+      if not os.path.exists(previous):
+            raise OSError(f"No ping index at {previous} ... pass the previous export via --previous")
+
+      diff_study(sub_data,
+                 previous,
+                 aggregate_output_directory,
+                 LOG_NAME=os.path.join(".", target_path, f"{output_filename}-diff.txt"),
+                 PROFILE=get_profile(args.profile),
+                 JSON_BACKEND=args.json_backend,
+                 FORMAT=args.format,
+                 TYPED=args.typed)
+
+
+def plan(args):
+      """
+      Sizes the run before it starts ... saves plan_{ filename }.json in 01-Aggregate,
+      and with --apply runs the export with the recommended settings
+      """
+
+      if args.worker or args.sample or args.participants:
+            raise ValueError("plan sizes whole exports ... --worker / --sample / --participants don't apply")
+
+      target_path = args.target_path
+      setup(target_path)                                                      # Create output directories
+      sub_data, output_filename = isolate_json_file(target_path)              # Isolate JSON file
+
+      result = plan_study(sub_data,
+                          PROFILE=get_profile(args.profile),
+                          TYPED=args.typed,
+                          LAYOUT=args.layout,
+                          FORMAT=args.format,
+                          CHUNK_SIZE=args.chunk_size,
+                          MEMORY=args.memory,
+                          CPUS=args.cpus,
+                          SAMPLE=args.calibrate,
+                          SEED=args.seed,
+                          JSON_BACKEND=args.json_backend)
+
+      plan_name = save_plan(result, os.path.join(".", target_path, "01-Aggregate"), output_filename, args.json_backend)
 
-                  sleep(1)
-                  print("\nAll responses + devices parsed\n")
+      current, recommended = result["current"], result["recommended"]
+      gigabytes = lambda x: f"{x / 1024 ** 3:.2f} GB"
+
+      print(f"\n{result['participants']} participants ({result['responders']} with answers), "
+            f"{result['bytes'] / 1024 ** 2:.1f} MB, {len(result['questions'])} distinct questions")
+      print(f"Answers per participant: median {result['answers']['median']:g}, p95 {result['answers']['p95']:g}, "
+            f"max {result['answers']['max']} ({result['largest']['key']})")
+      print(f"As configured: ~{current['runtime_s']:.0f}s, peak ~{gigabytes(current['peak_memory_bytes'])}")
+      print(f"Recommended: --chunk-size {recommended['chunk_size'] or 'none'}, {recommended['workers']} worker(s) => "
+            f"~{recommended['runtime_s']:.0f}s, peak ~{gigabytes(recommended['peak_memory_bytes'])} "
+            f"of {gigabytes(recommended['memory_budget_bytes'])}"
+            f"{'' if recommended['fits'] else ' ... over budget, request more memory'}")
+      print(f"\nSaved plan => {plan_name}\n")
+
+      if args.apply:
+            apply_plan(args, recommended)
+
+
+def apply_plan(args, recommended):
+      """
+      recommended => Dictionary from wellping.recommend
+
+      One worker => an ordinary parse; more => split, parse the workers side by side, merge
+      """
+
+      workers = recommended["workers"]
+      settings = dict(vars(args), chunk_size=recommended["chunk_size"] or args.chunk_size)
+
+      print(f"\nApplying plan: {workers} worker(s), chunk size {settings['chunk_size'] or 'none'}...\n")
+
+      if workers == 1:
+            return parse(Namespace(**settings))
+
+      split(Namespace(target_path=args.target_path, mode="index", json_backend=args.json_backend))
+
+      runs = [Namespace(**dict(settings, worker=f"{ix}/{workers}")) for ix in range(1, workers + 1)]
+
+      with ProcessPoolExecutor(workers) as pool:
+            list(pool.map(parse, runs))
+
+      merge(Namespace(**settings))
+
+
+def serve(args):
+      service = ParseService(args.json_backend, args.max_exports, args.max_tables)
+      serve_exports(args.host, args.port, service)
+
+
+def main():
+      args = parse_args()
+      {"parse": parse, "split": split, "merge": merge, "watch": watch, "diff": diff, "serve": serve,
+       "plan": plan}[args.command](args)
 
 
 if __name__ == "__main__":
       main()
-
@@ -0,0 +1,145 @@
+#!/bin/python3
+
+"""
+About this Script
+
+Thin command-line client for the local parse service (`python3 ripper.py serve`).
+Standard library only, so it starts instantly ... the service does the parsing and
+keeps the export and its tables in memory between calls
+
+      python3 ripper_client.py participant { target_directory } scp001
+      python3 ripper_client.py aggregate { target_directory } --stream dailyStream -o daily.csv
+      python3 ripper_client.py keys { target_directory }
+      python3 ripper_client.py status
+
+Ian Ferguson | Stanford University
+"""
+
+# ----- Imports
+import os, sys, json, argparse
+from urllib.request import urlopen
+from urllib.parse import urlencode
+from urllib.error import HTTPError, URLError
+
+
+# ----- Command Line
+def parse_args():
+      """
+      Returns argparse Namespace of command line options
+      """
+
+      # Options shared by every request
+      shared = argparse.ArgumentParser(add_help=False)
+
+      shared.add_argument("--host", default="127.0.0.1",
+                          help="Host the service listens on")
+
+      shared.add_argument("--port", type=int, default=8765,
+                          help="Port the service listens on")
+
+      # Options for requests about one export
+      export = argparse.ArgumentParser(add_help=False, parents=[shared])
+
+      export.add_argument("target_path",
+                          help="Relative path to project directory (one JSON file), or the export itself")
+
+      export.add_argument("--profile", default="scp-2021",
+                          help="Study profile (nomination / multi-select columns)")
+
+      export.add_argument("--typed", action="store_true",
+                          help="Keep answers typed instead of cleaned strings")
+
+      export.add_argument("--format", choices=["csv", "json"], default="csv",
+                          help="Response format")
+
+      export.add_argument("-o", "--output", default=None,
+                          help="Save the response here instead of printing it")
+
+      cli = argparse.ArgumentParser(description="Asks a running `ripper.py serve` for parsed Wellping data")
+      commands = cli.add_subparsers(dest="command", required=True)
+
+      participant = commands.add_parser("participant", parents=[export],
+                                        help="One participant's pings + answers (every login)")
+
+      participant.add_argument("name",
+                               help="Username (e.g., scp001) or one participant key")
+
+      aggregate = commands.add_parser("aggregate", parents=[export],
+                                      help="The pings aggregate, optionally one stream")
+
+      aggregate.add_argument("--stream", default=None,
+                             help="Only pings from this streamName")
+
+      aggregate.add_argument("--dedup", default=None,
+                             help="Merge pings repeated across logins (first, latest, complete)")
+
+      commands.add_parser("keys", parents=[export],
+                          help="Participant keys in the export")
+
+      commands.add_parser("status", parents=[shared],
+                          help="Exports and tables the service holds")
+
+      return cli.parse_args()
+
+
+def locate_export(target_path):
+      """
+      Same rule as wellping.isolate_json_file, without importing the package
+      Returns absolute path to the export
+      """
+
+      if os.path.isfile(target_path):
+            return os.path.abspath(target_path)
+
+      files = [x for x in os.listdir(target_path) if ".json" in x]
+
+      if len(files) != 1:
+            raise OSError(f"Your project directory should only have one JSON file ... check {target_path} again")
+
+      return os.path.abspath(os.path.join(target_path, files[0]))
+
+
+# ----- Run Script
+def main():
+      args = parse_args()
+      query = {}
+
+      if args.command != "status":
+            query = {"export": locate_export(args.target_path), "profile": args.profile, "format": args.format}
+
+            if args.typed:
+                  query["typed"] = "1"
+
+      if args.command == "participant":
+            query["name"] = args.name
+
+      if args.command == "aggregate":
+            query.update({x: y for x, y in (("stream", args.stream), ("dedup", args.dedup)) if y})
+
+      url = f"http://{args.host}:{args.port}/{args.command}?{urlencode(query)}"
+
+      try:
+            with urlopen(url) as response:
+                  body = response.read()
+                  errors = int(response.headers.get("X-Parse-Errors", 0))
+
+      except HTTPError as e:
+            sys.exit(f"Service error: {json.loads(e.read()).get('error')}")
+
+      except URLError:
+            sys.exit(f"No service on {args.host}:{args.port} ... start one with `python3 ripper.py serve`")
+
+      if errors:
+            print(f"{errors} participant(s) failed to parse and were left out ... see the service's console",
+                  file=sys.stderr)
+
+      if getattr(args, "output", None):
+            with open(args.output, "wb") as outgoing:
+                  outgoing.write(body)
+
+      else:
+            sys.stdout.buffer.write(body)
+
+
+if __name__ == "__main__":
+      main()
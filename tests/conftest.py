@@ -0,0 +1,103 @@
+"""
+About this Script
+
+Shared fixtures for the test suite. Every test parses a small synthetic export
+(benchmarks/synthetic.py) inside its own temporary project directory, through the
+same command-line entry points as `python3 ripper.py`
+
+NOTE: run the following at the command line `python3 -m pytest tests`
+
+Ian Ferguson | Stanford University
+"""
+
+# ----------- Imports
+import os, sys, json, pathlib, contextlib
+import pandas as pd
+import pytest
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path[:0] = [str(ROOT), str(ROOT / "benchmarks")]
+
+import ripper
+from synthetic import synthetic_export
+
+
+# ----------- Definitions
+N_PARTICIPANTS = 40
+MAX_PINGS = 16
+SEED = 9
+
+
+@pytest.fixture(scope="session")
+def export_data():
+    """
+    Returns dictionary shaped like a Wellping export (repeated logins, non-responders, PNA answers)
+    """
+
+    return synthetic_export(N_PARTICIPANTS, SEED, MAX_PINGS)
+
+
+@pytest.fixture
+def make_project(tmp_path, export_data):
+    """
+    Returns function, name (+ optional export dictionary) => project directory holding export.json
+    """
+
+    def make(NAME="project", DATA=None):
+        project = tmp_path / NAME
+        project.mkdir()
+
+        with open(project / "export.json", "w") as outgoing:
+            json.dump(export_data if DATA is None else DATA, outgoing)
+
+        return project
+
+    return make
+
+
+@contextlib.contextmanager
+def inside(DIRECTORY):
+    """
+    ripper.py resolves every path against the working directory
+    """
+
+    previous = os.getcwd()
+    os.chdir(DIRECTORY)
+
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+def ripper_run(PROJECT, *ARGS):
+    """
+    PROJECT => Project directory (see make_project)
+    ARGS => Command and options, as typed after `python3 ripper.py`
+
+    Returns path to the project's 01-Aggregate directory
+    """
+
+    args = ripper.parse_args([str(x) for x in ARGS[:1]] + [PROJECT.name] + [str(x) for x in ARGS[1:]])
+
+    with inside(PROJECT.parent):
+        {"parse": ripper.parse, "split": ripper.split, "merge": ripper.merge,
+         "diff": ripper.diff, "plan": ripper.plan}[args.command](args)
+
+    return PROJECT / "01-Aggregate"
+
+
+def read_csv(PATH):
+    """
+    Returns DataFrame of raw strings ... what the file says, not what pandas infers
+    """
+
+    return pd.read_csv(PATH, dtype=str, keep_default_na=False)
+
+
+def sorted_rows(DF, KEYS=("username", "login-node", "id")):
+    """
+    Returns DF with rows in a fixed order (workers group rows differently)
+    """
+
+    return DF.sort_values(list(KEYS), kind="stable").reset_index(drop=True)
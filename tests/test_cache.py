@@ -0,0 +1,38 @@
+"""
+About this Script
+
+Tables handed back by read_outputs / ResultCache keep the run's dtypes
+
+Ian Ferguson | Stanford University
+"""
+
+# ----------- Imports
+import pandas as pd
+import pytest
+
+from wellping import ResultCache, read_outputs
+from wellping.cache import MEMORY
+from conftest import ripper_run
+
+
+# ----------- Definitions
+@pytest.mark.parametrize("chunk_size", [None, 7])
+def test_typed_csv_reads_back_typed(make_project, tmp_path, chunk_size):
+    pytest.importorskip("pyarrow")
+
+    chunked = ["--chunk-size", chunk_size] if chunk_size else []
+
+    typed = ripper_run(make_project("typed"), "parse", "--typed", *chunked)
+    columnar = ripper_run(make_project("columnar"), "parse", "--typed", "--format", "parquet")
+
+    tables = read_outputs(typed, "export", TYPED=True)
+    expected = read_outputs(columnar, "export", "parquet")["pings"]
+
+    pd.testing.assert_series_equal(tables["pings"].dtypes.astype(str), expected.dtypes.astype(str))
+
+    # A hit from disk (a new session) hands back the same frame the miss did
+    cache = ResultCache(tmp_path / "cache")
+    cache.put("key", tables)
+    MEMORY.clear()
+
+    pd.testing.assert_frame_equal(cache.get("key")["pings"], tables["pings"])
@@ -0,0 +1,48 @@
+"""
+About this Script
+
+`ripper.py diff` against a previous snapshot
+
+Ian Ferguson | Stanford University
+"""
+
+# ----------- Imports
+import copy
+import pandas as pd
+
+from wellping.delta import ping_index, load_ping_index, changed_pings
+from conftest import ripper_run, read_csv
+
+
+# ----------- Definitions
+def test_diff_finds_edited_answers(make_project, export_data):
+    previous = make_project("previous")
+
+    edited = copy.deepcopy(export_data)
+    key = next(iter(edited))
+    answer = edited[key]['answers'][0]
+    answer['data'] = {'value': "edited"}
+
+    aggregate = ripper_run(make_project("current", edited), "diff", "--previous", str(previous / "export.json"))
+    delta = read_csv(aggregate / "delta_export.csv")
+
+    assert delta[['id', 'change']].values.tolist() == [[answer['pingId'], "changed"]]
+
+
+def test_diff_of_same_snapshot_is_empty(make_project):
+    previous = make_project("previous")
+
+    aggregate = ripper_run(make_project("current"), "diff", "--previous", str(previous / "export.json"))
+
+    assert len(read_csv(aggregate / "delta_export.csv")) == 0
+
+
+def test_index_without_digests_still_diffs(export_data, tmp_path):
+    key, subset = next(iter(export_data.items()))
+
+    # An index saved before digests were kept ... only dates are known
+    index_name = tmp_path / "ping-index.csv.gz"
+    pd.DataFrame([x[:3] for x in ping_index(key, subset)], columns=['key', 'id', 'date']).to_csv(index_name,
+                                                                                                 index=False)
+
+    assert changed_pings(key, subset, load_ping_index(str(index_name))) == {}
@@ -0,0 +1,160 @@
+"""
+About this Script
+
+Chunked, resumed, and split / merged runs must write what one ordinary run writes
+
+Ian Ferguson | Stanford University
+"""
+
+# ----------- Imports
+import os, json, filecmp
+import pandas as pd
+import pytest
+
+from wellping import pipeline
+from conftest import ripper_run, read_csv, sorted_rows
+
+
+# ----------- Definitions
+def same_files(LEFT, RIGHT, NAMES):
+    """
+    Asserts each named file is byte-identical in both directories
+    """
+
+    for name in NAMES:
+        assert filecmp.cmp(LEFT / name, RIGHT / name, shallow=False), name
+
+
+def test_chunked_matches_single_run(make_project):
+    single = ripper_run(make_project("single"), "parse")
+    chunked = ripper_run(make_project("chunked"), "parse", "--chunk-size", 7)
+
+    same_files(single, chunked, ["pings_export.csv", "devices_export.csv", "response-duplicates.json"])
+    assert not filecmp.dircmp(single.parent / "00-Subjects", chunked.parent / "00-Subjects").diff_files
+
+
+def test_response_duplicates_keep_their_format(make_project, export_data):
+    aggregate = ripper_run(make_project(), "parse")
+
+    keys = {}
+
+    for key in export_data:
+        keys.setdefault(key.split('-')[0], []).append(key)
+
+    expected = {x: {'count': len(y), 'keys': y} for x, y in keys.items() if len(y) > 1}
+
+    with open(aggregate / "response-duplicates.json") as incoming:
+        assert incoming.read() == json.dumps(expected, indent=4)
+
+
+@pytest.mark.parametrize("typed", [False, True])
+def test_chunked_parquet_matches_single_run(make_project, typed):
+    pytest.importorskip("pyarrow")
+
+    options = ["--format", "parquet"] + (["--typed"] if typed else [])
+
+    single = ripper_run(make_project("single"), "parse", *options)
+    chunked = ripper_run(make_project("chunked"), "parse", *options, "--chunk-size", 7)
+
+    for name in ["pings_export.parquet", "devices_export.parquet"]:
+        pd.testing.assert_frame_equal(pd.read_parquet(single / name), pd.read_parquet(chunked / name))
+
+
+@pytest.mark.parametrize("policy", ["first", "latest", "complete"])
+def test_chunked_dedup_matches_single_run(make_project, policy):
+    single = ripper_run(make_project("single"), "parse", "--dedup", policy)
+    chunked = ripper_run(make_project("chunked"), "parse", "--dedup", policy, "--chunk-size", 7)
+
+    same_files(single, chunked, ["pings_export.csv", "merged-pings_export.csv"])
+
+
+@pytest.mark.parametrize("policy", ["first", "latest", "complete"])
+def test_dedup_keeps_one_row_per_ping(make_project, policy):
+    aggregate = ripper_run(make_project(), "parse", "--dedup", policy)
+
+    pings = read_csv(aggregate / "pings_export.csv")
+    merged = read_csv(aggregate / "merged-pings_export.csv")
+
+    assert not pings.duplicated(["username", "id"]).any()
+    assert len(merged) > 0, "the synthetic export should repeat some logins"
+
+
+def test_dedup_complete_keeps_most_answered_row(make_project):
+    aggregate = ripper_run(make_project("everything"), "parse")
+    deduped = ripper_run(make_project("complete"), "parse", "--dedup", "complete")
+
+    every = read_csv(aggregate / "pings_export.csv")
+    kept = read_csv(deduped / "pings_export.csv")
+
+    best = every.assign(filled=every.ne("").sum(axis=1)).groupby(["username", "id"])["filled"].max()
+    filled = kept.assign(filled=kept.ne("").sum(axis=1)).set_index(["username", "id"])["filled"]
+
+    assert filled.reindex(best.index).eq(best).all()
+
+
+def test_resume_after_interrupt(make_project, monkeypatch):
+    single = ripper_run(make_project("single"), "parse", "--chunk-size", 10)
+    project = make_project("resumed")
+
+    parse_responses, calls = pipeline.parse_responses, []
+
+    def interrupted(*args, **kwargs):
+        calls.append(None)
+
+        if len(calls) > 25:
+            raise KeyboardInterrupt
+
+        return parse_responses(*args, **kwargs)
+
+    monkeypatch.setattr(pipeline, "parse_responses", interrupted)
+
+    with pytest.raises(KeyboardInterrupt):
+        ripper_run(project, "parse", "--chunk-size", 10)
+
+    monkeypatch.setattr(pipeline, "parse_responses", parse_responses)
+    resumed = ripper_run(project, "parse", "--chunk-size", 10, "--resume")
+
+    same_files(single, resumed, ["pings_export.csv", "devices_export.csv", "parent-errors.jsonl"])
+    assert not filecmp.dircmp(single.parent / "00-Subjects", resumed.parent / "00-Subjects").diff_files
+
+
+def test_split_merge_matches_single_run(make_project):
+    single = ripper_run(make_project("single"), "parse", "--dedup", "complete")
+    project = make_project("workers")
+
+    ripper_run(project, "split")
+
+    for worker in range(1, 4):
+        ripper_run(project, "parse", "--worker", f"{worker}/3")
+
+    merged = ripper_run(project, "merge", "--dedup", "complete")
+
+    for name, keys in [("pings_export.csv", ["username", "login-node", "id"]),
+                       ("devices_export.csv", ["username", "login_time_x"])]:
+        left, right = read_csv(single / name), read_csv(merged / name)
+
+        assert list(left.columns) == list(right.columns), name
+        assert sorted_rows(left, keys).equals(sorted_rows(right, keys)), name
+
+    assert sorted(os.listdir(single.parent / "00-Subjects")) == sorted(os.listdir(project / "00-Subjects"))
+
+
+@pytest.mark.parametrize("merge_dedup", [True, False])
+def test_split_merge_keeps_worker_dedup_reports(make_project, merge_dedup):
+    single = ripper_run(make_project("single"), "parse", "--dedup", "complete")
+    project = make_project("workers")
+
+    ripper_run(project, "split")
+
+    for worker in range(1, 4):
+        ripper_run(project, "parse", "--worker", f"{worker}/3", "--dedup", "complete")
+
+    merged = ripper_run(project, "merge", *(["--dedup", "complete"] if merge_dedup else []))
+
+    left = read_csv(single / "merged-pings_export.csv")
+    right = read_csv(merged / "merged-pings_export.csv")
+
+    assert len(left) > 0
+    assert sorted_rows(left, ["username", "id"]).equals(sorted_rows(right, ["username", "id"]))
+    assert sorted_rows(read_csv(single / "pings_export.csv")).equals(
+           sorted_rows(read_csv(merged / "pings_export.csv")))
@@ -0,0 +1,30 @@
+"""
+About this Script
+
+The long layout (one row per answer) streams the export participant by participant
+
+Ian Ferguson | Stanford University
+"""
+
+# ----------- Imports
+import filecmp
+
+from wellping import jsonio
+from conftest import ripper_run, read_csv
+
+
+# ----------- Definitions
+def test_long_layout_never_decodes_whole_export(make_project, monkeypatch):
+    decode = jsonio.load
+
+    def whole_export(incoming, *args, **kwargs):
+        assert not incoming.name.endswith("export.json"), "the long layout decoded the whole export"
+        return decode(incoming, *args, **kwargs)
+
+    monkeypatch.setattr(jsonio, "load", whole_export)
+
+    streamed = ripper_run(make_project("streamed"), "parse", "--layout", "long")
+    chunked = ripper_run(make_project("chunked"), "parse", "--layout", "long", "--chunk-size", 7)
+
+    assert filecmp.cmp(streamed / "answers_export.csv", chunked / "answers_export.csv", shallow=False)
+    assert len(read_csv(streamed / "answers_export.csv")) > 0
@@ -0,0 +1,35 @@
+"""
+About this Script
+
+Roster matches and the nomination network don't depend on how the aggregate was chunked
+
+Ian Ferguson | Stanford University
+"""
+
+# ----------- Imports
+import filecmp
+import pandas as pd
+import pytest
+
+from synthetic import NAMES
+from conftest import ripper_run
+
+
+# ----------- Definitions
+@pytest.mark.parametrize("format", ["csv", "parquet"])
+def test_chunked_links_match_single_run(make_project, tmp_path, format):
+    if format == "parquet":
+        pytest.importorskip("pyarrow")
+
+    roster = tmp_path / "roster.csv"
+    pd.DataFrame({"id": [f"r{ix}" for ix in range(len(NAMES))], "name": NAMES}).to_csv(roster, index=False)
+
+    options = ["--format", format, "--roster", str(roster), "--network"]
+
+    single = ripper_run(make_project("single"), "parse", *options)
+    chunked = ripper_run(make_project("chunked"), "parse", *options, "--chunk-size", 7)
+
+    for name in ["edges_export.csv", "roster-matches_export.csv"]:
+        assert filecmp.cmp(single / name, chunked / name, shallow=False), name
+
+    assert len(pd.read_csv(single / "edges_export.csv")) > 0
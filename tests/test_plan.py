@@ -0,0 +1,26 @@
+"""
+About this Script
+
+Sizing runs with `ripper.py plan`
+
+Ian Ferguson | Stanford University
+"""
+
+# ----------- Imports
+import json
+import pytest
+
+from conftest import ripper_run
+
+
+# ----------- Definitions
+@pytest.mark.parametrize("layout", ["wide", "long"])
+def test_plan_each_layout(make_project, layout):
+    aggregate = ripper_run(make_project(), "plan", "--layout", layout, "--calibrate", 5)
+
+    with open(aggregate / "plan_export.json") as incoming:
+        plan = json.load(incoming)
+
+    assert plan["participants"] == 40 and plan["answered_pings"] > 0
+    assert plan["recommended"]["workers"] >= 1
+    assert plan["current"]["peak_memory_bytes"] > 0
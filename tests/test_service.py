@@ -0,0 +1,76 @@
+"""
+About this Script
+
+The local parse service (wellping/service.py) over HTTP, against a running server
+
+Ian Ferguson | Stanford University
+"""
+
+# ----------- Imports
+import io, json, threading
+from urllib.parse import urlencode
+from urllib.request import urlopen
+from http.server import ThreadingHTTPServer
+import pandas as pd
+import pytest
+
+from wellping import service
+
+
+# ----------- Definitions
+@pytest.fixture
+def server(make_project, monkeypatch):
+    """
+    Returns function, (endpoint, query) => (status, X-Parse-Errors, body) from a live service.
+    The first login of every repeated username fails to parse
+    """
+
+    export = make_project() / "export.json"
+    keys = list(json.loads(export.read_text()))
+    repeated = {x.split('-')[0] for x in keys if sum(y.split('-')[0] == x.split('-')[0] for y in keys) > 1}
+    broken = {min(x for x in keys if x.split('-')[0] == y) for y in repeated}
+
+    parse_responses = service.parse_responses
+
+    def flaky(KEY, *args, **kwargs):
+        if KEY in broken:
+            raise ValueError("malformed answers")
+        return parse_responses(KEY, *args, **kwargs)
+
+    monkeypatch.setattr(service, "parse_responses", flaky)
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), service.ServiceHandler)
+    httpd.service = service.ParseService()
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+
+    def get(ENDPOINT, **QUERY):
+        url = f"http://127.0.0.1:{httpd.server_address[1]}/{ENDPOINT}?{urlencode(dict(export=export, **QUERY))}"
+
+        with urlopen(url) as response:
+            return response.status, int(response.headers.get("X-Parse-Errors", 0)), response.read()
+
+    get.broken = broken
+
+    yield get
+
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_participant_skips_broken_login(server):
+    broken = next(iter(server.broken))
+    username, login_node = broken.split('-')[0], "".join(broken.split('-')[1:])
+
+    status, errors, body = server("participant", name=username)
+    table = pd.read_csv(io.BytesIO(body), dtype=str)
+
+    assert status == 200 and errors == 1
+    assert len(table) > 0 and login_node not in set(table["login-node"])
+
+
+def test_aggregate_counts_broken_logins(server):
+    status, errors, _ = server("aggregate")
+    tables = json.loads(server("status")[2])["tables"]
+
+    assert status == 200 and errors == len(server.broken) > 0
+    assert [x["errors"] for x in tables if x["request"][0] == "aggregate"] == [len(server.broken)]
@@ -0,0 +1,86 @@
+"""
+About this Script
+
+Byte-offset scanning (shards.scan_offsets) and the ShardedExport mapping
+
+Ian Ferguson | Stanford University
+"""
+
+# ----------- Imports
+import json
+import pytest
+
+from wellping.shards import scan_offsets, ShardedExport, assign_keys
+
+
+# ----------- Definitions
+def scanned(TMP_PATH, TEXT):
+    """
+    Returns dictionary of key => raw bytes of its value, as scan_offsets finds them
+    """
+
+    path = TMP_PATH / "export.json"
+    path.write_text(TEXT, encoding="utf-8")
+
+    raw = path.read_bytes()
+
+    return {key: raw[offset:offset + length] for key, offset, length in scan_offsets(str(path))}
+
+
+def test_scan_matches_json(tmp_path, export_data):
+    text = json.dumps(export_data)
+
+    pieces = scanned(tmp_path, text)
+
+    assert list(pieces) == list(export_data)
+    assert all(json.loads(pieces[x]) == export_data[x] for x in export_data)
+
+
+def test_scan_escaped_quotes_in_keys(tmp_path):
+    data = {'a"b-1': {"x": "}"}, 'c\\-2': [1, {"y": '"]'}], 'tab\t"q"-3': {}}
+
+    pieces = scanned(tmp_path, json.dumps(data))
+
+    assert list(pieces) == list(data)
+    assert all(json.loads(pieces[x]) == data[x] for x in data)
+
+
+def test_scan_scalar_values(tmp_path):
+    text = '{"n": 3, "f": -1.5e3, "t": true, "z": null, "s": "a,}b", "o": {"k": [1, 2]}}'
+
+    pieces = scanned(tmp_path, text)
+
+    assert {x: json.loads(y) for x, y in pieces.items()} == json.loads(text)
+
+
+@pytest.mark.parametrize("text", ["{}", " {\n} \n"])
+def test_scan_empty_export(tmp_path, text):
+    assert scanned(tmp_path, text) == {}
+
+
+def test_subset_exposes_only_its_keys(tmp_path, export_data):
+    path = tmp_path / "export.json"
+    path.write_text(json.dumps(export_data), encoding="utf-8")
+
+    export = ShardedExport.scan(str(path))
+    keys = list(export)
+    subset = export.subset(keys[:3])
+
+    assert list(subset) == keys[:3] and len(subset) == 3
+    assert keys[0] in subset and keys[5] not in subset
+    assert subset[keys[0]] == export_data[keys[0]]
+
+    with pytest.raises(KeyError):
+        subset[keys[5]]
+
+
+def test_assign_keys_partitions_by_username(export_data):
+    keys = list(export_data)
+    shares = [assign_keys(keys, x, 3) for x in range(1, 4)]
+
+    assert sorted(sum(shares, [])) == sorted(keys)
+
+    owners = {}
+    for worker, share in enumerate(shares):
+        for key in share:
+            assert owners.setdefault(key.split('-')[0], worker) == worker
@@ -0,0 +1,40 @@
+"""
+About this Package
+
+Converts Wellping EMA data from JSON to CSV. Study-specific parsing is driven by a
+StudyProfile, so every front-end (`ripper.py`, `EMI_Parser`) shares one code path
+
+Ian Ferguson | Stanford University
+"""
+
+from .profile import StudyProfile, SCP_2021, SCP_2023, PROFILES, get_profile
+from .files import (setup, isolate_json_file, sanity_check, write_parent_error, write_table, columnar,
+                    LongWriter, SubjectArchive, read_subject, clear_subjects, PARENT_ERROR_MODES, OUTPUT_FORMATS,
+                    LAYOUTS, SUBJECT_CONTAINERS, SUBJECT_ARCHIVE_NAME)
+from .answers import (derive_answers, cleanup_values, parse_nominations, melt_nominations, parse_race,
+                      remove_brackets, answer_value, long_answers, LONG_COLUMNS)
+from .typed import derive_typed_answers, infer_type, coerce_column, QUESTION_TYPES
+from .pings import derive_pings
+from .devices import parse_device_info, device_record, devices_table, attach_device
+from .aggregate import (describe_schema, agg_drop_duplicates, rank_duplicates, completeness, flush_chunk,
+                        reconcile_chunks, merge_dtypes, categorize, concat_categorical, aggregate_columns,
+                        iter_aggregate, AnswerValues, sparsify, densify, DEDUP_POLICIES, CATEGORICAL_COLUMNS,
+                        SPARSE_CODES)
+from .roster import RosterIndex, normalize_name, match_nominations, match_aggregate
+from .network import build_edges, edges_from_aggregate, adjacency_by_window, save_network
+from .shards import split_export, scan_offsets, assign_keys, select_keys, ShardedExport, SHARD_MODES, MANIFEST_NAME
+from .compliance import (ping_schedule, compliance_metrics, streaks, save_compliance, SCHEDULE_COLUMNS,
+                         DAILY_COLUMNS, SUMMARY_COLUMNS)
+from .checkpoint import (fingerprint, new_checkpoint, load_checkpoint, save_checkpoint, rollback,
+                         CHECKPOINT_NAME, CHECKPOINT_CHUNK_SIZE)
+from .validate import validate_participant, write_quarantine, QUARANTINE_NAME
+from .delta import (ping_index, save_ping_index, load_ping_index, changed_pings, reduce_subset, INDEX_COLUMNS,
+                    PING_INDEX_NAME)
+from .watch import find_exports, export_signature, is_closed, ExportWatcher, watch_exports, WATCH_STATE_NAME
+from .cache import (ResultCache, cache_key, content_digest, parser_version, read_outputs, CACHE_LIMIT,
+                    MEMORY_ENTRIES)
+from .progress import ProgressReporter, rss_bytes, PROGRESS_FORMATS
+from .pipeline import output, parse_responses, run_study, link_nominations, diff_study, merge_workers
+from .plan import (prescan_export, calibrate, estimate_run, recommend, plan_study, save_plan, parse_bytes,
+                   available_memory, PLAN_NAME, CALIBRATION_SAMPLE)
+from .service import ParseService, ServiceHandler, serve_exports, DEFAULT_HOST, DEFAULT_PORT
@@ -0,0 +1,605 @@
+#!/bin/python3
+
+"""
+About this Script
+
+Helpers that work on the aggregate (all participants): merging pings repeated
+across logins, and flushing / reconciling chunks of participants on disk
+
+Ian Ferguson | Stanford University
+"""
+
+# ----------- Imports
+import os
+import pandas as pd
+import numpy as np
+
+
+# ----------- Definitions
+
+# ----- Concat
+DEDUP_POLICIES = ["first", "latest", "complete"]
+
+
+def completeness(DF):
+    """
+    DF => DataFrame object
+
+    Counts the populated cells in each row (empty strings count as missing)
+    Returns Series object
+    """
+
+    # Coded answers (see AnswerValues) are populated above code 0, read straight off the sparse index
+    sparse = [x for x in DF.columns if is_coded(DF[x].dtype)]
+
+    if not sparse:
+        return (DF.notna() & DF.ne("")).sum(axis=1)
+
+    dense = DF.drop(columns=sparse)
+    filled = np.zeros(len(DF), dtype=np.int64)
+
+    for column in sparse:
+        codes = DF[column].array
+        filled[codes.sp_index.indices[codes.sp_values > 0]] += 1
+
+    return (dense.notna() & dense.ne("")).sum(axis=1) + filled
+
+
+def rank_duplicates(KEYS, POLICY="first"):
+    """
+    KEYS => DataFrame object with username, id, and login-node columns
+            (plus a _complete column when POLICY is "complete")
+    POLICY => One of DEDUP_POLICIES
+        * first => Keep the first copy of a ping in aggregate order
+        * latest => Keep the copy from the most recent login
+        * complete => Keep the copy with the most populated cells
+
+    A ping answered under several login keys for one username shows up once per
+    key. This function picks one copy of each ping in a single hash-based pass
+    Returns tuple of (boolean keep mask aligned to KEYS, merge report DataFrame)
+    """
+
+    if POLICY not in DEDUP_POLICIES:
+        raise ValueError(f"Unknown dedup policy {POLICY} ... choose from {DEDUP_POLICIES}")
+
+    KEYS = KEYS.reset_index(drop=True)
+    subset = ["username", "id"]
+
+    # Order rows so the preferred copy of each ping comes first (stable sorts keep ties in order)
+    if POLICY == "latest":
+        login = pd.to_numeric(KEYS["login-node"], errors="coerce")
+        ranked = KEYS.assign(_login=login).sort_values("_login", ascending=False,
+                                                       kind="stable", na_position="last")
+    elif POLICY == "complete":
+        ranked = KEYS.sort_values("_complete", ascending=False, kind="stable")
+    else:
+        ranked = KEYS
+
+    keep = ~ranked.duplicated(subset=subset, keep="first")
+    keep = keep.reindex(KEYS.index).to_numpy()
+
+    # Only pings with more than one copy go into the report
+    merged = KEYS.loc[KEYS.duplicated(subset=subset, keep=False), subset + ["login-node"]]
+    kept = keep[merged.index]
+
+    report = merged.groupby(subset, sort=False).size().rename("copies").to_frame()
+    report["kept_login_node"] = merged[kept].set_index(subset)["login-node"]
+    report["dropped_login_nodes"] = (merged[~kept].astype({"login-node": str})
+                                     .groupby(subset, sort=False)["login-node"].agg(";".join))
+    report = report.reset_index()
+
+    return keep, report
+
+
+def agg_drop_duplicates(DF, POLICY="first"):
+    """
+    DF => Aggregate DataFrame object
+    POLICY => One of DEDUP_POLICIES (see rank_duplicates)
+
+    Merges repeated logins for the same username by ping identifier
+    Returns tuple of (deduplicated DataFrame, merge report DataFrame)
+    """
+
+    DF = DF.reset_index(drop=True)
+    keys = DF.loc[:, ["username", "id", "login-node"]]
+
+    if POLICY == "complete":
+        keys = keys.assign(_complete=completeness(DF))
+
+    keep, report = rank_duplicates(keys, POLICY)
+
+    return DF.loc[keep].reset_index(drop=True), report
+
+
+# ----- Categoricals
+CATEGORICAL_COLUMNS = ['username', 'login-node', 'streamName']
+
+
+def categorize(DF, COLUMNS):
+    """
+    DF => DataFrame object
+    COLUMNS => Columns to hold as categoricals (missing columns are skipped)
+
+    Repeated strings (usernames, stream names, device fields) are stored once
+    per category instead of once per row
+    Returns DataFrame object
+    """
+
+    for column in COLUMNS:
+        if column in DF.columns:
+            DF[column] = DF[column].astype("category")
+
+    return DF
+
+
+def concat_categorical(FRAMES):
+    """
+    FRAMES => List of DataFrame objects
+
+    pd.concat falls back to object dtype when categoricals disagree on their
+    categories, or when a typed column (e.g., Int64) is missing from some frames.
+    This aligns every frame to one column order, one set of categories per
+    categorical column, and one dtype per typed column first, so the stack
+    keeps its dtypes
+    Returns DataFrame object
+    """
+
+    order = list(dict.fromkeys(column for frame in FRAMES for column in frame.columns))
+
+    categories, extension, sparse = {}, {}, []
+
+    for column in order:
+        dtypes = [frame[column].dtype for frame in FRAMES if column in frame.columns]
+
+        if any(is_coded(x) for x in dtypes):
+            sparse.append(column)
+
+        elif any(isinstance(x, pd.CategoricalDtype) for x in dtypes):
+            # Plain columns (e.g., read back from disk) contribute their values as categories too
+            found = [frame[column].cat.categories if isinstance(frame[column].dtype, pd.CategoricalDtype)
+                     else frame[column].dropna().unique() for frame in FRAMES if column in frame.columns]
+            categories[column] = pd.Index(pd.unique(np.concatenate([np.asarray(x, dtype=object) for x in found])))
+
+        elif len(set(dtypes)) == 1 and isinstance(dtypes[0], pd.api.extensions.ExtensionDtype):
+            extension[column] = dtypes[0]
+
+    aligned = []
+
+    for frame in FRAMES:
+        missing = [x for x in extension if x not in frame.columns]
+        frame = frame.reindex(columns=order)
+
+        for column, values in categories.items():
+            frame[column] = pd.Categorical(frame[column], categories=values)
+
+        for column in missing:
+            frame[column] = frame[column].astype(extension[column])
+
+        # Questions this participant was never asked stay unanswered codes, not a dense block of NaN
+        for column in sparse:
+            if is_coded(frame[column].dtype):
+                continue
+
+            if frame[column].notna().any():
+                raise ValueError(f"{column} is coded in some participants but not others ... sparsify every frame")
+
+            frame[column] = pd.arrays.SparseArray(np.full(len(frame), -1, dtype=np.int32), fill_value=-1)
+
+        aligned.append(frame)
+
+    return pd.concat(aligned)
+
+
+# ----- Sparse answers
+SPARSE_CODES = pd.SparseDtype(np.int32, -1)                                 # Answer codes, -1 => not asked / unanswered
+
+
+def is_coded(DTYPE):
+    """
+    Returns True for SPARSE_CODES ... row selections (e.g., agg_drop_duplicates) may widen the codes to int64
+    """
+
+    return isinstance(DTYPE, pd.SparseDtype) and pd.api.types.is_integer_dtype(DTYPE.subtype) and DTYPE.fill_value == -1
+
+
+class AnswerValues:
+    """
+    One integer code per distinct answer value, shared by every participant of a run.
+    Code 0 is always the empty string, so populated cells are the codes above 0
+
+    Each stream asks only some of the questions, so once participants are stacked most
+    of the answers block is missing. Coded as SPARSE_CODES columns, a cell costs 8 bytes
+    when it holds an answer and nothing when it doesn't; repeated answers are stored once
+    """
+
+    def __init__(self):
+
+        self.codes = {"": 0}
+        self.values = [""]
+        self.lookup = None
+
+
+    def __len__(self):
+        return len(self.values)
+
+
+    def encode(self, SERIES):
+        """
+        SERIES => Series of answer values (missing as NaN / None)
+
+        Returns SparseArray of codes (SPARSE_CODES)
+        """
+
+        values = SERIES.to_numpy(dtype=object)
+        present = pd.notna(values)
+        codes = np.full(len(values), -1, dtype=np.int32)
+
+        try:
+            keys = values[present]
+            distinct = pd.unique(keys)
+        except TypeError:
+
+            # Raw lists (e.g., multi-select answers) are keyed by their repr, and decode to the first one seen
+            keys = np.array([(list, repr(x)) if isinstance(x, list) else x for x in values[present]] + [None],
+                            dtype=object)[:-1]
+            distinct = dict(zip(keys, values[present]))
+
+        for key in distinct:
+            if key not in self.codes:
+                self.codes[key] = len(self.values)
+                self.values.append(distinct[key] if isinstance(distinct, dict) else key)
+
+        codes[present] = [self.codes[x] for x in keys]
+
+        return pd.arrays.SparseArray(codes, fill_value=-1)
+
+
+    def decode(self, CODES):
+        """
+        CODES => Series of codes (SPARSE_CODES)
+
+        Returns object ndarray of answer values, NaN where unanswered
+        """
+
+        # Code -1 lands on the NaN kept at the end of the lookup
+        if self.lookup is None or len(self.lookup) != len(self.values) + 1:
+            self.lookup = np.empty(len(self.values) + 1, dtype=object)
+            self.lookup[:-1] = self.values
+            self.lookup[-1] = np.nan
+
+        return self.lookup[np.asarray(CODES, dtype=np.int32)]
+
+
+def sparsify(DF, VALUES, DENSE=()):
+    """
+    DF => Participant DataFrame object (see pipeline.parse_responses)
+    VALUES => AnswerValues object shared by the run
+    DENSE => Columns to leave as they are (e.g., pings.PING_COLUMNS)
+
+    String answers become SPARSE_CODES columns; categoricals and typed columns are left alone
+    Returns DataFrame object
+    """
+
+    for column in DF.columns:
+        dtype = DF[column].dtype
+
+        if column in DENSE or isinstance(dtype, (pd.CategoricalDtype, pd.SparseDtype)):
+            continue
+
+        if pd.api.types.is_string_dtype(dtype) or DF[column].isna().all():
+            DF[column] = VALUES.encode(DF[column])
+
+    return DF
+
+
+def densify(DF, VALUES):
+    """
+    DF => DataFrame object with SPARSE_CODES columns (see sparsify)
+    VALUES => AnswerValues object the codes came from
+
+    Returns DataFrame object with the same columns and dtypes a dense run produces
+    """
+
+    columns = {}
+
+    for column in DF.columns:
+        if is_coded(DF[column].dtype):
+            columns[column] = pd.Series(VALUES.decode(DF[column]), index=DF.index).infer_objects()
+        else:
+            columns[column] = DF[column]
+
+    return pd.DataFrame(columns, index=DF.index)
+
+
+# ----- Chunked aggregation
+def _parquet_types():
+    """
+    Returns dictionary of pandas dtype name => pyarrow type (empty without pyarrow)
+    """
+
+    try:
+        import pyarrow as pa
+    except ImportError:
+        return {}
+
+    return {"category": pa.dictionary(pa.int32(), pa.string()),
+            "Int64": pa.int64(),
+            "int64": pa.int64(),
+            "float64": pa.float64(),
+            "Float64": pa.float64(),
+            "boolean": pa.bool_(),
+            "bool": pa.bool_(),
+            "string": pa.string()}
+
+
+PARQUET_TYPES = _parquet_types()
+
+# Missing cells in part CSVs ... told apart from empty strings, so parquet gets nulls exactly where a single run has them
+PART_MISSING = "\x1e"
+
+
+# A part without a missing value can hold the non-nullable dtype (e.g., int64) of a column
+# other parts hold as nullable (Int64) ... the two merge to the nullable one
+NULLABLE_DTYPES = {"int64": "Int64",
+                   "bool": "boolean"}
+
+
+def flush_chunk(KEEPERS, PART_DIR, IX, VALUES=None):
+    """
+    KEEPERS => List of participant DataFrame objects
+    PART_DIR => Relative path to directory holding aggregate parts
+    IX => Integer, running index of this chunk
+    VALUES => Optional AnswerValues object, when the keepers hold coded answers (see sparsify)
+
+    Stacks one chunk of participants and pushes it to a part CSV, so the
+    caller can release the DataFrames before parsing the next chunk
+    Returns tuple of (part filename, dictionary of chunk column => dtype name, None when the column is empty)
+    """
+
+    chunk = concat_categorical(KEEPERS)                                     # Stack one chunk of participants
+    part_name = os.path.join(PART_DIR, f"part-{IX:05d}.csv")
+
+    if VALUES is not None:
+        chunk = densify(chunk, VALUES)
+
+    chunk.to_csv(part_name, index=False, encoding="utf-8", na_rep=PART_MISSING)
+
+    # A question nobody in this chunk answered is inferred as all-missing float ... it doesn't get a vote
+    return part_name, {x: str(chunk[x].dtype) if chunk[x].notna().any() else None for x in chunk.columns}
+
+
+def merge_dtypes(DTYPES, PART_DTYPES):
+    """
+    DTYPES => Running dictionary of column => dtype name, in order of appearance
+    PART_DTYPES => Column dtypes of one part (see flush_chunk)
+
+    A column typed differently across parts (e.g., Int64 in one, float64 in another)
+    widens to float64 when both are numeric, otherwise falls back to plain strings.
+    Parts where the column is empty (None) keep its place in the column order but
+    leave its dtype alone
+    Returns nothing, functions inplace
+    """
+
+    for column, dtype in PART_DTYPES.items():
+        seen = DTYPES.setdefault(column, dtype)
+
+        if seen is None:
+            DTYPES[column] = dtype
+
+        elif dtype is not None and seen != dtype:
+            seen, dtype = NULLABLE_DTYPES.get(seen, seen), NULLABLE_DTYPES.get(dtype, dtype)
+
+            if seen == dtype:
+                DTYPES[column] = dtype
+            else:
+                DTYPES[column] = "float64" if {seen, dtype} <= {"Int64", "float64", "Float64"} else "object"
+
+
+def restore_dtypes(PART, DTYPES):
+    """
+    PART => DataFrame object of raw strings (missing cells as NaN)
+    DTYPES => Dictionary of column => dtype name (see flush_chunk)
+
+    Returns DataFrame object with typed answers converted back from strings
+    """
+
+    for column, dtype in DTYPES.items():
+        if column not in PART.columns:
+            continue
+
+        # Cells emptied by reindexing (a column some parts never had) need the nullable dtype
+        if dtype in NULLABLE_DTYPES and PART[column].isna().any():
+            dtype = NULLABLE_DTYPES[dtype]
+
+        if dtype in ("Int64", "int64"):
+            PART[column] = pd.to_numeric(PART[column]).astype(dtype)
+        elif dtype in ("float64", "Float64"):
+            PART[column] = pd.to_numeric(PART[column]).astype("float64")
+        elif dtype in ("boolean", "bool"):
+            PART[column] = PART[column].map({"True": True, "False": False}).astype(dtype)
+        elif dtype == "string":
+            PART[column] = PART[column].astype("string")
+
+    return PART
+
+
+def read_part(PART_NAME, MISSING=PART_MISSING):
+    """
+    PART_NAME => Relative path to a part CSV (see flush_chunk)
+    MISSING => Cell text that stands for a missing value
+
+    Returns DataFrame object of raw strings, missing cells as NaN
+    """
+
+    return pd.read_csv(PART_NAME, dtype=str, keep_default_na=False, na_values=[MISSING])
+
+
+def reconcile_chunks(PARTS, COLUMNS, OUTPUT_NAME, POLICY=None, DTYPES=None, MISSING=PART_MISSING):
+    """
+    PARTS => List of part CSV filenames (see flush_chunk)
+    COLUMNS => List of every column seen across parts, in order of appearance
+    OUTPUT_NAME => Relative path to aggregate (.csv or .parquet)
+    POLICY => Optional dedup policy (see rank_duplicates)
+    DTYPES => Optional dictionary of column => dtype name, restored when writing parquet
+              (categoricals are dictionary-encoded, typed answers keep their types)
+    MISSING => Cell text that stands for a missing value (PART_MISSING in flush_chunk parts;
+               "" in finished CSV aggregates, which can't tell the two apart)
+
+    Streams part CSVs into the aggregate one at a time, aligning each to the
+    global column set. Cells are read as raw strings so the result matches
+    a single pd.concat of every participant. Parquet output gets one row
+    group per part, with missing cells (and columns a part never had) written
+    as nulls and empty strings kept
+
+    When POLICY is set, a first pass collects the ping keys of every part so
+    duplicate pings can be dropped while streaming
+    Returns merge report DataFrame (empty without a POLICY)
+    """
+
+    keep_masks = [None] * len(PARTS)
+    report = pd.DataFrame()
+
+    if POLICY:
+        keys = []
+
+        for part_name in PARTS:
+            part = read_part(part_name, MISSING)
+            part_keys = part.loc[:, ["username", "id", "login-node"]]
+
+            if POLICY == "complete":
+                part_keys = part_keys.assign(_complete=completeness(part))
+
+            keys.append(part_keys)
+
+        keep, report = rank_duplicates(pd.concat(keys), POLICY)
+        bounds = np.cumsum([0] + [len(x) for x in keys])
+        keep_masks = [keep[bounds[ix]:bounds[ix + 1]] for ix in range(len(PARTS))]
+
+    writer = None
+
+    if OUTPUT_NAME.endswith(".parquet"):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        # Empty in every part => all-missing float, as an unchunked run infers it
+        DTYPES = {x: "float64" if y is None else y for x, y in (DTYPES or {}).items()}
+        schema = pa.schema([(x, PARQUET_TYPES.get(DTYPES.get(x), pa.string())) for x in COLUMNS])
+
+        # Pandas metadata from an empty frame of the same dtypes, so the file reads back as an unchunked run's does
+        template = pd.DataFrame({x: pd.Series(dtype=DTYPES[x] if DTYPES.get(x) in PARQUET_TYPES else "str")
+                                 for x in COLUMNS})
+        schema = schema.with_metadata(pa.Schema.from_pandas(template, preserve_index=False).metadata)
+        writer = pq.ParquetWriter(OUTPUT_NAME, schema)
+
+    for ix, part_name in enumerate(PARTS):
+
+        # Raw strings in, raw strings out ... missing cells are empty in a CSV, null in parquet
+        part = read_part(part_name, MISSING).reindex(columns=COLUMNS)
+
+        if keep_masks[ix] is not None:
+            part = part.loc[keep_masks[ix]]
+
+        if writer is not None:
+            part = restore_dtypes(part, DTYPES)
+            writer.write_table(pa.Table.from_pandas(part, schema=schema, preserve_index=False))
+            continue
+
+        part = part.fillna("")
+
+        if ix == 0:
+            part.to_csv(OUTPUT_NAME, index=False, encoding="utf-8-sig")
+        else:
+            part.to_csv(OUTPUT_NAME, index=False, header=False, mode="a", encoding="utf-8")
+
+    if writer is not None:
+        writer.close()
+
+    return report
+
+
+def describe_schema(DF, PROFILE, DEVICE_COLUMNS=()):
+    """
+    DF => Parsed DataFrame object (e.g., a preview aggregate)
+    PROFILE => StudyProfile object
+    DEVICE_COLUMNS => Columns that came from the device info (e.g., the devices aggregate header)
+
+    One row per column: where it comes from (ping, nomination, slot, multi-select,
+    bracketed, answer, device), how often it is filled in, and an example value.
+    Answers the profile doesn't know about show up as plain answers
+    Returns DataFrame object
+    """
+
+    from .pings import PING_COLUMNS
+
+    slots = set(x[0] for x in PROFILE.nomination_slots(DF.columns))
+
+    def role(column):
+        if column in PING_COLUMNS:
+            return "ping"
+        if column in DEVICE_COLUMNS:
+            return "device"
+        if column in PROFILE.nominations:
+            return "nomination"
+        if column in slots:
+            return "slot"
+        if column in PROFILE.multi_select:
+            return "multi-select"
+        if column in PROFILE.strip_brackets:
+            return "bracketed"
+        return "answer"
+
+    rows = []
+
+    for column in DF.columns:
+        values = DF[column].astype(object)
+        filled = values[values.notna() & (values.astype(str) != "")]
+
+        rows.append({"column": column,
+                     "role": role(column),
+                     "dtype": str(DF[column].dtype),
+                     "filled": len(filled),
+                     "distinct": filled.astype(str).nunique(),
+                     "example": str(filled.iloc[0])[:60] if len(filled) else ""})
+
+    return pd.DataFrame(rows)
+
+
+def aggregate_columns(AGGREGATE_NAME):
+    """
+    AGGREGATE_NAME => Relative path to the aggregate (.csv or .parquet)
+
+    Returns list of column names, without reading any rows
+    """
+
+    if AGGREGATE_NAME.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        return pq.ParquetFile(AGGREGATE_NAME).schema_arrow.names
+
+    return list(pd.read_csv(AGGREGATE_NAME, nrows=0, encoding="utf-8-sig").columns)
+
+
+def iter_aggregate(AGGREGATE_NAME, COLUMNS, CHUNK_ROWS=100000):
+    """
+    AGGREGATE_NAME => Relative path to the aggregate (.csv or .parquet)
+    COLUMNS => Function of a column name, True for columns to read
+    CHUNK_ROWS => Rows of the aggregate read at a time
+
+    Reads a few columns of the aggregate back as raw strings, in chunks,
+    so downstream stages work the same after a chunked run
+    Yields DataFrame objects
+    """
+
+    if AGGREGATE_NAME.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        incoming = pq.ParquetFile(AGGREGATE_NAME)
+        wanted = [x for x in incoming.schema_arrow.names if COLUMNS(x)]
+
+        for batch in incoming.iter_batches(batch_size=CHUNK_ROWS, columns=wanted):
+            chunk = batch.to_pandas()
+            yield chunk.astype(object).where(chunk.notna(), "").astype(str)
+
+        return
+
+    yield from pd.read_csv(AGGREGATE_NAME, usecols=COLUMNS, dtype=str, keep_default_na=False,
+                           encoding="utf-8-sig", chunksize=CHUNK_ROWS)
@@ -0,0 +1,326 @@
+#!/bin/python3
+
+"""
+About this Script
+
+These helper functions convert *long* participant responses (derived from a JSON file)
+into *wide* participant responses, such that one row in a DataFrame represents a complete
+ping. Study-specific columns (nominations, multi-select questions, bracketed answers)
+are read from a StudyProfile
+
+Ian Ferguson | Stanford University
+"""
+
+# ----------- Imports
+import pandas as pd
+import numpy as np
+
+from .profile import SCP_2021
+
+
+# ----------- Definitions
+LONG_COLUMNS = ['username', 'login-node', 'pingId', 'questionId', 'value', 'date']
+
+
+def derive_answers(SUBSET, LOG, USER):
+    """
+    SUBSET => Reduced dictionary of subject information (pings/user/answers)
+    LOG => Text file to log issues
+    USER => Username, used in error log
+
+    This function isolates participant respones and converts from long to wide
+    Returns DataFrame object
+    """
+
+    def isolate_values(DF):
+        """
+        DF => Dataframe object
+
+        While data is still "long", we'll isolate the participant response
+        """
+
+        if DF['preferNotToAnswer']:
+            return "PNA"
+
+        try:
+
+            # Raw data is optimized for dictionary expresson, we'll save the values
+            temp = dict(DF['data']).values()
+            return list(temp)
+
+        except:
+
+            # NOTE: Consider returning empty string instead
+            return None
+
+    # Isolated participant response dictionary
+    answers = pd.DataFrame(SUBSET['answers'])
+
+    try:
+
+        # Create new "value" column with aggregated response
+        answers['value'] = answers.apply(isolate_values, axis=1)
+
+    except Exception as e:
+
+        # Write to error log
+        LOG.write(f"\nCaught @ {USER} + isolate_values: {e}\n\n")
+
+    try:
+
+        # Apply cleanup_values function (removes extra characters)
+        answers['value'] = answers['value'].apply(lambda x: cleanup_values(x))
+
+    except Exception as e:
+
+        # Write to error log
+        LOG.write(f"\nCaught @ {USER} + cleanup_values: {e}\n\n")
+
+    answers = answers.drop_duplicates(subset="date", keep="first").reset_index(drop=True)
+
+    answers["IX"] = answers.groupby("questionId", as_index=False).cumcount()
+
+    # Drop extraneous columns
+    answers.drop(columns=['data', 'preferNotToAnswer'], inplace=True)
+
+    # Pivot long to wide
+    answers = answers.pivot(index="pingId", columns="questionId", values="value").reset_index()
+
+    # Rename Ping ID column (for merge with pings DF)
+    answers.rename(columns={'pingId':'id'}, inplace=True)
+
+    return answers
+
+
+def answer_value(ANSWER):
+    """
+    ANSWER => One raw answer dictionary from the JSON export
+
+    Same cleaned string derive_answers produces for this answer, without a DataFrame
+    """
+
+    if ANSWER.get('preferNotToAnswer'):
+        return "PNA"
+
+    try:
+        value = list(dict(ANSWER['data']).values())
+    except Exception:
+        value = None
+
+    return cleanup_values(value)
+
+
+def long_answers(KEY, SUBSET):
+    """
+    KEY => Key from the master data dictionary
+    SUBSET => Reduced dictionary of participant-only data
+
+    Tidy counterpart of derive_answers ... one row per answer, no pivot.
+    Repeated submissions (same date) keep the first, as in derive_answers
+    Yields tuples matching LONG_COLUMNS
+    """
+
+    username = KEY.split('-')[0]
+    login_node = "".join(KEY.split('-')[1:])
+
+    seen = set()
+
+    for answer in SUBSET['answers']:
+        date = answer.get('date')
+
+        if date in seen:
+            continue
+
+        seen.add(date)
+
+        yield (username, login_node, answer.get('pingId'), answer.get('questionId'),
+               answer_value(answer), date)
+
+
+def cleanup_values(x):
+    """
+    x => Isolated value derived from lambda
+
+    This function is applied via lambda, serialized per column
+    """
+
+    temp = str(x)
+
+    """
+    The conditional statements below will strip out square brackets
+    and leading / trailing quotation marks
+
+    Yields a clean value to work with in the resulting dataframe
+    (empty strings pass through untouched)
+    """
+
+    if temp[:1] == "[":
+        temp = temp[1:]
+
+    if temp[-1:] == "]":
+        temp = temp[:-1]
+
+    if temp[:1] in ["\'", "\""]:
+        temp = temp[1:]
+
+    if temp[-1:] in ["\'", "\""]:
+        temp = temp[:-1]
+
+    return temp
+
+
+def parse_nominations(DF, PROFILE=SCP_2021):
+    """
+    DF => Dataframe object
+    PROFILE => StudyProfile object (nomination columns and slot count)
+
+    This function is named nominations ... e.g., Dean Baltiansky
+
+    Each nomination column is split into PROFILE.slots slot columns
+    (or more, if a participant nominates more people), e.g.
+        * SU_Nom => SU_Nom_1, SU_Nom_2, SU_Nom_3
+        * NSU_Rel => NSU1_Rel, NSU2_Rel, NSU3_Rel
+    """
+
+    for parent in PROFILE.nominations:
+
+        slot_columns = PROFILE.slot_columns(parent)
+
+        # Not every participant has every variable ... this will standardize it
+        if parent not in DF.columns:
+            DF[parent] = np.nan
+
+        for new_var in slot_columns:
+            DF[new_var] = [''] * len(DF)                                    # Create empty column
+
+        for ix, value in enumerate(DF[parent]):
+
+            # Skip over null, "None", and "PNA" values
+            if not isinstance(value, str) or value in ["None", "PNA"]:
+                continue
+
+            value = value.replace("\"", "\'").split("\',")                  # Replace double-quotes, split on comma b/w nominees
+
+            for k, new_val in enumerate(value):
+                new_var = PROFILE.nominations[parent].format(k+1)           # E.g., SU_Nom_1
+
+                # Nominees beyond the last slot get columns of their own
+                if new_var not in slot_columns:
+                    slot_columns.append(new_var)
+                    DF[new_var] = [''] * len(DF)
+
+                for char in ["[", "]"]:
+                    new_val = new_val.replace(char, "")                     # Strip out square brackets
+
+                new_val = new_val.strip()                                   # Remove leading / trailing space
+
+                DF.loc[ix, new_var] = new_val                               # Push isolated nominee to DF
+
+        for new_var in slot_columns:
+
+            # Run cleanup_values function again to strip out leading / trailing characters (for roster matching)
+            DF[new_var] = DF[new_var].apply(lambda x: cleanup_values(x))
+
+    return DF
+
+
+def melt_nominations(DF, PROFILE=SCP_2021, KEYS=('username', 'login-node', 'id')):
+    """
+    DF => Parsed DataFrame object (one row per ping, slot columns wide)
+    PROFILE => StudyProfile object (nomination columns)
+    KEYS => Columns carried along with every nominee (when present)
+
+    Inverse of the wide slot layout, in one vectorized pass
+    Returns long DataFrame object (KEYS, nomination, slot, nominee), one row per non-empty slot
+    """
+
+    slots = PROFILE.nomination_slots(DF.columns)
+    keys = [x for x in KEYS if x in DF.columns]
+
+    if not slots:
+        return pd.DataFrame(columns=keys + ['nomination', 'slot', 'nominee'])
+
+    long = DF.loc[:, keys + [x[0] for x in slots]].melt(id_vars=keys, var_name='slot_column',
+                                                         value_name='nominee')
+
+    # Back to row order (each ping's slots together), so the output doesn't depend on how DF was chunked
+    long['row'] = np.tile(np.arange(len(DF)), len(slots))
+    long = long.sort_values('row', kind='stable')
+
+    # Empty slots and skipped answers aren't nominees
+    long = long[long['nominee'].notna()]
+    long = long[~long['nominee'].astype(str).isin(['', 'None', 'PNA', 'nan'])]
+
+    lookup = pd.DataFrame(slots, columns=['slot_column', 'nomination', 'slot'])
+    long = long.merge(lookup, on='slot_column', how='left')
+
+    return long.loc[:, keys + ['nomination', 'slot', 'nominee']].reset_index(drop=True)
+
+
+def parse_race(DF, PROFILE=SCP_2021):
+    """
+    DF => DataFrame object
+    PROFILE => StudyProfile object (multi-select columns)
+
+    This function un-nests race responses (and any other multi-select
+    question in PROFILE.multi_select)
+    Returns list of all responses marked True (may be more than one)
+    """
+
+    def isolate_race_value(x):
+        """
+        x => Isolated value derived from lambda
+
+        This function will be applied via lambda function
+        Returns list of True values
+        """
+
+        try:
+
+            # Strip out all quotes
+            temp = x.replace("\"", "").replace("\'", "")
+
+            # Split on category and isolate responses that were marked true
+            race_vals = [k.split(',')[0] for k in temp.split('],') if "True" in k]
+
+            # Strip out square brackets
+            race_vals = [k.strip().replace('[', '').replace(']', '') for k in race_vals]
+
+            return race_vals
+
+        except:
+
+            # In the case of missing data
+            return None
+
+    for var_name in PROFILE.multi_select:
+
+        # If key doesn't exist, create empty column
+        if var_name not in DF.columns:
+            DF[var_name] = np.nan
+            continue
+
+        # Apply isolate_race_value helper function
+        DF[var_name] = DF[var_name].apply(lambda x: isolate_race_value(x))
+
+    return DF
+
+
+def remove_brackets(DF, PROFILE=SCP_2021):
+    """
+    DF => DataFrame object
+    PROFILE => StudyProfile object (bracketed columns)
+
+    Removes square brackets from every column in PROFILE.strip_brackets
+    """
+
+    for var_name in PROFILE.strip_brackets:
+
+        # If key doesn't exist, create empty column
+        if var_name not in DF.columns:
+            DF[var_name] = np.nan
+            continue
+
+        DF[var_name] = DF[var_name].str.replace(r'[][]', '', regex=True)
+
+    return DF
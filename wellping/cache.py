@@ -0,0 +1,301 @@
+#!/bin/python3
+
+"""
+About this Script
+
+Memoized parse results for notebook workflows. A finished run's tables are pickled
+under a key built from the export (path, size, mtime, content hash), the parser
+version (a hash of this package's source), and the run's options. Re-running the
+same cell returns the DataFrames straight from memory, or from disk in a new session,
+instead of decoding and parsing the export again
+
+    * cache_key => Key for one export + configuration
+    * ResultCache => Small in-memory LRU in front of a size-limited directory of pickles
+    * read_outputs => A finished run's tables, read back from the aggregate directory
+
+Ian Ferguson | Stanford University
+"""
+
+# ----------- Imports
+import os, glob, pickle, hashlib, pathlib
+from collections import OrderedDict
+from functools import lru_cache
+import pandas as pd
+
+from . import jsonio
+from .files import load_dtypes
+from .aggregate import restore_dtypes
+
+
+# ----------- Definitions
+CACHE_LIMIT = 2 * 1024 ** 3                                                 # Bytes on disk before old entries go
+MEMORY_ENTRIES = 2                                                          # Results kept in memory per process
+DIGESTS_NAME = "digests.json"
+
+# Shared by every ResultCache in this process, so a re-executed cell that builds a new parser still hits
+MEMORY = OrderedDict()
+
+
+@lru_cache(maxsize=None)
+def parser_version():
+    """
+    Any change to the parsing code invalidates every cached result
+    Returns hex digest of this package's source files
+    """
+
+    digest = hashlib.sha1()
+
+    for source in sorted(pathlib.Path(__file__).parent.glob("*.py")):
+        digest.update(source.name.encode("utf-8"))
+        digest.update(source.read_bytes())
+
+    return digest.hexdigest()
+
+
+def content_digest(PATH, DIRECTORY, JSON_BACKEND="auto", BLOCK_SIZE=1 << 23):
+    """
+    PATH => Relative path to the Wellping export
+    DIRECTORY => Cache directory, where digests are remembered
+    JSON_BACKEND => Encoder / decoder for the digest file (see jsonio.BACKENDS)
+    BLOCK_SIZE => Bytes hashed per read
+
+    Hashing a multi-GB export is cheap next to parsing it, but it is still done only
+    once per (path, size, mtime) ... repeat calls on an unchanged file skip the read
+    Returns hex digest of the file's bytes
+    """
+
+    stat = os.stat(PATH)
+    signature = f"{os.path.abspath(PATH)}|{stat.st_size}|{stat.st_mtime_ns}"
+    digests_name = os.path.join(DIRECTORY, DIGESTS_NAME)
+
+    digests = {}
+
+    if os.path.exists(digests_name):
+        with open(digests_name, "rb") as incoming:
+            digests = jsonio.load(incoming, JSON_BACKEND)
+
+    if signature in digests:
+        return digests[signature]
+
+    digest = hashlib.blake2b(digest_size=20)
+
+    with open(PATH, "rb") as incoming:
+        for block in iter(lambda: incoming.read(BLOCK_SIZE), b""):
+            digest.update(block)
+
+    # Only the latest signature per path is worth keeping
+    path = os.path.abspath(PATH)
+    digests = {x: y for x, y in digests.items() if not x.startswith(f"{path}|")}
+    digests[signature] = digest.hexdigest()
+
+    with open(f"{digests_name}.tmp", "wb") as outgoing:
+        jsonio.dump(digests, outgoing, JSON_BACKEND, INDENT=2)
+
+    os.replace(f"{digests_name}.tmp", digests_name)
+
+    return digests[signature]
+
+
+def cache_key(PATH, CONFIG, DIRECTORY, JSON_BACKEND="auto"):
+    """
+    PATH => Relative path to the Wellping export
+    CONFIG => Dictionary of options that change the results (JSON-serializable)
+    DIRECTORY => Cache directory
+    JSON_BACKEND => Encoder / decoder for the digest file (see jsonio.BACKENDS)
+
+    Returns hex key
+    """
+
+    stat = os.stat(PATH)
+
+    identity = {"path": os.path.abspath(PATH),
+                "size": stat.st_size,
+                "mtime": stat.st_mtime_ns,
+                "content": content_digest(PATH, DIRECTORY, JSON_BACKEND),
+                "version": parser_version(),
+                "config": CONFIG}
+
+    return hashlib.sha1(jsonio.dumps(identity, "stdlib")).hexdigest()
+
+
+class ResultCache:
+    """
+    Parsed tables (name => DataFrame) per cache key. Lookups try this process's memory
+    first, then the pickles on disk; the least recently used pickles are removed once
+    the directory holds more than LIMIT bytes
+
+    * DIRECTORY: Relative path to the cache directory (created if needed)
+    * LIMIT: Maximum bytes of pickles kept on disk
+    """
+
+    def __init__(self, DIRECTORY, LIMIT=CACHE_LIMIT):
+
+        self.directory = DIRECTORY
+        self.limit = LIMIT
+
+        pathlib.Path(DIRECTORY).mkdir(exist_ok=True, parents=True)
+
+
+    def _entry(self, KEY):
+        return os.path.join(self.directory, f"{KEY}.pkl")
+
+
+    def get(self, KEY):
+        """
+        KEY => Key from cache_key
+
+        Returns dictionary of DataFrames, or None on a miss
+        """
+
+        if KEY in MEMORY:
+            MEMORY.move_to_end(KEY)
+            return MEMORY[KEY]
+
+        entry = self._entry(KEY)
+
+        if not os.path.exists(entry):
+            return None
+
+        try:
+            with open(entry, "rb") as incoming:
+                tables = pickle.load(incoming)
+        except Exception:
+
+            # Half-written or from an incompatible pandas ... treat as a miss
+            os.remove(entry)
+            return None
+
+        os.utime(entry)                                                     # Recently used => evicted last
+        self._remember(KEY, tables)
+
+        return tables
+
+
+    def put(self, KEY, TABLES):
+        """
+        KEY => Key from cache_key
+        TABLES => Dictionary of name => DataFrame
+        """
+
+        entry = self._entry(KEY)
+
+        with open(f"{entry}.tmp", "wb") as outgoing:
+            pickle.dump(TABLES, outgoing, protocol=pickle.HIGHEST_PROTOCOL)
+
+        os.replace(f"{entry}.tmp", entry)
+
+        self._remember(KEY, TABLES)
+        self.evict()
+
+
+    def _remember(self, KEY, TABLES):
+
+        MEMORY[KEY] = TABLES
+        MEMORY.move_to_end(KEY)
+
+        while len(MEMORY) > MEMORY_ENTRIES:
+            MEMORY.popitem(last=False)
+
+
+    def evict(self):
+        """
+        Removes the least recently used pickles until the directory fits in the limit
+        Returns list of keys removed
+        """
+
+        entries = sorted(glob.glob(os.path.join(self.directory, "*.pkl")), key=os.path.getmtime)
+        total = sum(os.path.getsize(x) for x in entries)
+        removed = []
+
+        # The newest entry always stays, even if it alone is over the limit
+        while total > self.limit and len(entries) > 1:
+            entry = entries.pop(0)
+            total -= os.path.getsize(entry)
+            os.remove(entry)
+
+            removed.append(os.path.basename(entry)[:-4])
+            MEMORY.pop(removed[-1], None)
+
+        return removed
+
+
+    def clear(self):
+        """
+        Removes every cached result
+        """
+
+        for entry in glob.glob(os.path.join(self.directory, "*.pkl")):
+            MEMORY.pop(os.path.basename(entry)[:-4], None)
+            os.remove(entry)
+
+
+def read_outputs(AGGREGATE_DIR, OUTPUT_FILENAME, FORMAT="csv", LAYOUT="wide", DEDUP=None, COMPLIANCE=False,
+                 ROSTER=False, NETWORK=False, TYPED=False):
+    """
+    AGGREGATE_DIR => Relative path to aggregate outputs
+    OUTPUT_FILENAME => Export filename (e.g., test_data)
+    FORMAT => One of files.OUTPUT_FORMATS used for the run
+    LAYOUT => One of files.LAYOUTS used for the run
+    DEDUP, COMPLIANCE, ROSTER, NETWORK => Which optional tables the run wrote
+    TYPED => Boolean, the run kept typed answers (see typed.py)
+
+    Only the tables this configuration writes are read, so stale files from an
+    earlier run with other options don't leak in. CSVs are read as strings, the
+    way every other reader in this package reads an aggregate, except that a typed
+    CSV aggregate gets its dtypes back from the map the run saved (see files.save_dtypes)
+    Returns dictionary of name => DataFrame (pings or answers, devices, ...)
+    """
+
+    tables = {"answers" if LAYOUT == "long" else "pings": FORMAT, "devices": FORMAT}
+
+    if DEDUP:
+        tables["merged-pings"] = "csv"
+
+    if COMPLIANCE:
+        tables.update({"compliance": "csv", "compliance-summary": "csv"})
+
+    if ROSTER:
+        tables["roster-matches"] = "csv"
+
+    if NETWORK:
+        tables["edges"] = "csv"
+
+    output = {}
+
+    for name, extension in tables.items():
+        table_name = os.path.join(AGGREGATE_DIR, f"{name}_{OUTPUT_FILENAME}.{extension}")
+
+        if not os.path.exists(table_name):
+            continue
+
+        if extension == "parquet":
+            output[name] = pd.read_parquet(table_name)
+        else:
+            output[name] = pd.read_csv(table_name, dtype=str, keep_default_na=False, encoding="utf-8-sig")
+
+            if TYPED and name == "pings":
+                output[name] = restore_table(output[name], load_dtypes(AGGREGATE_DIR, OUTPUT_FILENAME))
+
+    return output
+
+
+def restore_table(DF, DTYPES):
+    """
+    DF => DataFrame object read from a typed CSV aggregate (every cell a string)
+    DTYPES => Dictionary of column => dtype name (see files.save_dtypes)
+
+    Empty cells of typed columns become missing again; text columns keep their empty strings
+    Returns DataFrame object with the run's dtypes
+    """
+
+    typed = {x: y for x, y in DTYPES.items() if x in DF.columns and y not in ("str", "object")}
+
+    for column in typed:
+        DF[column] = DF[column].where(DF[column] != "")
+
+    DF = restore_dtypes(DF, typed)
+
+    for column in [x for x, y in typed.items() if y == "category"]:
+        DF[column] = DF[column].astype("category")
+
+    return DF
@@ -0,0 +1,156 @@
+#!/bin/python3
+
+"""
+About this Script
+
+Checkpoints for chunked runs. Every time a chunk of participants is flushed to disk,
+the keys that are finished, the part files that hold them, and how far the log and
+parent-errors files had got are written to one small JSON file next to the parts.
+A resumed run skips the finished keys, rolls the logs back to the checkpoint, and
+rebuilds the aggregate from the parts that already exist
+
+Ian Ferguson | Stanford University
+"""
+
+# ----------- Imports
+import os, hashlib
+
+from . import jsonio
+from .files import SubjectArchive, clear_subjects
+
+
+# ----------- Definitions
+CHECKPOINT_NAME = "checkpoint.json"
+
+# --resume without --chunk-size checkpoints every N participants
+CHECKPOINT_CHUNK_SIZE = 500
+
+
+def fingerprint(JSON_PATH, KEYS, PROFILE, CHUNK_SIZE, TYPED, SUBJECTS="csv", COMPLIANCE=False):
+    """
+    JSON_PATH => Relative path to the Wellping export
+    KEYS => Participant keys this run will parse
+    PROFILE => StudyProfile object
+    CHUNK_SIZE => Integer, participants per part
+    TYPED => Boolean, typed answers
+    SUBJECTS => One of files.SUBJECT_CONTAINERS
+    COMPLIANCE => Boolean, compliance schedule kept with the parts
+
+    A run can only resume parts written from the same export with the same options
+    Returns dictionary
+    """
+
+    digest = hashlib.sha1("\n".join(KEYS).encode("utf-8")).hexdigest()
+
+    return {"source": os.path.basename(JSON_PATH),
+            "size": os.path.getsize(JSON_PATH),
+            "keys": digest,
+            "profile": PROFILE.name,
+            "chunk_size": CHUNK_SIZE,
+            "typed": bool(TYPED),
+            "subjects": SUBJECTS,
+            "compliance": bool(COMPLIANCE)}
+
+
+def new_checkpoint(FINGERPRINT):
+    """
+    FINGERPRINT => Dictionary (see fingerprint)
+
+    Returns empty checkpoint dictionary
+    """
+
+    return {"fingerprint": FINGERPRINT,
+            "parts": [],
+            "dtypes": {},
+            "done": [],
+            "parent_error_count": 0,
+            "log_bytes": 0,
+            "parent_errors_bytes": 0,
+            "quarantined": [],
+            "quarantine_bytes": 0,
+            "subjects": [],
+            "archive_start_dir": None}
+
+
+def load_checkpoint(PART_DIR, FINGERPRINT, JSON_BACKEND="auto"):
+    """
+    PART_DIR => Relative path to directory holding aggregate parts
+    FINGERPRINT => Dictionary for this run (see fingerprint)
+    JSON_BACKEND => Decoder to use (see jsonio.BACKENDS)
+
+    Returns checkpoint dictionary, or None when there is nothing to resume
+    """
+
+    checkpoint_name = os.path.join(PART_DIR, CHECKPOINT_NAME)
+
+    if not os.path.exists(checkpoint_name):
+        return None
+
+    with open(checkpoint_name, "rb") as incoming:
+        state = jsonio.load(incoming, JSON_BACKEND)
+
+    if state["fingerprint"] != FINGERPRINT:
+        changed = [x for x in FINGERPRINT if state["fingerprint"].get(x) != FINGERPRINT[x]]
+        raise ValueError(f"Checkpoint in {PART_DIR} was written with a different {', '.join(changed)} ... "
+                         "rerun without --resume to start over")
+
+    return state
+
+
+def save_checkpoint(PART_DIR, STATE, JSON_BACKEND="auto"):
+    """
+    PART_DIR => Relative path to directory holding aggregate parts
+    STATE => Checkpoint dictionary
+    JSON_BACKEND => Encoder to use (see jsonio.BACKENDS)
+
+    Written to a temporary file and swapped in, so a kill mid-write
+    leaves the previous checkpoint intact
+    Returns nothing, functions inplace
+    """
+
+    checkpoint_name = os.path.join(PART_DIR, CHECKPOINT_NAME)
+
+    with open(f"{checkpoint_name}.tmp", "wb") as outgoing:
+        jsonio.dump(STATE, outgoing, JSON_BACKEND)
+        outgoing.flush()
+        os.fsync(outgoing.fileno())
+
+    os.replace(f"{checkpoint_name}.tmp", checkpoint_name)
+
+
+def rollback(STATE, KEYS, LOG_NAME, PARENT_ERRORS_NAME, SUBJECT_DIR, ARCHIVE=None, ARCHIVE_TOC=None,
+             QUARANTINE_NAME=None):
+    """
+    STATE => Checkpoint dictionary being resumed
+    KEYS => Participant keys this run will parse
+    LOG_NAME => Text file to log parsing errors
+    PARENT_ERRORS_NAME => parent-errors.jsonl
+    SUBJECT_DIR => Relative path to subject-wise CSVs
+    ARCHIVE => Optional relative path to the subject archive (see files.SubjectArchive)
+    ARCHIVE_TOC => Table of contents saved with the checkpoint
+    QUARANTINE_NAME => Optional quarantine.jsonl (see validate.py)
+
+    Anything written after the checkpoint belongs to participants that will be
+    parsed again ... truncate the logs and remove their subject-wise CSVs (only
+    for this run's usernames, so other workers' files are left alone)
+    Returns nothing, functions inplace
+    """
+
+    streams = [(LOG_NAME, STATE["log_bytes"]), (PARENT_ERRORS_NAME, STATE["parent_errors_bytes"])]
+
+    if QUARANTINE_NAME:
+        streams.append((QUARANTINE_NAME, STATE.get("quarantine_bytes", 0)))
+
+    for name, size in streams:
+        if os.path.exists(name):
+            os.truncate(name, size)
+        else:
+            open(name, "w").close()
+
+    if ARCHIVE and STATE.get("archive_start_dir") is not None:
+        SubjectArchive.restore(ARCHIVE, STATE["archive_start_dir"], ARCHIVE_TOC)
+    elif ARCHIVE and os.path.exists(ARCHIVE):
+        os.remove(ARCHIVE)
+
+    done = set(STATE["done"])
+    clear_subjects(SUBJECT_DIR, [x.split('-')[0] for x in KEYS if x not in done], STATE["subjects"])
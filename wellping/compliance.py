@@ -0,0 +1,196 @@
+#!/bin/python3
+
+"""
+About this Script
+
+Compliance / adherence metrics, computed while the export is parsed. Every participant
+contributes a compact schedule (one row per scheduled ping, answered or not), and the
+metrics are vectorized group-bys over the whole schedule at the end of the run:
+
+    * Response rate => answered / scheduled pings, per day and stream
+    * Latency => notificationTime to startTime (seconds)
+    * Duration => startTime to endTime (seconds)
+    * Streaks => runs of consecutive answered / missed pings, in notification order
+
+Ian Ferguson | Stanford University
+"""
+
+# ----------- Imports
+import os
+import pandas as pd
+import numpy as np
+
+from .aggregate import categorize, concat_categorical
+
+
+# ----------- Definitions
+SCHEDULE_COLUMNS = ['username', 'login-node', 'streamName', 'id', 'notificationTime',
+                    'startTime', 'endTime', 'tzOffset', 'answered']
+
+DAILY_COLUMNS = ['username', 'streamName', 'date', 'scheduled', 'answered', 'response_rate',
+                 'latency_median_s', 'duration_median_s']
+
+SUMMARY_COLUMNS = ['username', 'scheduled', 'answered', 'response_rate', 'latency_median_s',
+                   'duration_median_s', 'longest_streak', 'current_streak', 'longest_missed']
+
+
+def ping_schedule(KEY, SUBSET):
+    """
+    KEY => Key from the master data dictionary
+    SUBSET => Reduced dictionary of participant-only data
+
+    A ping counts as answered when at least one answer carries its ID
+    Returns DataFrame object with SCHEDULE_COLUMNS
+    """
+
+    schedule = pd.DataFrame(SUBSET['pings']).reindex(columns=SCHEDULE_COLUMNS[2:-1])
+
+    schedule.insert(0, 'username', KEY.split('-')[0])
+    schedule.insert(1, 'login-node', "".join(KEY.split('-')[1:]))
+
+    answered = set(x.get('pingId') for x in SUBSET['answers'])
+    schedule['answered'] = schedule['id'].isin(answered)
+
+    return categorize(schedule, ['username', 'login-node', 'streamName'])
+
+
+def flush_schedule(SCHEDULE, PART_DIR, IX):
+    """
+    SCHEDULE => List of schedule DataFrames (see ping_schedule)
+    PART_DIR => Relative path to directory holding aggregate parts
+    IX => Integer, running index of this chunk
+
+    Chunked runs keep the schedule on disk next to the aggregate parts
+    Returns part filename
+    """
+
+    part_name = os.path.join(PART_DIR, f"schedule-{IX:05d}.csv")
+    concat_categorical(SCHEDULE).to_csv(part_name, index=False, encoding="utf-8")
+
+    return part_name
+
+
+def load_schedule(PARTS, SCHEDULE=()):
+    """
+    PARTS => Schedule part filenames (see flush_schedule)
+    SCHEDULE => Schedule DataFrames still in memory
+
+    Returns DataFrame object with SCHEDULE_COLUMNS
+    """
+
+    frames = [pd.read_csv(x, dtype=str, keep_default_na=False) for x in PARTS]
+    frames += list(SCHEDULE)
+
+    if not frames:
+        return pd.DataFrame(columns=SCHEDULE_COLUMNS)
+
+    schedule = concat_categorical(frames).reset_index(drop=True)
+    schedule['answered'] = schedule['answered'].astype(str) == "True"
+
+    return schedule
+
+
+def streaks(ANSWERED, USERS):
+    """
+    ANSWERED => Boolean array, pings sorted by user then notification time
+    USERS => Array of usernames, same order
+
+    Vectorized run-length encoding ... a new run starts whenever the user
+    or the answered flag changes
+    Returns DataFrame object (username, longest_streak, current_streak, longest_missed)
+    """
+
+    ANSWERED = np.asarray(ANSWERED, dtype=bool)
+    USERS = np.asarray(USERS, dtype=object)
+
+    if len(ANSWERED) == 0:
+        return pd.DataFrame(columns=['username', 'longest_streak', 'current_streak', 'longest_missed'])
+
+    starts = np.ones(len(ANSWERED), dtype=bool)
+    starts[1:] = (ANSWERED[1:] != ANSWERED[:-1]) | (USERS[1:] != USERS[:-1])
+
+    run_id = np.cumsum(starts) - 1
+    runs = pd.DataFrame({'username': USERS[starts],
+                         'answered': ANSWERED[starts],
+                         'length': np.bincount(run_id)})
+
+    longest = runs.pivot_table(index='username', columns='answered', values='length',
+                               aggfunc='max', fill_value=0, observed=True) \
+                  .reindex(columns=[True, False], fill_value=0)
+
+    last = runs.groupby('username', sort=False).tail(1).set_index('username')
+    current = last['length'].where(last['answered'], 0)
+
+    return pd.DataFrame({'longest_streak': longest[True],
+                         'current_streak': current,
+                         'longest_missed': longest[False]}) \
+             .rename_axis('username').reset_index()
+
+
+def compliance_metrics(SCHEDULE):
+    """
+    SCHEDULE => DataFrame object with SCHEDULE_COLUMNS (every participant)
+
+    Pings repeated across logins of one username count once (answered wins).
+    Days are local to the participant (notification time shifted by tzOffset,
+    in minutes behind UTC)
+    Returns tuple of (daily DataFrame with DAILY_COLUMNS, summary DataFrame with SUMMARY_COLUMNS)
+    """
+
+    schedule = SCHEDULE.astype({'username': object, 'streamName': object}) \
+                       .sort_values('answered', ascending=False, kind='stable') \
+                       .drop_duplicates(['username', 'id'])
+
+    notified = pd.to_datetime(schedule['notificationTime'], utc=True, errors='coerce', format='ISO8601')
+    started = pd.to_datetime(schedule['startTime'], utc=True, errors='coerce', format='ISO8601')
+    ended = pd.to_datetime(schedule['endTime'], utc=True, errors='coerce', format='ISO8601')
+
+    offset = pd.to_timedelta(pd.to_numeric(schedule['tzOffset'], errors='coerce').fillna(0), unit='m')
+    answered = schedule['answered'].to_numpy()
+
+    metrics = pd.DataFrame({'username': schedule['username'].to_numpy(),
+                            'streamName': schedule['streamName'].to_numpy(),
+                            'date': (notified - offset).dt.date.to_numpy(),
+                            'notified': notified.to_numpy(),
+                            'answered': answered,
+                            'latency': np.where(answered, (started - notified).dt.total_seconds(), np.nan),
+                            'duration': np.where(answered, (ended - started).dt.total_seconds(), np.nan)})
+
+    aggregations = dict(scheduled=('answered', 'size'),
+                        answered=('answered', 'sum'),
+                        latency_median_s=('latency', 'median'),
+                        duration_median_s=('duration', 'median'))
+
+    daily = metrics.groupby(['username', 'streamName', 'date'], sort=True, dropna=False) \
+                   .agg(**aggregations).reset_index()
+    daily['response_rate'] = (daily['answered'] / daily['scheduled']).round(4)
+
+    summary = metrics.groupby('username', sort=True).agg(**aggregations).reset_index()
+    summary['response_rate'] = (summary['answered'] / summary['scheduled']).round(4)
+
+    # Streaks run in notification order within each participant
+    ordered = metrics.sort_values(['username', 'notified'], kind='stable')
+    summary = summary.merge(streaks(ordered['answered'], ordered['username']), on='username', how='left')
+
+    return daily.reindex(columns=DAILY_COLUMNS), summary.reindex(columns=SUMMARY_COLUMNS)
+
+
+def save_compliance(SCHEDULE, OUTPUT_DIR, FILENAME):
+    """
+    SCHEDULE => DataFrame object with SCHEDULE_COLUMNS
+    OUTPUT_DIR => Relative path to aggregate outputs
+    FILENAME => Export filename (e.g., test_data)
+
+    Saves the following:
+        * compliance_{ filename }.csv => One row per participant, stream, and day
+        * compliance-summary_{ filename }.csv => One row per participant
+
+    Returns summary DataFrame
+    """
+
+    daily, summary = compliance_metrics(SCHEDULE)
+
+    daily.to_csv(os.path.join(OUTPUT_DIR, f"compliance_{FILENAME}.csv"), index=False, encoding="utf-8-sig")
+    summary.to_csv(os.path.join(OUTPUT_DIR, f"compliance-summary_{FILENAME}.csv"), index=False, encoding="utf-8-sig")
+
+    return summary
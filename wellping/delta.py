@@ -0,0 +1,133 @@
+#!/bin/python3
+
+"""
+About this Script
+
+Delta exports between two Wellping snapshots. Consecutive exports overlap almost
+entirely, so a compact index of every answer in the previous snapshot (participant
+key, ping ID, answer date, and a digest of the answers themselves) is enough to tell
+which pings are new, were answered again, or had their answers edited. Only those
+pings are parsed, and downstream loads take the delta instead of the full study
+
+    * ping_index => Index rows for one participant
+    * load_ping_index => Index from a saved index file or straight from a previous export
+    * changed_pings => Pings in a participant's data that the index hasn't seen
+    * reduce_subset => Participant data narrowed to those pings, ready for parse_responses
+
+Ian Ferguson | Stanford University
+"""
+
+# ----------- Imports
+import hashlib
+from collections import defaultdict
+import pandas as pd
+
+from . import jsonio
+
+
+# ----------- Definitions
+INDEX_COLUMNS = ['key', 'id', 'date', 'digest']
+PING_INDEX_NAME = "ping-index.csv.gz"
+
+
+def ping_index(KEY, SUBSET):
+    """
+    KEY => Key from the master data dictionary
+    SUBSET => Reduced dictionary of participant-only data
+
+    The digest covers every answer given on that date, so an edited answer shows up
+    even when the ping and date are unchanged
+    Returns list of (key, ping ID, answer date, digest) tuples, one per distinct answer date
+    """
+
+    answers = defaultdict(list)
+
+    for answer in SUBSET['answers']:
+        answers[(answer.get('pingId'), answer.get('date'))].append(answer)
+
+    return [(KEY, ping_id, date, hashlib.blake2b(jsonio.dumps(group, "stdlib"), digest_size=8).hexdigest())
+            for (ping_id, date), group in answers.items()]
+
+
+def save_ping_index(ROWS, PATH):
+    """
+    ROWS => Iterable of (key, ping ID, answer date, digest) tuples
+    PATH => Output filename (gzipped CSV, e.g. ping-index.csv.gz)
+
+    Returns number of rows written
+    """
+
+    index = pd.DataFrame(list(ROWS), columns=INDEX_COLUMNS)
+    index.to_csv(PATH, index=False, encoding="utf-8")
+
+    return len(index)
+
+
+def load_ping_index(PATH, JSON_BACKEND="auto"):
+    """
+    PATH => Saved index (see save_ping_index), or a previous Wellping export (.json)
+    JSON_BACKEND => Decoder to use for an export (see jsonio.BACKENDS)
+
+    Indexes saved before digests were kept load with a digest of None
+    Returns dictionary of key => set of (ping ID, answer date, digest) tuples
+    """
+
+    previous = defaultdict(set)
+
+    if PATH.endswith(".json"):
+        with open(PATH, "rb") as incoming:
+            data = jsonio.load(incoming, JSON_BACKEND)
+
+        for key, subset in data.items():
+            previous[key].update(x[1:] for x in ping_index(key, subset))
+
+        return previous
+
+    index = pd.read_csv(PATH, dtype=str, keep_default_na=False)
+
+    digests = index['digest'] if 'digest' in index else [None] * len(index)
+
+    for key, ping_id, date, digest in zip(index['key'], index['id'], index['date'], digests):
+        previous[key].add((ping_id, date, digest))
+
+    return previous
+
+
+def changed_pings(KEY, SUBSET, PREVIOUS):
+    """
+    KEY => Key from the master data dictionary
+    SUBSET => Reduced dictionary of participant-only data
+    PREVIOUS => Dictionary from load_ping_index
+
+    A ping is new when the index has no answers for it, and changed when it has
+    some but not all of the answer dates it carries now, or an answer on one of
+    those dates was edited (its digest differs)
+    Returns dictionary of ping ID => "new" | "changed"
+    """
+
+    seen = PREVIOUS.get(KEY, set())
+    current = set(x[1:] for x in ping_index(KEY, SUBSET))
+
+    # An index from before digests only knows the dates, so edits can't be told apart there
+    undigested = set((ping_id, date) for ping_id, date, digest in seen if digest is None)
+    fresh = set(ping_id for ping_id, date, _ in current - seen if (ping_id, date) not in undigested)
+
+    if not fresh:
+        return {}
+
+    known = set(ping_id for ping_id, _, _ in seen)
+
+    return {x: "changed" if x in known else "new" for x in fresh}
+
+
+def reduce_subset(SUBSET, PING_IDS):
+    """
+    SUBSET => Reduced dictionary of participant-only data
+    PING_IDS => Ping IDs to keep
+
+    Returns participant dictionary with only these pings and their answers
+    """
+
+    return {**SUBSET,
+            'pings': [x for x in SUBSET['pings'] if x.get('id') in PING_IDS],
+            'answers': [x for x in SUBSET['answers'] if x.get('pingId') in PING_IDS]}
@@ -0,0 +1,91 @@
+#!/bin/python3
+
+"""
+About this Script
+
+Device and app info for each participant. Records are gathered as plain
+dictionaries while participants are read, and the devices table is built in
+one step at the end (saved locally as a CSV)
+
+Ian Ferguson | Stanford University
+"""
+
+
+# ----- Imports
+import pandas as pd
+
+
+# ----- Functions
+def device_record(SUBSET, KEY):
+    """
+    SUBSET => Particpant's reduced JSON file (as Python dictionary)
+    KEY => Key from the JSON data dictionary
+
+    Device and app info as one plain record, no DataFrames. Columns match the
+    original one-row merges: fields shared by device and app (always including
+    login_time) get _x (device) and _y (app) suffixes
+
+    Returns dictionary
+    """
+
+    user = SUBSET['user']                                               # Isolate device information from JSON
+    username = user['username']                                         # Pull in username from data dictionary
+    login_time = KEY.split('-')[-1]                                     # Isolate subject login time from data key
+
+    device, app = ({**{x: y for x, y in user['installation'][key].items() if x != 'username'},
+                    'login_time': login_time} for key in ['device', 'app'])
+
+    shared = set(device) & set(app)
+
+    record = {'username': username}
+    record.update({f"{x}_x" if x in shared else x: y for x, y in device.items()})
+    record.update({f"{x}_y" if x in shared else x: y for x, y in app.items()})
+
+    return record
+
+
+def devices_table(RECORDS):
+    """
+    RECORDS => List of dictionaries from device_record
+
+    One bulk normalization for the whole study (columns in order of first appearance)
+    Returns DataFrame object
+    """
+
+    return pd.DataFrame.from_records(RECORDS) if RECORDS else pd.DataFrame(columns=['username'])
+
+
+def parse_device_info(SUBSET, KEY):
+    """
+    SUBSET => Particpant's reduced JSON file (as Python dictionary)
+    KEY => Key from the JSON data dictionary
+
+    This function flattens user device info into a single-row
+    DataFrame object (see device_record)
+
+    Returns DataFrame object
+    """
+
+    return devices_table([device_record(SUBSET, KEY)])
+
+
+def attach_device(PINGS, DEVICE):
+    """
+    PINGS => DataFrame object from pings.derive_pings (one participant)
+    DEVICE => Participant's user.installation.device dictionary
+
+    Broadcasts the device fields onto every ping (one value per column, no merge).
+    A field that clashes with a ping column gets _y, and the ping column _x
+    Returns DataFrame object
+    """
+
+    fields = {x: y for x, y in DEVICE.items() if x != 'username'}
+    shared = [x for x in fields if x in PINGS.columns and x != 'username']
+
+    PINGS = PINGS.rename(columns={x: f"{x}_x" for x in shared})
+
+    for field, value in fields.items():
+        PINGS[f"{field}_y" if field in shared else field] = [value] * len(PINGS) \
+            if isinstance(value, (list, dict)) else value
+
+    return PINGS
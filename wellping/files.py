@@ -0,0 +1,460 @@
+#!/bin/python3
+
+"""
+About this Script
+
+File-level helpers shared by every front-end: output directories, locating the
+export, the duplicate-response report, and streamed parent errors
+
+Ian Ferguson | Stanford University
+"""
+
+# ----------- Imports
+import os, csv, json, shutil, zipfile, pathlib
+from collections import defaultdict
+from time import sleep
+import pandas as pd
+import numpy as np
+
+from . import jsonio
+from .aggregate import densify
+
+
+# ----------- Definitions
+
+# ----- Global
+def setup(PATH, SUBDIRS=("00-Subjects", "01-Aggregate")):
+    """
+    PATH => Relative path to project directory
+    SUBDIRS => Output directories to create under PATH
+
+    Runs before parsing
+    Creates required output directories if they don't already exist
+    """
+
+    for output_path in SUBDIRS:
+
+        # Subjects => Subject specific CSVs
+        # Aggregate => Subject CSV, Device CSV, Parent errors JSON file
+
+        if not os.path.exists(os.path.join(".", PATH, output_path)):
+
+            print(f"Creating {output_path}...")
+
+            # Create the output directory if it doesn't exist
+            pathlib.Path(os.path.join(".", PATH, output_path)).mkdir(exist_ok=True, 
+                                                                     parents=True)
+
+            sleep(1.5)
+
+        else:
+
+            print(f"{output_path} exists...")
+
+
+def isolate_json_file(PATH):
+    """
+    PATH => Relative path to project directory
+
+    You should have ONE JSON file in your project directory
+    This function isolates it and returns:
+        * The JSON itself
+        * The isolated filename for later use
+    """
+
+    # Should be a list of length 1
+    files = [x for x in os.listdir(os.path.join(".", PATH)) if ".json" in x]
+
+    # Raise error if there are more than 1 JSON file
+    if len(files) > 1:
+        raise OSError(f"Your project directory should only have one JSON file ... check {PATH} again")
+
+    # E.g., test_data.json => test_data
+    filename = files[0].split('.json')[0]
+
+    return os.path.join(".", PATH, files[0]), filename
+
+
+def sanity_check(KEYS, OUTPUT_DIR):
+    """
+    KEYS => Keys from the JSON data dictionary
+    OUTPUT_DIR => Relative path to output directory
+
+    This function performs the following operations
+        * Group keys by subject ID (one pass, exact username match)
+        * If subject ID appears more than once, store in JSON
+        * Kick out duplicate JSON
+
+    Returns nothing, functions inplace
+    """
+
+    print("\nIdentifying duplicate subject responses...\n")
+
+    instances = defaultdict(list)                                       # Responses from single sub
+
+    for key in KEYS:
+        instances[key.split('-')[0]].append(key)
+
+    # Add to output dict if multiples exist
+    output_dict = {sub: {'count': len(keys), 'keys': keys}
+                   for sub, keys in instances.items() if len(keys) > 1}
+
+    print("\nSaving response-duplicates JSON file...\n")
+
+    # Push to local JSON file (the standard library keeps the file's long-standing formatting)
+    with open(os.path.join(OUTPUT_DIR, "response-duplicates.json"), "w") as outgoing:
+        json.dump(output_dict, outgoing, indent=4)
+
+
+# ----- Tables
+OUTPUT_FORMATS = ["csv", "parquet"]
+DENSE_BLOCK_ROWS = 50000                                                    # Rows of coded answers decoded per CSV write
+
+
+def columnar(DF):
+    """
+    DF => DataFrame object
+
+    Prepares a DataFrame for a columnar file: categorical and numeric columns are
+    kept as-is (categoricals become dictionary-encoded), other values are written
+    as the same strings the CSV would hold, with missing values left null
+    Returns DataFrame object
+    """
+
+    DF = DF.copy()
+
+    for column in DF.columns:
+        if DF[column].dtype != object:
+            continue
+
+        DF[column] = DF[column].map(lambda x: x if x is None or isinstance(x, str)
+                                    or (isinstance(x, float) and np.isnan(x)) else str(x))
+
+    return DF
+
+
+def write_table(DF, STEM, FORMAT="csv", VALUES=None):
+    """
+    DF => DataFrame object
+    STEM => Relative path to output file, without extension
+    FORMAT => One of OUTPUT_FORMATS (parquet requires pyarrow)
+    VALUES => Optional aggregate.AnswerValues object, when DF holds coded answers (see aggregate.sparsify)
+
+    Coded answers are decoded here, a block of rows at a time for CSV
+    Returns filename that was written
+    """
+
+    if FORMAT == "parquet":
+        output_name = f"{STEM}.parquet"
+        columnar(DF if VALUES is None else densify(DF, VALUES)).to_parquet(output_name, index=False)
+
+    elif VALUES is not None:
+        output_name = f"{STEM}.csv"
+
+        for start in range(0, max(len(DF), 1), DENSE_BLOCK_ROWS):
+            block = densify(DF.iloc[start:start + DENSE_BLOCK_ROWS], VALUES)
+
+            if start == 0:
+                block.to_csv(output_name, index=False, encoding="utf-8-sig")
+            else:
+                block.to_csv(output_name, index=False, header=False, mode="a", encoding="utf-8")
+
+    else:
+        output_name = f"{STEM}.csv"
+        DF.to_csv(output_name, index=False, encoding="utf-8-sig")
+
+    return output_name
+
+
+def save_dtypes(DTYPES, AGGREGATE_DIR, OUTPUT_FILENAME, JSON_BACKEND="auto"):
+    """
+    DTYPES => Dictionary of column => dtype name of a typed aggregate
+    AGGREGATE_DIR => Relative path to aggregate outputs
+    OUTPUT_FILENAME => Export filename (e.g., test_data)
+    JSON_BACKEND => Encoder to use (see jsonio.BACKENDS)
+
+    A typed CSV holds only text ... the map lets a reader restore the columns (see load_dtypes)
+    Returns filename that was written
+    """
+
+    output_name = os.path.join(AGGREGATE_DIR, f"dtypes_{OUTPUT_FILENAME}.json")
+
+    with open(output_name, "wb") as outgoing:
+        jsonio.dump(DTYPES, outgoing, JSON_BACKEND, INDENT=2)
+
+    return output_name
+
+
+def load_dtypes(AGGREGATE_DIR, OUTPUT_FILENAME, JSON_BACKEND="auto"):
+    """
+    AGGREGATE_DIR => Relative path to aggregate outputs
+    OUTPUT_FILENAME => Export filename (e.g., test_data)
+    JSON_BACKEND => Decoder to use (see jsonio.BACKENDS)
+
+    Returns dictionary of column => dtype name, empty when the run wasn't typed
+    """
+
+    input_name = os.path.join(AGGREGATE_DIR, f"dtypes_{OUTPUT_FILENAME}.json")
+
+    if not os.path.exists(input_name):
+        return {}
+
+    with open(input_name, "rb") as incoming:
+        return jsonio.load(incoming, JSON_BACKEND)
+
+
+# ----- Subject containers
+SUBJECT_CONTAINERS = ["csv", "zip"]
+SUBJECT_ARCHIVE_NAME = "subjects.zip"
+
+
+class SubjectArchive:
+    """
+    Every subject-wise CSV in one zip instead of thousands of small files. The zip's
+    central directory is the table of contents, so any one subject can be read
+    without touching the others (see read_subject)
+
+    * PATH: Relative path to the zip
+    * MODE: w => start a new archive, a => add to an existing one
+    """
+
+    def __init__(self, PATH, MODE="w"):
+
+        self.path = PATH
+        self.archive = zipfile.ZipFile(PATH, MODE, compression=zipfile.ZIP_DEFLATED)
+        self.names = set(self.archive.namelist())
+
+
+    def exists(self, NAME):
+        """
+        NAME => Member name (e.g., scp001.csv)
+        """
+
+        return NAME in self.names
+
+
+    def write(self, NAME, DF):
+        """
+        NAME => Member name (e.g., scp001.csv)
+        DF => DataFrame object, written as the same UTF-8 CSV a subject file would hold
+        """
+
+        with self.archive.open(NAME, "w") as outgoing:
+            DF.to_csv(outgoing, index=False, encoding="utf-8-sig")
+
+        self.names.add(NAME)
+
+
+    def checkpoint(self, SIDECAR):
+        """
+        SIDECAR => File to hold a copy of the table of contents
+
+        Closes the archive (writing its table of contents), keeps a copy of the table,
+        and reopens for appending. Appending overwrites the table in place, so after a
+        crash restore() puts the copy back
+        Returns byte offset where the table of contents starts
+        """
+
+        self.archive.close()
+
+        with zipfile.ZipFile(self.path, "r") as closed:
+            start_dir = closed.start_dir
+
+        with open(self.path, "rb") as incoming, open(SIDECAR, "wb") as outgoing:
+            incoming.seek(start_dir)
+            shutil.copyfileobj(incoming, outgoing)
+
+        self.archive = zipfile.ZipFile(self.path, "a", compression=zipfile.ZIP_DEFLATED)
+
+        return start_dir
+
+
+    @staticmethod
+    def restore(PATH, START_DIR, SIDECAR):
+        """
+        PATH => Relative path to the zip
+        START_DIR => Offset returned by checkpoint()
+        SIDECAR => Table of contents saved by checkpoint()
+
+        Rolls the archive back to exactly what it held at the checkpoint
+        """
+
+        os.truncate(PATH, START_DIR)
+
+        with open(SIDECAR, "rb") as incoming, open(PATH, "ab") as outgoing:
+            shutil.copyfileobj(incoming, outgoing)
+
+
+    def close(self):
+        self.archive.close()
+
+
+def clear_subjects(SUBJECT_DIR, USERNAMES, KEEP=()):
+    """
+    SUBJECT_DIR => Relative path to subject-wise CSVs
+    USERNAMES => Usernames about to be parsed
+    KEEP => Subject filenames to leave alone (e.g., finished before a checkpoint)
+
+    output() writes { username }_b.csv when { username }.csv exists, so a rerun into
+    the same directory has to clear its usernames' files first. Only these usernames
+    are touched, so other workers' files are left alone
+    Returns nothing, functions inplace
+    """
+
+    KEEP = set(KEEP)
+
+    for username in set(USERNAMES):
+        for subject_file in (f"{username}.csv", f"{username}_b.csv"):
+            if subject_file not in KEEP and os.path.exists(os.path.join(SUBJECT_DIR, subject_file)):
+                os.remove(os.path.join(SUBJECT_DIR, subject_file))
+
+
+def read_subject(ARCHIVE, NAME):
+    """
+    ARCHIVE => Relative path to a subject archive (see SubjectArchive)
+    NAME => Username (or member name, e.g. scp001_b.csv)
+
+    Returns DataFrame object for one subject
+    """
+
+    if not NAME.endswith(".csv"):
+        NAME = f"{NAME}.csv"
+
+    with zipfile.ZipFile(ARCHIVE, "r") as archive, archive.open(NAME) as incoming:
+        return pd.read_csv(incoming, encoding="utf-8-sig")
+
+
+# ----- Long layout
+LAYOUTS = ["wide", "long"]
+
+
+class LongWriter:
+    """
+    Streams tidy answer rows (see answers.long_answers) straight to one file,
+    so the long layout never holds more than one batch in memory
+
+    * STEM: Relative path to output file, without extension
+    * COLUMNS: Column names, in row order
+    * FORMAT: One of OUTPUT_FORMATS (parquet requires pyarrow)
+    * BATCH_ROWS: Rows buffered per parquet row group
+    * CATEGORICAL: Columns dictionary-encoded in parquet
+    """
+
+    def __init__(self, STEM, COLUMNS, FORMAT="csv", BATCH_ROWS=100000,
+                 CATEGORICAL=('username', 'login-node', 'questionId')):
+
+        self.columns = list(COLUMNS)
+        self.format = FORMAT
+        self.batch_rows = BATCH_ROWS
+        self.buffer = []
+        self.rows = 0
+
+        self.output_name = f"{STEM}.{FORMAT}"
+
+        if FORMAT == "parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            self.schema = pa.schema([(x, pa.dictionary(pa.int32(), pa.string()) if x in CATEGORICAL
+                                      else pa.string()) for x in self.columns])
+            self.writer = pq.ParquetWriter(self.output_name, self.schema)
+
+        else:
+            self.outgoing = open(self.output_name, "w", newline="", encoding="utf-8-sig")
+            self.writer = csv.writer(self.outgoing)
+            self.writer.writerow(self.columns)
+
+
+    def write(self, ROWS):
+        """
+        ROWS => Iterable of tuples, one per answer
+
+        Returns number of rows written
+        """
+
+        count = self.rows
+
+        if self.format == "parquet":
+            for row in ROWS:
+                self.buffer.append(row)
+                self.rows += 1
+
+                if len(self.buffer) >= self.batch_rows:
+                    self._flush()
+
+        else:
+            for row in ROWS:
+                self.writer.writerow(["" if x is None else x for x in row])
+                self.rows += 1
+
+        return self.rows - count
+
+
+    def _flush(self):
+        """
+        Pushes the buffered rows to one parquet row group
+        """
+
+        import pyarrow as pa
+
+        if not self.buffer:
+            return
+
+        batch = {x: [None if v is None else str(v) for v in values]
+                 for x, values in zip(self.columns, zip(*self.buffer))}
+
+        self.writer.write_table(pa.Table.from_pydict(batch, schema=self.schema))
+        self.buffer = []
+
+
+    def close(self):
+        """
+        Flushes anything buffered and closes the file
+        Returns filename that was written
+        """
+
+        if self.format == "parquet":
+            self._flush()
+            self.writer.close()
+        else:
+            self.outgoing.close()
+
+        return self.output_name
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *args):
+        self.close()
+
+
+# ----- Parent errors
+PARENT_ERROR_MODES = ["full", "summary"]
+
+
+def write_parent_error(OUTGOING, KEY, SUBSET, MODE="full", JSON_BACKEND="auto"):
+    """
+    OUTGOING => JSON-lines file object opened in binary mode
+    KEY => Key from JSON file
+    SUBSET => Reduced dictionary of participant-only data
+    MODE => One of PARENT_ERROR_MODES
+        * full => Key, username, and the participant's raw pings / answers / user
+        * summary => Key, username, ping count, and device info only
+    JSON_BACKEND => Encoder to use (see jsonio.BACKENDS)
+
+    Participants with zero answers are streamed to disk one compact line at a time,
+    so they never pile up in memory
+    Returns nothing, functions inplace
+    """
+
+    record = {"key": KEY, "username": KEY.split('-')[0]}
+
+    if MODE == "summary":
+        record["ping_count"] = len(SUBSET.get('pings', []))
+        record["device"] = SUBSET.get('user', {}).get('installation', {}).get('device')
+    else:
+        record.update(SUBSET)
+
+    OUTGOING.write(jsonio.dumps(record, JSON_BACKEND) + b"\n")
@@ -0,0 +1,127 @@
+#!/bin/python3
+
+"""
+About this Script
+
+Pluggable JSON backend for reading Wellping exports and writing the JSON outputs.
+A faster decoder / encoder is used when one is installed, otherwise we fall back
+to the standard library:
+
+    * orjson => Fast decode + encode
+    * simdjson => Fast decode (pysimdjson), standard library encode
+    * stdlib => Built-in json module
+
+Every backend writes the same bytes apart from whitespace (UTF-8, no ASCII escaping)
+
+Ian Ferguson | Stanford University
+"""
+
+# ----------- Imports
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import simdjson
+except ImportError:
+    simdjson = None
+
+
+# ----------- Definitions
+BACKENDS = ["auto", "orjson", "simdjson", "stdlib"]
+
+
+def resolve_backend(BACKEND="auto"):
+    """
+    BACKEND => One of BACKENDS
+
+    "auto" picks the fastest installed backend
+    Returns name of the backend that will actually be used
+    """
+
+    if BACKEND not in BACKENDS:
+        raise ValueError(f"Unknown JSON backend {BACKEND} ... choose from {BACKENDS}")
+
+    if BACKEND == "auto":
+        if orjson is not None:
+            return "orjson"
+        if simdjson is not None:
+            return "simdjson"
+        return "stdlib"
+
+    # Explicit requests for a missing backend should fail loudly
+    if BACKEND == "orjson" and orjson is None:
+        raise ImportError("orjson is not installed ... run `pip install orjson`")
+    if BACKEND == "simdjson" and simdjson is None:
+        raise ImportError("simdjson is not installed ... run `pip install pysimdjson`")
+
+    return BACKEND
+
+
+def loads(RAW, BACKEND="auto"):
+    """
+    RAW => Bytes or string of JSON
+    BACKEND => One of BACKENDS
+
+    Returns decoded Python object
+    """
+
+    backend = resolve_backend(BACKEND)
+
+    if backend == "orjson":
+        return orjson.loads(RAW)
+
+    if backend == "simdjson":
+        return simdjson.loads(RAW)
+
+    return json.loads(RAW)
+
+
+def load(INCOMING, BACKEND="auto"):
+    """
+    INCOMING => File object opened in binary mode
+    BACKEND => One of BACKENDS
+
+    Returns decoded Python object
+    """
+
+    return loads(INCOMING.read(), BACKEND)
+
+
+def dumps(OBJ, BACKEND="auto", INDENT=None):
+    """
+    OBJ => JSON-serializable Python object
+    BACKEND => One of BACKENDS
+    INDENT => Optional integer, pretty-prints the output
+              (orjson only supports an indent of 2)
+
+    Returns UTF-8 encoded bytes
+    """
+
+    if resolve_backend(BACKEND) == "orjson":
+        try:
+            return orjson.dumps(OBJ, option=orjson.OPT_INDENT_2 if INDENT else 0)
+        except TypeError:
+            # E.g., integers wider than 64 bits ... the standard library can handle these
+            pass
+
+    separators = (",", ": ") if INDENT else (",", ":")
+
+    return json.dumps(OBJ, indent=INDENT, separators=separators,
+                      ensure_ascii=False).encode("utf-8")
+
+
+def dump(OBJ, OUTGOING, BACKEND="auto", INDENT=None):
+    """
+    OBJ => JSON-serializable Python object
+    OUTGOING => File object opened in binary mode
+    BACKEND => One of BACKENDS
+    INDENT => Optional integer, pretty-prints the output
+
+    Returns nothing, functions inplace
+    """
+
+    OUTGOING.write(dumps(OBJ, BACKEND, INDENT))
@@ -0,0 +1,142 @@
+#!/bin/python3
+
+"""
+About this Script
+
+Builds the social network from parsed nominations: a long edge table
+(ego, alter, nomination type, ping, timestamp) and one sparse adjacency matrix
+per time window. Everything is built in vectorized passes over the slot columns
+
+SciPy is optional; without it the edge table is still written
+
+Ian Ferguson | Stanford University
+"""
+
+# ----------- Imports
+import os, pathlib
+import pandas as pd
+import numpy as np
+
+try:
+    from scipy import sparse
+except ImportError:
+    sparse = None
+
+from .profile import SCP_2021
+from .answers import melt_nominations
+from .aggregate import iter_aggregate, aggregate_columns
+
+
+# ----------- Definitions
+EDGE_COLUMNS = ['ego', 'alter', 'alter_id', 'nomination', 'slot', 'id', 'timestamp']
+
+
+def build_edges(DF, PROFILE=SCP_2021, MATCHES=None):
+    """
+    DF => Parsed DataFrame object (one row per ping, slot columns wide)
+    PROFILE => StudyProfile object (nomination columns)
+    MATCHES => Optional roster matches (see roster.match_aggregate)
+
+    Ego is the nominating username, alter is the nominee as written; when roster
+    matches are supplied, alter_id holds the matched roster ID
+    Returns DataFrame object with EDGE_COLUMNS
+    """
+
+    edges = melt_nominations(DF, PROFILE, KEYS=('username', 'id', 'startTime'))
+    edges = edges.rename(columns={'username': 'ego', 'nominee': 'alter', 'startTime': 'timestamp'})
+
+    if MATCHES is not None and len(MATCHES):
+        lookup = MATCHES.loc[:, ['nominee', 'roster_id']].drop_duplicates('nominee')
+        lookup = lookup.rename(columns={'nominee': 'alter', 'roster_id': 'alter_id'})
+        edges = edges.merge(lookup, on='alter', how='left')
+
+    return edges.reindex(columns=EDGE_COLUMNS)
+
+
+def edges_from_aggregate(AGGREGATE_NAME, PROFILE=SCP_2021, MATCHES=None, CHUNK_ROWS=100000):
+    """
+    AGGREGATE_NAME => Relative path to the aggregate (.csv or .parquet)
+    PROFILE => StudyProfile object (nomination columns)
+    MATCHES => Optional roster matches (see roster.match_aggregate)
+    CHUNK_ROWS => Rows of the aggregate read at a time
+
+    Reads only the key, timestamp, and slot columns of the aggregate
+    Returns DataFrame object with EDGE_COLUMNS
+    """
+
+    header = aggregate_columns(AGGREGATE_NAME)
+    wanted = set(['username', 'id', 'startTime'] + [x[0] for x in PROFILE.nomination_slots(header)])
+
+    keepers = [build_edges(chunk, PROFILE, MATCHES)
+               for chunk in iter_aggregate(AGGREGATE_NAME, lambda x: x in wanted, CHUNK_ROWS)]
+
+    if not keepers:
+        return pd.DataFrame(columns=EDGE_COLUMNS)
+
+    return pd.concat(keepers, ignore_index=True)
+
+
+def adjacency_by_window(EDGES, FREQ="W"):
+    """
+    EDGES => DataFrame object with EDGE_COLUMNS
+    FREQ => Pandas period alias for the time window (e.g., D, W, M)
+
+    Every window shares one node index (egos + alters, roster ID where matched),
+    and repeated nominations within a window add up
+    Returns tuple of (node Index, dictionary of window label => SciPy CSR matrix)
+    """
+
+    if sparse is None:
+        raise ImportError("scipy is required for adjacency matrices ... run `pip install scipy`")
+
+    alters = EDGES['alter_id'].fillna(EDGES['alter']).astype(str)
+    egos = EDGES['ego'].astype(str)
+
+    # One node index across every window
+    codes, nodes = pd.factorize(pd.concat([egos, alters], ignore_index=True))
+    ego_codes, alter_codes = codes[:len(EDGES)], codes[len(EDGES):]
+
+    stamps = pd.to_datetime(EDGES['timestamp'], utc=True, errors='coerce')
+    windows = stamps.dt.tz_localize(None).dt.to_period(FREQ).astype(str).to_numpy()
+
+    matrices = {}
+
+    for window in pd.unique(windows[stamps.notna().to_numpy()]):
+        mask = windows == window
+
+        matrices[window] = sparse.coo_matrix((np.ones(mask.sum()), (ego_codes[mask], alter_codes[mask])),
+                                             shape=(len(nodes), len(nodes))).tocsr()
+
+    return pd.Index(nodes, name='node'), matrices
+
+
+def save_network(EDGES, OUTPUT_DIR, FILENAME, FREQ="W"):
+    """
+    EDGES => DataFrame object with EDGE_COLUMNS
+    OUTPUT_DIR => Relative path to aggregate outputs
+    FILENAME => Export filename (e.g., test_data)
+    FREQ => Pandas period alias for the time window
+
+    Saves the following:
+        * edges_{ filename }.csv
+        * network_{ filename }/nodes.csv + adjacency_{ window }.npz (requires SciPy)
+
+    Returns nothing, functions inplace
+    """
+
+    EDGES.to_csv(os.path.join(OUTPUT_DIR, f"edges_{FILENAME}.csv"), index=False, encoding="utf-8-sig")
+
+    if sparse is None:
+        print("\nscipy is not installed ... skipping adjacency matrices\n")
+        return
+
+    nodes, matrices = adjacency_by_window(EDGES, FREQ)
+
+    network_dir = os.path.join(OUTPUT_DIR, f"network_{FILENAME}")
+    pathlib.Path(network_dir).mkdir(exist_ok=True, parents=True)
+
+    nodes.to_frame(index=False).to_csv(os.path.join(network_dir, "nodes.csv"), index=True,
+                                       index_label="ix", encoding="utf-8-sig")
+
+    for window, matrix in matrices.items():
+        sparse.save_npz(os.path.join(network_dir, f"adjacency_{window.replace('/', '_')}.npz"), matrix)
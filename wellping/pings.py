@@ -0,0 +1,37 @@
+#!/bin/python3
+
+"""
+About this Script
+
+Isolates the ping records (one row per scheduled ping) from a participant's data
+
+Ian Ferguson | Stanford University
+"""
+
+# ----------- Imports
+import pandas as pd
+
+
+# ----------- Definitions
+PING_COLUMNS = ['username', 'login-node', 'streamName', 'startTime',
+                'notificationTime', 'endTime', 'id', 'tzOffset']
+
+
+def derive_pings(SUBSET, KEY):
+    """
+    SUBSET => Reduced dictionary containing 
+    KEY => Key from the master JSON
+
+    This function isolates ping data from the participant's dictionary
+    Returns wide DataFrame object with select columns
+    """
+
+    pings = pd.DataFrame(SUBSET['pings'])                                   # Convert JSON to DataFrame
+    pings['username'] = KEY.split('-')[0]                                   # Add username column
+    
+    login_node = KEY.split('-')[1:]
+    login_node = "".join(login_node)
+
+    pings['login-node'] = login_node
+
+    return pings.loc[:, PING_COLUMNS]
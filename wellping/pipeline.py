@@ -0,0 +1,762 @@
+#!/bin/python3
+
+"""
+About this Script
+
+Wraps the helpers in this package into a full parse of one Wellping export:
+per-participant pings + answers, the aggregate CSV, parent errors, and devices.
+Both `ripper.py` and `EMI_Parser` are thin front-ends over `run_study`
+
+Ian Ferguson | Stanford University
+"""
+
+# ----------- Imports
+import os, sys, glob, shutil, zipfile, pathlib
+from time import sleep
+from tqdm import tqdm
+import pandas as pd
+
+from . import jsonio
+from .profile import SCP_2021
+from .files import (sanity_check, write_parent_error, write_table, save_dtypes, load_dtypes, LongWriter,
+                    SubjectArchive, clear_subjects, SUBJECT_ARCHIVE_NAME)
+from .answers import (derive_answers, parse_race, remove_brackets, parse_nominations, long_answers,
+                      LONG_COLUMNS)
+from .typed import derive_typed_answers
+from .pings import derive_pings, PING_COLUMNS
+from .devices import device_record, devices_table, attach_device
+from .aggregate import (flush_chunk, reconcile_chunks, merge_dtypes, agg_drop_duplicates, categorize,
+                        concat_categorical, aggregate_columns, sparsify, AnswerValues, CATEGORICAL_COLUMNS)
+from .shards import ShardedExport
+from .validate import validate_participant, write_quarantine, QUARANTINE_NAME
+from .delta import ping_index, save_ping_index, load_ping_index, changed_pings, reduce_subset, PING_INDEX_NAME
+from .compliance import ping_schedule, flush_schedule, load_schedule, save_compliance
+from .checkpoint import (fingerprint, new_checkpoint, load_checkpoint, save_checkpoint, rollback,
+                         CHECKPOINT_CHUNK_SIZE)
+from .roster import match_aggregate
+from .progress import ProgressReporter
+from .network import edges_from_aggregate, save_network
+
+
+# ----------- Definitions
+def output(KEY, PINGS, ANSWERS, OUTPUT_DIR, KICKOUT):
+    """
+    KEY => Key from JSON file
+    PINGS => Pandas DataFrame object
+    ANSWERS => Pandas DataFrame object
+    OUTPUT_DIR => Relative path to subjects directory, or files.SubjectArchive object
+    KICKOUT => Boolean, determiens if CSV will be saved
+
+    Merges pings and answers dataframes
+    Returns DataFrame object
+    """
+
+    # Isolate username
+    KEY = KEY.split('-')[0]
+
+    # Combine dataframes on ping identifier (e.g., modalStream1)
+    composite_dataframe = PINGS.merge(ANSWERS, on="id")
+
+    # Option to save locally or not
+    if KICKOUT and isinstance(OUTPUT_DIR, SubjectArchive):
+        output_name = f"{KEY}.csv"
+
+        # Same collision rule as the directory layout
+        if OUTPUT_DIR.exists(output_name):
+            output_name = f"{KEY}_b.csv"
+
+        OUTPUT_DIR.write(output_name, composite_dataframe)
+
+        # Checkpoints record where each participant's CSV went
+        composite_dataframe.attrs["subject_file"] = output_name
+
+    elif KICKOUT:
+        output_name = os.path.join(f"{OUTPUT_DIR}/{KEY}.csv")
+
+        # Avoid duplicates (possible with same username / different login IDs)
+        if os.path.exists(output_name):
+            output_name = os.path.join(f"{OUTPUT_DIR}/{KEY}_b.csv")
+
+        composite_dataframe.to_csv(output_name, index=False, encoding="utf-8-sig")
+
+        # Checkpoints record where each participant's CSV went
+        composite_dataframe.attrs["subject_file"] = os.path.basename(output_name)
+
+    return composite_dataframe
+
+
+def parse_responses(KEY, SUBSET, LOG, OUTPUT_DIR, KICKOUT, PROFILE=SCP_2021, TYPED=False):
+    """
+    KEY => Key from the master data dictionary
+    SUBSET => Reduced dictionary of participant-only data
+    LOG => Text file to store errors and exceptions
+    OUTPUT_DIR => Relative path to output directory
+    KICKOUT => Boolean, if True a local CSV is saved
+    PROFILE => StudyProfile object
+    TYPED => Boolean, if True answers are typed columns (see typed.derive_typed_answers)
+
+    This function wraps everything defined above
+    Returns a clean DataFrame object
+    """
+
+    username = KEY.split('-')[0]                                            # Isolate username
+
+    try:
+        if TYPED:
+            answers = derive_typed_answers(SUBSET=SUBSET, LOG=LOG, USER=username, PROFILE=PROFILE)
+        else:
+            answers = derive_answers(SUBSET=SUBSET, LOG=LOG, USER=username) # Create answers DataFrame
+    except Exception as e:
+        LOG.write(f"\nCaught @ {username} + derive_answers: {e}\n\n")
+
+    try:
+        answers = parse_race(answers, PROFILE)                              # Isolate multi-select responses
+        answers = remove_brackets(answers, PROFILE)
+    except Exception as e:
+        LOG.write(f"\nCaught @ {username} + parse_race: {e}\n\n")
+
+    try:
+        answers = parse_nominations(answers, PROFILE)                       # Isolate nomination responses
+    except Exception as e:
+        LOG.write(f"\nCaught @ {username} + parse_nominations: {e}\n\n")
+
+    try:
+        pings = derive_pings(SUBSET=SUBSET, KEY=KEY)                        # Create pings DataFrame
+    except Exception as e:
+        LOG.write(f"\nCaught @ {username} + derive_pings: {e}\n\n")
+
+    # Isolate a few device parameters to include in pings CSV
+    # The exhaustive device info is in another CSV in the same directory
+    device = SUBSET['user']['installation']['device']
+    pings = attach_device(pings, device)
+
+    # Keys, stream names, and device fields repeat on every ping ... hold them as categoricals
+    pings = categorize(pings, CATEGORICAL_COLUMNS + list(device) + ['username'])
+
+    return output(KEY, pings, answers, OUTPUT_DIR, KICKOUT)
+
+
+def link_nominations(AGGREGATE_NAME, AGGREGATE_DIR, OUTPUT_FILENAME, PROFILE=SCP_2021,
+                     ROSTER=None, NETWORK_WINDOW=None):
+    """
+    AGGREGATE_NAME => Relative path to the pings aggregate (.csv or .parquet)
+    AGGREGATE_DIR => Relative path to aggregate outputs
+    OUTPUT_FILENAME => Export filename (e.g., test_data)
+    PROFILE => StudyProfile object (nomination columns)
+    ROSTER => Optional roster.RosterIndex object
+    NETWORK_WINDOW => Optional pandas period alias (e.g., W)
+
+    Roster matches and the nomination network, both read back from the aggregate
+    Returns nothing, functions inplace
+    """
+
+    matches = None
+
+    if ROSTER is not None:
+        print("\nMatching nominees to roster...\n")
+
+        matches = match_aggregate(AGGREGATE_NAME, ROSTER, PROFILE)
+        print(f"\nMatched {matches['roster_id'].notna().sum()} of {len(matches)} nominations "
+              f"({len(ROSTER.cache)} distinct names scored)...\n")
+
+        # Push roster matches to local CSV
+        matches.to_csv(os.path.join(AGGREGATE_DIR, f"roster-matches_{OUTPUT_FILENAME}.csv"),
+                       index=False, encoding="utf-8-sig")
+
+    if NETWORK_WINDOW:
+        print("\nBuilding nomination network...\n")
+
+        edges = edges_from_aggregate(AGGREGATE_NAME, PROFILE, matches)
+        save_network(edges, AGGREGATE_DIR, OUTPUT_FILENAME, NETWORK_WINDOW)
+
+        print(f"\nSaved {len(edges)} edges...\n")
+
+
+def run_study(JSON_PATH, SUBJECT_DIR, AGGREGATE_DIR, LOG_NAME, DEVICE_LOG_NAME,
+              PROFILE=SCP_2021, CHUNK_SIZE=None, DEDUP=None, JSON_BACKEND="auto",
+              PARENT_ERRORS="full", ROSTER=None, NETWORK_WINDOW=None, FORMAT="csv", TYPED=False,
+              LAYOUT="wide", INDEX=None, KEYS=None, RESUME=False, SUBJECTS="csv", COMPLIANCE=False,
+              PROGRESS=None, SPARSE=False):
+    """
+    JSON_PATH => Relative path to the Wellping export
+    SUBJECT_DIR => Relative path to subject-wise CSVs
+    AGGREGATE_DIR => Relative path to aggregate outputs
+    LOG_NAME => Text file to log parsing errors
+    DEVICE_LOG_NAME => Text file to log device parsing errors
+    PROFILE => StudyProfile object
+    CHUNK_SIZE => Optional integer, flush every N participants to disk to bound memory (the export
+                  is scanned for byte offsets and decoded one participant at a time)
+    DEDUP => Optional dedup policy (see aggregate.DEDUP_POLICIES)
+    JSON_BACKEND => Decoder / encoder to use (see jsonio.BACKENDS)
+    PARENT_ERRORS => One of files.PARENT_ERROR_MODES
+    ROSTER => Optional roster.RosterIndex object, resolves nominees to roster IDs
+    NETWORK_WINDOW => Optional pandas period alias (e.g., W), saves the nomination network
+    FORMAT => One of files.OUTPUT_FORMATS, for the pings and devices aggregates
+    TYPED => Boolean, if True answers keep numeric / boolean / categorical types (see typed.py)
+    LAYOUT => One of files.LAYOUTS ... long streams one row per answer, with no pivot
+    INDEX => Optional manifest from shards.split_export (or a shards.ShardedExport object),
+             participants are read by seeking
+    KEYS => Optional list of participant keys to parse (e.g., shards.assign_keys for one worker)
+    RESUME => Boolean, if True pick up from the last checkpoint (see checkpoint.py) instead of
+              starting over; implies CHUNK_SIZE (default checkpoint.CHECKPOINT_CHUNK_SIZE)
+    SUBJECTS => One of files.SUBJECT_CONTAINERS ... zip packs every subject-wise CSV into
+                SUBJECT_DIR/subjects.zip instead of one file each
+    COMPLIANCE => Boolean, if True save response rate / latency / duration / streak metrics
+                  (see compliance.py), gathered in the same pass as the answers
+    PROGRESS => Optional progress.ProgressReporter, receives stage / throughput / ETA events
+    SPARSE => Boolean, if True the answers block is held as sparse codes (see aggregate.AnswerValues)
+              until it is written, which cuts peak memory when streams ask different questions
+
+    Parses every participant in the export and saves the following:
+        * Subject-wise CSVs, or subjects.zip (SUBJECT_DIR)
+        * pings_{ filename } + devices_{ filename } as CSV or parquet (AGGREGATE_DIR)
+        * response-duplicates.json + parent-errors.jsonl + quarantine.jsonl (AGGREGATE_DIR)
+        * merged-pings_{ filename }.csv when DEDUP is set (AGGREGATE_DIR)
+        * roster-matches_{ filename }.csv when ROSTER is set (AGGREGATE_DIR)
+        * edges_{ filename }.csv + network_{ filename }/ when NETWORK_WINDOW is set (AGGREGATE_DIR)
+        * compliance_{ filename }.csv + compliance-summary_{ filename }.csv when COMPLIANCE is set (AGGREGATE_DIR)
+
+    With LAYOUT long, answers_{ filename } (LONG_COLUMNS) replaces the subject-wise CSVs and
+    the pings aggregate; dedup, roster matching, and the network need the wide layout
+
+    Returns nothing, functions inplace
+    """
+
+    # E.g., test_data.json => test_data
+    output_filename = os.path.basename(JSON_PATH).split('.json')[0]
+
+    PROGRESS = PROGRESS or ProgressReporter()
+    PROGRESS.label = PROGRESS.label or output_filename
+    PROGRESS.stage("read")
+
+    print(f"\nUsing {jsonio.resolve_backend(JSON_BACKEND)} JSON backend...\n")
+
+    # Options settled before the export is opened, so the reader below is the one that runs
+    if LAYOUT == "long" and (DEDUP or ROSTER is not None or NETWORK_WINDOW or TYPED or CHUNK_SIZE or RESUME):
+        print("\nLong layout streams answers one participant at a time ... "
+              "ignoring dedup / roster / network / typed / chunk size / resume\n")
+        DEDUP, ROSTER, NETWORK_WINDOW, TYPED, CHUNK_SIZE, RESUME = None, None, None, False, None, False
+
+    if isinstance(INDEX, ShardedExport):
+
+        # Already scanned / loaded by the caller
+        data = INDEX if KEYS is None else INDEX.subset(KEYS)
+
+    elif INDEX:
+
+        # Decode participants on demand from the split manifest
+        data = ShardedExport(INDEX, JSON_BACKEND, KEYS)
+
+    elif CHUNK_SIZE or RESUME or LAYOUT == "long":
+
+        # Chunked / long => one byte scan, then participants are decoded one at a time so memory stays flat
+        data = ShardedExport.scan(JSON_PATH, JSON_BACKEND)
+
+        if KEYS is not None:
+            data = data.subset(KEYS)
+
+    else:
+
+        # I/O JSON file
+        with open(JSON_PATH, "rb") as incoming:
+            data = jsonio.load(incoming, JSON_BACKEND)                      # Read JSON as Python dictionary
+
+        if KEYS is not None:
+            data = {x: data[x] for x in KEYS}
+
+        PROGRESS.update(0, BYTES=os.path.getsize(JSON_PATH))
+
+    sanity_check(data.keys(), AGGREGATE_DIR)
+
+    if SPARSE and (LAYOUT == "long" or TYPED):
+        print("\nSparse answers apply to cleaned strings in the wide layout ... ignoring sparse\n")
+        SPARSE = False
+
+    if RESUME and not CHUNK_SIZE:
+        CHUNK_SIZE = CHECKPOINT_CHUNK_SIZE
+
+    # Chunked mode => keepers are flushed to part CSVs every N participants, with a checkpoint each time
+    part_directory = os.path.join(AGGREGATE_DIR, ".parts")
+    parent_errors_name = os.path.join(AGGREGATE_DIR, "parent-errors.jsonl")
+    quarantine_name = os.path.join(AGGREGATE_DIR, QUARANTINE_NAME)
+    state = None
+
+    # Optional single container for the subject-wise CSVs
+    archive_name = os.path.join(SUBJECT_DIR, SUBJECT_ARCHIVE_NAME) if SUBJECTS == "zip" else None
+    archive_toc = os.path.join(part_directory, "subjects.toc")
+
+    if CHUNK_SIZE:
+        run_fingerprint = fingerprint(JSON_PATH, list(data.keys()), PROFILE, CHUNK_SIZE, TYPED, SUBJECTS,
+                                      COMPLIANCE)
+
+        if RESUME:
+            state = load_checkpoint(part_directory, run_fingerprint, JSON_BACKEND)
+
+        if state is None:
+
+            # Fresh run ... stale parts from an earlier run must not leak in
+            shutil.rmtree(part_directory, ignore_errors=True)
+            pathlib.Path(part_directory).mkdir(exist_ok=True, parents=True)
+            checkpoint = new_checkpoint(run_fingerprint)
+
+        else:
+
+            rollback(state, list(data.keys()), LOG_NAME, parent_errors_name, SUBJECT_DIR,
+                     archive_name, archive_toc, quarantine_name)
+            checkpoint = state
+
+            print(f"\nResuming after {len(state['done'])} participants ({len(state['parts'])} parts)...\n")
+
+    done = set(state["done"]) if state else set()                           # Keys finished before the checkpoint
+
+    # Fresh run into an existing directory (e.g., watch mode) => overwrite these subjects in place
+    if state is None and LAYOUT == "wide" and not archive_name:
+        clear_subjects(SUBJECT_DIR, [x.split('-')[0] for x in data.keys()])
+
+    subject_output = SUBJECT_DIR
+
+    if archive_name and LAYOUT == "wide":
+        subject_output = SubjectArchive(archive_name, "a" if state and os.path.exists(archive_name) else "w")
+
+    # I/O new text file for exception logging, JSON-lines files for parent errors and quarantine
+    with open(LOG_NAME, "a" if state else "w") as log, \
+         open(parent_errors_name, "ab" if state else "wb") as parent_errors, \
+         open(quarantine_name, "ab" if state else "wb") as quarantine:
+
+        keepers = []                                                        # Empty list to append subject data into
+        values = AnswerValues() if SPARSE else None                         # Answer codes shared by every participant
+        pending = []                                                        # Keys read since the last checkpoint
+        parent_error_count = state["parent_error_count"] if state else 0    # Participants with no answers
+        quarantined = list(state.get("quarantined", [])) if state else []   # Malformed participants
+
+        device_records, device_errors = {}, {}                              # Device + app info, as plain records
+
+        parts = [os.path.join(part_directory, x) for x in state["parts"]] if state else []
+        dtypes = dict(state["dtypes"]) if state else {}
+
+        # Compliance => one compact row per scheduled ping, flushed alongside the parts
+        schedule = []
+        schedule_parts = [x for x in (os.path.join(part_directory, f"schedule-{ix:05d}.csv")
+                                      for ix in range(len(parts))) if os.path.exists(x)] if state else []
+
+        def push_chunk():
+            """
+            Flushes keepers to the next part, then checkpoints everything read so far
+            """
+
+            if schedule:
+                schedule_parts.append(flush_schedule(schedule, part_directory, len(parts)))
+                schedule.clear()
+
+            part_name, part_dtypes = flush_chunk(keepers, part_directory, len(parts), values)
+            parts.append(part_name)
+            merge_dtypes(dtypes, part_dtypes)
+
+            log.flush()
+            parent_errors.flush()
+            quarantine.flush()
+
+            checkpoint["parts"] = [os.path.basename(x) for x in parts]
+            checkpoint["dtypes"] = dtypes
+            checkpoint["done"] += pending
+            checkpoint["parent_error_count"] = parent_error_count
+            checkpoint["log_bytes"] = os.path.getsize(LOG_NAME)
+            checkpoint["parent_errors_bytes"] = os.path.getsize(parent_errors_name)
+            checkpoint["quarantine_bytes"] = os.path.getsize(quarantine_name)
+            checkpoint["quarantined"] = list(quarantined)
+            checkpoint["subjects"] += [x.attrs["subject_file"] for x in keepers if "subject_file" in x.attrs]
+
+            if isinstance(subject_output, SubjectArchive):
+                checkpoint["archive_start_dir"] = subject_output.checkpoint(archive_toc)
+
+            save_checkpoint(part_directory, checkpoint, JSON_BACKEND)
+
+            keepers.clear()
+            pending.clear()
+
+        # Long layout => answers stream straight to one file as each participant is read
+        long_writer = None
+
+        if LAYOUT == "long":
+            long_writer = LongWriter(os.path.join(AGGREGATE_DIR, f"answers_{output_filename}"),
+                                     LONG_COLUMNS, FORMAT)
+
+        print("\nParsing participant data...\n")
+        sleep(1)
+
+        # Sharded => each participant is its own read, so bytes are counted as they go
+        read_bytes = (lambda x: data.entries[x]["length"]) if isinstance(data, ShardedExport) else None
+        PROGRESS.stage("parse", len(data.keys()), len(done))
+
+        remaining = [x for x in data.keys() if x not in done]
+
+        # Key == Subject and login ID (we'll separate these later)
+        for key in tqdm(PROGRESS.track(remaining, read_bytes), total=len(remaining)):
+
+            subset = data[key]                                              # Reduced data for one participant
+            pending.append(key)
+
+            # Malformed participants are set aside before any parsing work is spent on them
+            problems = validate_participant(subset)
+
+            if problems:
+                write_quarantine(quarantine, key, subset, problems, JSON_BACKEND)
+                quarantined.append(key)
+                continue
+
+            try:
+                device_records[key] = device_record(subset, key)
+            except Exception as e:
+                device_errors[key] = e
+
+            # Scheduled pings count toward compliance whether or not anything was answered
+            if COMPLIANCE:
+                try:
+                    schedule.append(ping_schedule(key, subset))
+                except Exception as e:
+                    log.write(f"\nCaught @ {key.split('-')[0]} + ping_schedule: {e}\n\n")
+
+            # If participant completed no pings, stream them to parent errors
+            if len(subset['answers']) == 0:
+                write_parent_error(parent_errors, key, subset, PARENT_ERRORS, JSON_BACKEND)
+                parent_error_count += 1
+                continue
+
+            if long_writer is not None:
+
+                try:
+                    rows = long_writer.rows
+                    long_writer.write(long_answers(key, subset))
+                    PROGRESS.update(0, ROWS=long_writer.rows - rows)
+                except Exception as e:
+                    log.write(f"\nCaught @ {key.split('-')[0]} + long_answers: {e}\n\n")
+
+                continue
+
+            try:
+
+                # Run parse_responses function to isolate participant data
+                parsed_data = parse_responses(key, subset, log, subject_output, True, PROFILE, TYPED)
+
+            except Exception as e:
+
+                # Catch exceptions as they occur
+                log.write(f"\nCaught @ {key.split('-')[0]}: {e}\n\n")
+                continue
+
+            if values is not None:
+                parsed_data = sparsify(parsed_data, values, PING_COLUMNS)
+
+            keepers.append(parsed_data)                                     # Add participant DF to keepers list
+            PROGRESS.update(0, ROWS=len(parsed_data))
+
+            # Push full chunk to disk and release it
+            if CHUNK_SIZE and len(keepers) >= CHUNK_SIZE:
+                push_chunk()
+
+        sleep(1)
+        print("\nAggregating participant data...\n")
+        PROGRESS.stage("aggregate")
+
+        aggregate_name = os.path.join(AGGREGATE_DIR, f"pings_{output_filename}.{FORMAT}")
+
+        try:
+
+            if long_writer is not None:
+
+                aggregate_name = long_writer.close()
+                print(f"\nStreamed {long_writer.rows} answers to {os.path.basename(aggregate_name)}...\n")
+
+            elif CHUNK_SIZE:
+
+                # Flush the remainder, then stream parts into one file
+                if keepers:
+                    push_chunk()
+
+                if not parts:
+                    raise ValueError("No objects to concatenate")
+
+                merged = reconcile_chunks(parts, list(dtypes), aggregate_name, DEDUP, dtypes)
+                column_types = {x: y or "float64" for x, y in dtypes.items()}
+
+                # The schedule is small ... pull it off disk before the parts go
+                schedule, schedule_parts = [load_schedule(schedule_parts, schedule)], []
+                shutil.rmtree(part_directory)
+
+            else:
+
+                # Stack all DFs into one (categoricals stay categorical)
+                aggregate = concat_categorical(keepers)
+
+                # Merge repeated logins by ping identifier
+                if DEDUP:
+                    aggregate, merged = agg_drop_duplicates(aggregate, DEDUP)
+
+                # Push to local CSV / parquet
+                write_table(aggregate, aggregate_name.rsplit(".", 1)[0], FORMAT, values)
+                column_types = {x: str(y) for x, y in aggregate.dtypes.items()}
+
+        except Exception as e:
+
+            # Something has gone wrong here and you have no participant data ... check the log
+            print(f"{e}")
+            print("\nNo objects to concatenate...\n")
+
+            PROGRESS.emit("failed")
+            sys.exit(1)
+
+        finally:
+
+            # Writes the archive's table of contents
+            if isinstance(subject_output, SubjectArchive):
+                subject_output.close()
+
+    if DEDUP:
+        print(f"\nMerged {len(merged)} pings repeated across logins ({DEDUP})...\n")
+
+        # Push merge report to local CSV
+        merged.to_csv(os.path.join(AGGREGATE_DIR, f"merged-pings_{output_filename}.csv"),
+                      index=False, encoding="utf-8-sig")
+
+    # Typed answers don't survive CSV text ... keep their dtypes next to the table
+    if TYPED and FORMAT == "csv":
+        save_dtypes(column_types, AGGREGATE_DIR, output_filename, JSON_BACKEND)
+
+    if ROSTER is not None or NETWORK_WINDOW:
+        PROGRESS.stage("link")
+
+    link_nominations(aggregate_name, AGGREGATE_DIR, output_filename, PROFILE, ROSTER, NETWORK_WINDOW)
+
+    if COMPLIANCE:
+        print("\nComputing compliance metrics...\n")
+        PROGRESS.stage("compliance")
+
+        summary = save_compliance(load_schedule(schedule_parts, schedule), AGGREGATE_DIR, output_filename)
+        print(f"\nMedian response rate {summary['response_rate'].median():.0%} "
+              f"across {len(summary)} participants...\n")
+
+    print(f"\nSaved {parent_error_count} parent errors ({PARENT_ERRORS})...\n")
+
+    if quarantined:
+        print(f"\nQuarantined {len(quarantined)} malformed participants => {quarantine_name}\n")
+
+    quarantined = set(quarantined)
+
+    print("\nSaving device information...\n")
+    PROGRESS.stage("devices", len(data.keys()))
+
+    # I/O new text file for device parsing errors
+    with open(DEVICE_LOG_NAME, 'w') as log:
+
+        for key in PROGRESS.track(data.keys()):
+
+            if key in quarantined:
+                continue
+
+            # Finished before a resumed checkpoint ... read them again
+            if key not in device_records and key not in device_errors:
+                try:
+                    device_records[key] = device_record(data[key], key)
+                except Exception as e:
+                    device_errors[key] = e
+
+            if key in device_errors:
+                log.write(f"\nCaught {key.split('-')[0]} @ device parser: {device_errors[key]}\n\n")
+
+        # One bulk normalization of every participant's record
+        devices = devices_table([device_records[x] for x in data.keys() if x in device_records])
+
+        # Push to local CSV / parquet
+        write_table(devices, os.path.join(AGGREGATE_DIR, f"devices_{output_filename}"), FORMAT)
+
+    PROGRESS.close()
+
+    sleep(1)
+    print("\nAll responses + devices parsed\n")
+
+
+def diff_study(JSON_PATH, PREVIOUS, AGGREGATE_DIR, LOG_NAME, PROFILE=SCP_2021, JSON_BACKEND="auto",
+               FORMAT="csv", TYPED=False, INDEX_NAME=None):
+    """
+    JSON_PATH => Relative path to the new Wellping export
+    PREVIOUS => Ping index of the previous snapshot ... a saved index, a previous export (.json),
+                or a dictionary from delta.load_ping_index
+    AGGREGATE_DIR => Relative path to aggregate outputs
+    LOG_NAME => Text file to log parsing errors
+    PROFILE => StudyProfile object
+    JSON_BACKEND => Decoder / encoder to use (see jsonio.BACKENDS)
+    FORMAT => One of files.OUTPUT_FORMATS, for the delta table
+    TYPED => Boolean, if True answers keep numeric / boolean / categorical types (see typed.py)
+    INDEX_NAME => Where to save this export's index (defaults to AGGREGATE_DIR/ping-index.csv.gz),
+                  the baseline for the next diff
+
+    Only participants with new answers are parsed, and only their new or changed pings.
+    Saves delta_{ filename } (the pings aggregate columns for those pings, plus a change
+    column: new | changed) and the new ping index
+    Returns delta DataFrame
+    """
+
+    # E.g., test_data.json => test_data
+    output_filename = os.path.basename(JSON_PATH).split('.json')[0]
+    INDEX_NAME = INDEX_NAME or os.path.join(AGGREGATE_DIR, PING_INDEX_NAME)
+
+    if not isinstance(PREVIOUS, dict):
+        print(f"\nLoading ping index from {PREVIOUS}...\n")
+        PREVIOUS = load_ping_index(PREVIOUS, JSON_BACKEND)
+
+    with open(JSON_PATH, "rb") as incoming:
+        data = jsonio.load(incoming, JSON_BACKEND)
+
+    index_rows = []
+    keepers = []
+    counts = {"new": 0, "changed": 0}
+
+    print("\nScanning export against the ping index...\n")
+
+    with open(LOG_NAME, "w") as log:
+        for key in tqdm(list(data.keys())):
+
+            subset = data[key]
+            problems = validate_participant(subset)
+
+            if problems:
+                log.write(f"\nCaught @ {key.split('-')[0]} + validate: {'; '.join(problems)}\n\n")
+                continue
+
+            index_rows += ping_index(key, subset)
+
+            changes = changed_pings(key, subset, PREVIOUS)
+
+            if not changes:
+                continue
+
+            try:
+                parsed_data = parse_responses(key, reduce_subset(subset, changes), log, None, False,
+                                              PROFILE, TYPED)
+            except Exception as e:
+                log.write(f"\nCaught @ {key.split('-')[0]} + diff: {e}\n\n")
+                continue
+
+            parsed_data.insert(0, 'change', parsed_data['id'].map(changes))
+            keepers.append(parsed_data)
+
+            for change in changes.values():
+                counts[change] += 1
+
+    delta = concat_categorical(keepers) if keepers else pd.DataFrame(columns=['change'])
+    delta_name = write_table(delta, os.path.join(AGGREGATE_DIR, f"delta_{output_filename}"), FORMAT)
+
+    save_ping_index(index_rows, INDEX_NAME)
+
+    print(f"\n{counts['new']} new and {counts['changed']} changed pings => {delta_name}\n")
+    print(f"\nSaved ping index ({len(index_rows)} answers) => {INDEX_NAME}\n")
+
+    return delta
+
+
+def merge_workers(WORKER_DIRS, AGGREGATE_DIR, OUTPUT_FILENAME, KEYS, PROFILE=SCP_2021, DEDUP=None,
+                  JSON_BACKEND="auto", ROSTER=None, NETWORK_WINDOW=None, FORMAT="csv",
+                  SUBJECT_ARCHIVES=(), SUBJECT_DIR=None):
+    """
+    WORKER_DIRS => Relative paths to each worker's aggregate directory
+    AGGREGATE_DIR => Relative path to the combined aggregate outputs
+    OUTPUT_FILENAME => Export filename (e.g., test_data)
+    KEYS => Every participant key in the export (from the manifest)
+    PROFILE => StudyProfile object
+    DEDUP => Optional dedup policy, applied across workers (see aggregate.DEDUP_POLICIES)
+    JSON_BACKEND => Encoder to use (see jsonio.BACKENDS)
+    ROSTER => Optional roster.RosterIndex object
+    NETWORK_WINDOW => Optional pandas period alias (e.g., W)
+    FORMAT => One of files.OUTPUT_FORMATS for the combined aggregates
+    SUBJECT_ARCHIVES => Optional workers' subject archives, combined into SUBJECT_DIR/subjects.zip
+
+    Combines the outputs of workers that each ran run_study on their share of the
+    keys into the same files a single run would have written. CSV aggregates are
+    streamed part by part (see aggregate.reconcile_chunks)
+    Returns nothing, functions inplace
+    """
+
+    sanity_check(KEYS, AGGREGATE_DIR)
+
+    # Parent errors and quarantine are JSON lines ... workers' files just concatenate
+    for jsonl_name in ("parent-errors.jsonl", QUARANTINE_NAME):
+        with open(os.path.join(AGGREGATE_DIR, jsonl_name), "wb") as outgoing:
+            for worker_dir in WORKER_DIRS:
+                if not os.path.exists(os.path.join(worker_dir, jsonl_name)):
+                    continue
+
+                with open(os.path.join(worker_dir, jsonl_name), "rb") as incoming:
+                    shutil.copyfileobj(incoming, outgoing)
+
+    aggregate_name = os.path.join(AGGREGATE_DIR, f"pings_{OUTPUT_FILENAME}.{FORMAT}")
+
+    for table in ("pings", "devices"):
+        parts = []
+
+        for worker_dir in WORKER_DIRS:
+            parts += glob.glob(os.path.join(worker_dir, f"{table}_{OUTPUT_FILENAME}.*"))
+
+        if not parts:
+            continue
+
+        stem = os.path.join(AGGREGATE_DIR, f"{table}_{OUTPUT_FILENAME}")
+        policy = DEDUP if table == "pings" else None
+
+        if all(x.endswith(".csv") for x in parts):
+            columns = list(dict.fromkeys(x for part in parts for x in aggregate_columns(part)))
+            merged = reconcile_chunks(parts, columns, f"{stem}.{FORMAT}", policy, MISSING="")
+
+        else:
+            frames = [pd.read_parquet(x) if x.endswith(".parquet")
+                      else pd.read_csv(x, dtype=str, keep_default_na=False) for x in parts]
+            combined = concat_categorical(frames)
+
+            if policy:
+                combined, merged = agg_drop_duplicates(combined, policy)
+
+            write_table(combined, stem, FORMAT)
+
+        if table != "pings":
+            continue
+
+        # Workers that ran with --dedup already merged their own repeats (a username never spans
+        # workers) ... their reports carry over, followed by anything merged across workers here
+        reports = [pd.read_csv(x, dtype=str, keep_default_na=False, encoding="utf-8-sig")
+                   for x in (os.path.join(y, f"merged-pings_{OUTPUT_FILENAME}.csv") for y in WORKER_DIRS)
+                   if os.path.exists(x)]
+
+        if policy:
+            reports.append(merged)
+
+        if reports:
+            merged = pd.concat(reports, ignore_index=True)
+            print(f"\nMerged {len(merged)} pings repeated across logins ({policy or 'in the workers'})...\n")
+
+            merged.to_csv(os.path.join(AGGREGATE_DIR, f"merged-pings_{OUTPUT_FILENAME}.csv"),
+                          index=False, encoding="utf-8-sig")
+
+    # Typed workers' dtype maps combine the way the dtypes of chunk parts do
+    worker_types = [load_dtypes(x, OUTPUT_FILENAME, JSON_BACKEND) for x in WORKER_DIRS]
+
+    if FORMAT == "csv" and any(worker_types):
+        column_types = {}
+
+        for types in worker_types:
+            merge_dtypes(column_types, types)
+
+        save_dtypes(column_types, AGGREGATE_DIR, OUTPUT_FILENAME, JSON_BACKEND)
+
+    link_nominations(aggregate_name, AGGREGATE_DIR, OUTPUT_FILENAME, PROFILE, ROSTER, NETWORK_WINDOW)
+
+    if SUBJECT_ARCHIVES:
+        combined = SubjectArchive(os.path.join(SUBJECT_DIR, SUBJECT_ARCHIVE_NAME), "w")
+
+        for archive_name in SUBJECT_ARCHIVES:
+            with zipfile.ZipFile(archive_name, "r") as archive:
+                for member in archive.infolist():
+                    with archive.open(member) as incoming, combined.archive.open(member.filename, "w") as outgoing:
+                        shutil.copyfileobj(incoming, outgoing)
+
+        combined.close()
+
+    print(f"\nMerged {len(WORKER_DIRS)} workers into {AGGREGATE_DIR}\n")
@@ -0,0 +1,371 @@
+#!/bin/python3
+
+"""
+About this Script
+
+Sizing a parse job before it runs. One cheap pass over the raw bytes (nothing decoded)
+counts participants, answers and answered pings per participant, the largest participant,
+and the distinct question IDs; a small timed sample of participants through the real
+pipeline turns those counts into estimated runtime and peak memory. From there a plan
+recommends workers and chunk size for the memory and CPUs on hand
+
+    * prescan_export => Per-participant byte / answer / ping counts, without decoding
+    * calibrate => Measured costs of this pipeline on a sample of participants
+    * estimate_run => Runtime and peak memory for given workers and chunk size
+    * plan_study => All of the above, plus the recommended settings
+
+Estimates are meant for resource requests, not promises ... they assume this machine's
+speed and a quiet disk
+
+Ian Ferguson | Stanford University
+"""
+
+# ----------- Imports
+import io, os, re, mmap, time, random, tempfile, tracemalloc
+import numpy as np
+import pandas as pd
+
+from . import jsonio
+from .profile import SCP_2021
+from .shards import scan_offsets
+from .files import write_table
+from .answers import long_answers
+from .devices import device_record
+from .validate import validate_participant
+from .aggregate import concat_categorical
+from .progress import rss_bytes
+from .pipeline import parse_responses
+
+
+# ----------- Definitions
+PLAN_NAME = "plan_{}.json"
+
+QUESTION = re.compile(rb'"questionId"\s*:\s*"((?:[^"\\]|\\.)*)"')
+PING_ID = re.compile(rb'"pingId"\s*:\s*"((?:[^"\\]|\\.)*)"')
+
+CALIBRATION_SAMPLE = 20                                                     # Participants timed through the pipeline
+RUN_OVERHEAD_S = 4.0                                                        # Interpreter start, imports, pauses
+WORKER_MIN_S = 60.0                                                         # Parse work worth another worker
+MEMORY_HEADROOM = 0.8                                                       # Share of the budget a plan may use
+MIN_CHUNK_SIZE = 50
+
+
+def parse_bytes(SIZE):
+    """
+    SIZE => Integer bytes, or a string like 512M / 8G / 1.5T
+
+    Returns integer bytes
+    """
+
+    if isinstance(SIZE, (int, float)):
+        return int(SIZE)
+
+    match = re.fullmatch(r"\s*([\d.]+)\s*([kmgt]?)i?b?\s*", str(SIZE).lower())
+
+    if not match:
+        raise ValueError(f"Can't read {SIZE} as a size ... try e.g. 512M or 8G")
+
+    return int(float(match.group(1)) * 1024 ** " kmgt".index(match.group(2) or " "))
+
+
+def available_memory():
+    """
+    Returns bytes of memory available to a new job (MemAvailable, or physical memory)
+    """
+
+    try:
+        with open("/proc/meminfo") as incoming:
+            for line in incoming:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+
+    except OSError:
+        pass
+
+    return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+
+
+def prescan_export(PATH):
+    """
+    PATH => Relative path to the Wellping export
+
+    The byte scan `split` uses, plus a regex count inside each participant ... nothing is decoded
+    Returns tuple of (DataFrame of key / offset / length / answers / pings per participant,
+                      set of distinct question IDs)
+    """
+
+    rows, questions = [], set()
+
+    with open(PATH, "rb") as incoming, \
+         mmap.mmap(incoming.fileno(), 0, access=mmap.ACCESS_READ) as raw:
+
+        for key, offset, length in scan_offsets(PATH):
+            piece = raw[offset:offset + length]
+            asked = QUESTION.findall(piece)
+
+            questions.update(asked)
+            rows.append((key, offset, length, len(asked), len(set(PING_ID.findall(piece)))))
+
+    scan = pd.DataFrame(rows, columns=["key", "offset", "length", "answers", "pings"])
+
+    return scan, {x.decode("utf-8", "replace") for x in questions}
+
+
+def calibrate(PATH, SCAN, PROFILE=SCP_2021, TYPED=False, LAYOUT="wide", FORMAT="csv",
+              SAMPLE=CALIBRATION_SAMPLE, SEED=0, JSON_BACKEND="auto"):
+    """
+    PATH => Relative path to the Wellping export
+    SCAN => DataFrame from prescan_export
+    PROFILE => StudyProfile object
+    TYPED => Boolean, typed answer columns (see typed.py)
+    LAYOUT => One of files.LAYOUTS
+    FORMAT => One of files.OUTPUT_FORMATS, for timing the aggregate write
+    SAMPLE => Participants with answers to time (the largest is always included)
+    SEED => Random seed for the sample
+    JSON_BACKEND => Decoder to use (see jsonio.BACKENDS)
+
+    The sampled participants go through the same per-participant steps as run_study,
+    writing into a temporary directory
+    Returns dictionary of measured costs
+    """
+
+    responders = SCAN.loc[SCAN["answers"] > 0]
+
+    if responders.empty:
+        raise ValueError(f"No participant in {PATH} has any answers ... nothing to calibrate")
+
+    picks = random.Random(SEED).sample(list(responders.index), min(SAMPLE, len(responders)))
+    picks = SCAN.loc[sorted(set(picks) | {responders["length"].idxmax()})]
+
+    with open(PATH, "rb") as incoming:
+        pieces = []
+
+        for offset, length in zip(picks["offset"], picks["length"]):
+            incoming.seek(offset)
+            pieces.append(incoming.read(length))
+
+    # Python objects per byte of JSON, traced separately so tracing doesn't skew the timings
+    tracemalloc.start()
+    decoded = [jsonio.loads(x, JSON_BACKEND) for x in pieces]
+    decoded_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del decoded
+
+    start = time.perf_counter()
+    subsets = [jsonio.loads(x, JSON_BACKEND) for x in pieces]
+    decode_s = time.perf_counter() - start
+
+    seconds, frames, rows = [], [], 0
+
+    with tempfile.TemporaryDirectory() as directory:
+        log = io.StringIO()
+
+        for key, subset in zip(picks["key"], subsets):
+            start = time.perf_counter()
+
+            validate_participant(subset)
+            device_record(subset, key)
+
+            if LAYOUT == "long":
+                rows += sum(1 for _ in long_answers(key, subset))
+            else:
+                frames.append(parse_responses(key, subset, log, directory, True, PROFILE, TYPED))
+
+            seconds.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+
+        if frames:
+            aggregate = concat_categorical(frames)
+            rows = len(aggregate)
+            row_bytes = aggregate.memory_usage(deep=True).sum() / max(rows, 1)
+            write_table(aggregate, os.path.join(directory, "aggregate"), FORMAT)
+        else:
+            row_bytes = 0.0
+
+        aggregate_s = time.perf_counter() - start
+
+    # Per-participant overhead + per-answer cost, least squares through the sample
+    answers, seconds = picks["answers"].to_numpy(dtype=float), np.array(seconds)
+    per_answer = max(np.polyfit(answers, seconds, 1)[0], 0.0) if answers.std() else 0.0
+    per_participant = max(seconds.mean() - per_answer * answers.mean(), 0.0)
+
+    sample_bytes = int(picks["length"].sum())
+
+    return {"sample": len(picks),
+            "decode_s_per_byte": decode_s / sample_bytes,
+            "memory_per_byte": decoded_bytes / sample_bytes,
+            "parse_s_per_participant": float(per_participant),
+            "parse_s_per_answer": float(per_answer),
+            "aggregate_s_per_row": aggregate_s / max(rows, 1),
+            "row_bytes": float(row_bytes),
+            "rows_per_ping": rows / max(int(picks["pings"].sum()), 1),
+            "base_rss_bytes": rss_bytes()}
+
+
+def estimate_run(SCAN, RATES, WORKERS=1, CHUNK_SIZE=None, SCAN_S=0.0):
+    """
+    SCAN => DataFrame from prescan_export
+    RATES => Dictionary from calibrate
+    WORKERS => Parallel `parse --worker` runs (1 => one ordinary run)
+    CHUNK_SIZE => Optional integer, as run_study's CHUNK_SIZE
+    SCAN_S => Seconds one byte scan takes (the `split` a worker run needs first)
+
+    One ordinary run decodes the whole export up front; chunked runs and workers seek to
+    their own participants, so only the participant being parsed is decoded at once
+    Returns dictionary of runtime_s and peak_memory_bytes (per run)
+    """
+
+    responders = SCAN.loc[SCAN["answers"] > 0]
+    rows = SCAN["pings"].sum() * RATES["rows_per_ping"]
+
+    decode_s = SCAN["length"].sum() * RATES["decode_s_per_byte"]
+    parse_s = (len(responders) * RATES["parse_s_per_participant"]
+               + responders["answers"].sum() * RATES["parse_s_per_answer"])
+    aggregate_s = rows * RATES["aggregate_s_per_row"]
+
+    # Rows held before a flush (or all of a run's rows), twice over while they're stacked
+    share = len(SCAN) / WORKERS
+    held = min(CHUNK_SIZE or share, share) * rows / len(SCAN)
+
+    if WORKERS > 1:
+
+        # split, the workers side by side, then merge
+        runtime = SCAN_S + 2 * RUN_OVERHEAD_S + (decode_s + parse_s + aggregate_s) / WORKERS + aggregate_s
+        decoded = SCAN["length"].max() * RATES["memory_per_byte"]
+
+    elif CHUNK_SIZE:
+
+        # One byte scan, then participants decoded as they are reached
+        runtime = SCAN_S + RUN_OVERHEAD_S + decode_s + parse_s + aggregate_s
+        decoded = SCAN["length"].max() * RATES["memory_per_byte"]
+
+    else:
+        runtime = RUN_OVERHEAD_S + decode_s + parse_s + aggregate_s
+        decoded = SCAN["length"].sum() * RATES["memory_per_byte"]
+
+    return {"runtime_s": round(float(runtime), 1),
+            "peak_memory_bytes": int(RATES["base_rss_bytes"] + decoded + 2 * held * RATES["row_bytes"])}
+
+
+def recommend(SCAN, RATES, MEMORY=None, CPUS=None, SCAN_S=0.0):
+    """
+    SCAN => DataFrame from prescan_export
+    RATES => Dictionary from calibrate
+    MEMORY => Optional memory budget for the whole job (integer bytes or e.g. 8G; defaults to what's available)
+    CPUS => Optional CPUs for the whole job (defaults to this machine's)
+    SCAN_S => Seconds one byte scan takes
+
+    Workers are added when each gets WORKER_MIN_S of parsing, or when fewer won't fit in
+    memory; a chunk size is only set when a run's rows wouldn't otherwise fit
+    Returns dictionary of workers, chunk_size, and their estimate
+    """
+
+    budget = parse_bytes(MEMORY) if MEMORY is not None else available_memory()
+    cpus = CPUS or os.cpu_count() or 1
+    usable = budget * MEMORY_HEADROOM
+
+    single = estimate_run(SCAN, RATES, 1, None, SCAN_S)
+    workers = max(1, min(cpus, int((single["runtime_s"] - RUN_OVERHEAD_S) // WORKER_MIN_S)))
+
+    rows_per_participant = SCAN["pings"].sum() * RATES["rows_per_ping"] / len(SCAN)
+    settings = None
+
+    for count in range(workers, cpus + 1):
+        if estimate_run(SCAN, RATES, count, None, SCAN_S)["peak_memory_bytes"] * count <= usable:
+            settings = (count, None)
+            break
+
+        # Largest chunk (fewest flushes) whose rows fit next to everything else
+        fixed = estimate_run(SCAN, RATES, count, 1, SCAN_S)["peak_memory_bytes"]
+        chunk_size = int((usable / count - fixed) // max(2 * rows_per_participant * RATES["row_bytes"], 1))
+
+        if chunk_size >= MIN_CHUNK_SIZE:
+            settings = (count, chunk_size)
+            break
+
+    # Nothing fits => the smallest footprint on offer, flagged as over budget
+    if settings is None:
+        settings = min(((x, MIN_CHUNK_SIZE) for x in range(1, cpus + 1)),
+                       key=lambda x: estimate_run(SCAN, RATES, x[0], x[1], SCAN_S)["peak_memory_bytes"] * x[0])
+
+    workers, chunk_size = settings
+    estimate = estimate_run(SCAN, RATES, workers, chunk_size, SCAN_S)
+
+    return {"workers": workers,
+            "chunk_size": chunk_size,
+            "runtime_s": estimate["runtime_s"],
+            "peak_memory_bytes": estimate["peak_memory_bytes"] * workers,
+            "fits": bool(estimate["peak_memory_bytes"] * workers <= usable),
+            "memory_budget_bytes": int(budget),
+            "cpus": cpus}
+
+
+def plan_study(JSON_PATH, PROFILE=SCP_2021, TYPED=False, LAYOUT="wide", FORMAT="csv", CHUNK_SIZE=None,
+               MEMORY=None, CPUS=None, SAMPLE=CALIBRATION_SAMPLE, SEED=0, JSON_BACKEND="auto"):
+    """
+    JSON_PATH => Relative path to the Wellping export
+    PROFILE => StudyProfile object
+    TYPED => Boolean, typed answer columns (see typed.py)
+    LAYOUT => One of files.LAYOUTS
+    FORMAT => One of files.OUTPUT_FORMATS
+    CHUNK_SIZE => Optional chunk size of the run as currently configured
+    MEMORY => Optional memory budget (integer bytes or e.g. 8G)
+    CPUS => Optional CPU count
+    SAMPLE => Participants to time (see calibrate)
+    SEED => Random seed for the sample
+    JSON_BACKEND => Decoder to use (see jsonio.BACKENDS)
+
+    Returns dictionary of the export's shape, the current run's estimate, and the recommendation
+    """
+
+    start = time.perf_counter()
+    scan, questions = prescan_export(JSON_PATH)
+    scan_s = time.perf_counter() - start
+
+    if scan.empty:
+        raise ValueError(f"No participants in {JSON_PATH}")
+
+    rates = calibrate(JSON_PATH, scan, PROFILE, TYPED, LAYOUT, FORMAT, SAMPLE, SEED, JSON_BACKEND)
+
+    # Long layout streams every answer to disk ... no rows are held
+    if LAYOUT == "long":
+        rates["row_bytes"] = 0.0
+
+    largest = scan.loc[scan["length"].idxmax()]
+    answers = scan["answers"]
+
+    return {"export": os.path.abspath(JSON_PATH),
+            "bytes": int(scan["length"].sum()),
+            "participants": len(scan),
+            "responders": int((answers > 0).sum()),
+            "answers": {"total": int(answers.sum()),
+                        "mean": round(float(answers.mean()), 1),
+                        "median": float(answers.median()),
+                        "p95": float(answers.quantile(0.95)),
+                        "max": int(answers.max())},
+            "answered_pings": int(scan["pings"].sum()),
+            "largest": {"key": largest["key"], "bytes": int(largest["length"]), "answers": int(largest["answers"])},
+            "questions": sorted(questions),
+            "scan_s": round(scan_s, 2),
+            "calibration": rates,
+            "current": estimate_run(scan, rates, 1, CHUNK_SIZE, scan_s),
+            "recommended": recommend(scan, rates, MEMORY, CPUS, scan_s)}
+
+
+def save_plan(PLAN, OUTPUT_DIR, OUTPUT_FILENAME, JSON_BACKEND="auto"):
+    """
+    PLAN => Dictionary from plan_study
+    OUTPUT_DIR => Relative path to save into
+    OUTPUT_FILENAME => Export filename (e.g., test_data)
+    JSON_BACKEND => Encoder to use (see jsonio.BACKENDS)
+
+    Returns relative path to the saved plan
+    """
+
+    plan_name = os.path.join(OUTPUT_DIR, PLAN_NAME.format(OUTPUT_FILENAME))
+
+    with open(plan_name, "wb") as outgoing:
+        jsonio.dump(PLAN, outgoing, JSON_BACKEND, INDENT=2)
+
+    return plan_name
@@ -0,0 +1,119 @@
+#!/bin/python3
+
+"""
+About this Script
+
+Study profiles describe the parts of a Wellping questionnaire that vary between
+study versions: which nomination questions get split into slot columns, how many
+slots there are, which multi-select questions are un-nested, and which columns
+have their square brackets stripped
+
+Ian Ferguson | Stanford University
+"""
+
+# ----------- Imports
+import re
+from dataclasses import dataclass, field, asdict
+
+
+# ----------- Definitions
+@dataclass(frozen=True)
+class StudyProfile:
+    """
+    name => Short identifier used at the command line
+    nominations => Keys are existing nomination columns, values are slot column templates
+    slots => Number of slot columns per nomination question (e.g., SU_Nom_1 .. SU_Nom_6)
+    multi_select => Columns of [option, True / False] pairs, reduced to the options marked True
+    strip_brackets => Columns that have square brackets removed
+    question_types => Keys are question IDs, values are declared answer types for typed
+                      parsing (see typed.QUESTION_TYPES); undeclared questions are inferred
+    """
+
+    name: str
+    nominations: dict = field(default_factory=dict)
+    slots: int = 3
+    multi_select: tuple = ()
+    strip_brackets: tuple = ()
+    question_types: dict = field(default_factory=dict)
+
+    def slot_columns(self, PARENT):
+        """
+        PARENT => Nomination column (key of nominations)
+
+        Returns list of slot column names, e.g. SU_Nom_1 .. SU_Nom_3
+        """
+
+        return [self.nominations[PARENT].format(k) for k in range(1, self.slots + 1)]
+
+    def nomination_slots(self, COLUMNS):
+        """
+        COLUMNS => Columns of a parsed DataFrame
+
+        Finds every slot column present, including overflow slots past PROFILE.slots
+        Returns list of (slot column, nomination parent, slot number) tuples
+        """
+
+        patterns = {parent: re.compile("^" + re.escape(template).replace(re.escape("{}"), r"(\d+)") + "$")
+                    for parent, template in self.nominations.items()}
+
+        keepers = []
+
+        for column in COLUMNS:
+            for parent, pattern in patterns.items():
+                found = pattern.match(str(column))
+
+                if found:
+                    keepers.append((column, parent, int(found.group(1))))
+                    break
+
+        return keepers
+
+    def to_dict(self):
+        """
+        Returns plain dictionary of the profile (e.g., for cache keys)
+        """
+
+        return asdict(self)
+
+
+# Stanford Communities Project, 2021 EMA (ripper.py)
+SCP_2021 = StudyProfile(
+    name="scp-2021",
+    nominations={'SU_Nom': 'SU_Nom_{}',
+                 'SU_Nom_None_Nom': 'SU_Nom_None_Nom_{}',
+                 'NSU_Rel': 'NSU{}_Rel',
+                 'NSU_Nom_None_Nom': 'NSU{}_None_Rel'},
+    slots=3,
+    multi_select=('Race',))
+
+
+# Stanford Communities Project, 2022-2023 EMA (EMI_Parser)
+SCP_2023 = StudyProfile(
+    name="scp-2023",
+    nominations={'SU_Nom': 'SU_Nom_{}',
+                 'SU_Nom_None_Nom': 'SU_Nom_None_Nom_{}',
+                 'SU_Nom_None_Digital_Nom': 'SU_Nom_None_Digital_Nom_{}',
+                 'SU_Digital_Nom': 'SU_Digital_Nom_{}',
+                 'SU_Digital_Nom_None_In_Person': 'SU_Digital_Nom_None_In_Person_{}',
+                 'SU_Nom_None_Digital_Nom_None_In_Person': 'SU_Nom_None_Digital_Nom_None_In_Person_{}',
+                 'NSU_Rel': 'NSU{}_Rel',
+                 'NSU_Nom_None_Nom': 'NSU{}_None_Rel'},
+    slots=6,
+    multi_select=('Race', 'socialRiskTaking', 'socMediaPlatforms'),
+    strip_brackets=('SU_Most_Meaningful', 'ladderUS'))
+
+
+PROFILES = {x.name: x for x in [SCP_2021, SCP_2023]}
+
+
+def get_profile(NAME):
+    """
+    NAME => Profile name (key of PROFILES)
+
+    Returns StudyProfile object
+    """
+
+    if NAME not in PROFILES:
+        raise ValueError(f"Unknown study profile {NAME} ... choose from {list(PROFILES)}")
+
+    return PROFILES[NAME]
@@ -0,0 +1,210 @@
+#!/bin/python3
+
+"""
+About this Script
+
+Machine-readable progress for batch schedulers. While a run is going, a reporter
+writes its current stage, participants done / remaining, rows and bytes processed,
+throughput, resident memory, and ETA either as JSON lines (a file or a FIFO) or as a
+Prometheus textfile (rewritten in place). A job that stops making progress stops
+updating its timestamp, so a scheduler can kill or rebalance it
+
+Ian Ferguson | Stanford University
+"""
+
+# ----------- Imports
+import os, time, resource
+
+from . import jsonio
+
+
+# ----------- Definitions
+PROGRESS_FORMATS = ["jsonl", "prometheus"]
+
+
+def rss_bytes():
+    """
+    Returns current resident set size in bytes (peak RSS where /proc is unavailable)
+    """
+
+    try:
+        with open("/proc/self/statm", "rb") as incoming:
+            return int(incoming.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+    except (OSError, ValueError, IndexError):
+
+        # ru_maxrss is kilobytes on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if os.uname().sysname == "Darwin" else peak * 1024
+
+
+class ProgressReporter:
+    """
+    Tracks one run stage by stage and writes progress events. With no PATH nothing
+    is written, so callers can report unconditionally
+
+    * PATH: Optional file (or FIFO) to write to
+    * FORMAT: One of PROGRESS_FORMATS
+        * jsonl => one JSON object per event, appended
+        * prometheus => gauges for the node-exporter textfile collector, replaced atomically
+    * INTERVAL: Minimum seconds between progress events (stage changes are always written)
+    * LABEL: Run name attached to every event (e.g., the export filename)
+    * JSON_BACKEND: Encoder to use (see jsonio.BACKENDS)
+    """
+
+    def __init__(self, PATH=None, FORMAT="jsonl", INTERVAL=1.0, LABEL="", JSON_BACKEND="auto"):
+
+        if FORMAT not in PROGRESS_FORMATS:
+            raise ValueError(f"Unknown progress format {FORMAT} ... choose from {PROGRESS_FORMATS}")
+
+        self.path = PATH
+        self.format = FORMAT
+        self.interval = INTERVAL
+        self.label = LABEL
+        self.json_backend = JSON_BACKEND
+
+        self.outgoing = None
+        self.started = time.time()
+        self.last_emit = 0.0
+
+        self.stage_name, self.total, self.done = "start", None, 0
+        self.stage_started, self.stage_done = self.started, 0
+        self.rows, self.bytes_read = 0, 0
+
+
+    def stage(self, NAME, TOTAL=None, DONE=0):
+        """
+        NAME => Stage name (e.g., read, parse, aggregate, devices)
+        TOTAL => Optional participants in this stage
+        DONE => Participants already finished (e.g., before a resumed checkpoint)
+        """
+
+        self.stage_name, self.total, self.done = NAME, TOTAL, DONE
+        self.stage_started, self.stage_done = time.time(), 0
+
+        self.emit("stage")
+
+
+    def update(self, DONE=1, ROWS=0, BYTES=0):
+        """
+        DONE => Participants finished since the last update
+        ROWS => Rows produced since the last update
+        BYTES => Bytes of the export read since the last update
+        """
+
+        self.done += DONE
+        self.stage_done += DONE
+        self.rows += ROWS
+        self.bytes_read += BYTES
+
+        if time.time() - self.last_emit >= self.interval:
+            self.emit()
+
+
+    def track(self, KEYS, BYTES=None):
+        """
+        KEYS => Iterable of participant keys
+        BYTES => Optional callable, key => bytes read for that participant
+
+        Counts each key as done once the loop body moves on (including `continue`)
+        Yields each key
+        """
+
+        for key in KEYS:
+            yield key
+            self.update(1, BYTES=BYTES(key) if BYTES else 0)
+
+
+    def snapshot(self, EVENT="progress"):
+        """
+        EVENT => progress | stage | done | failed
+
+        Returns dictionary of the current numbers
+        """
+
+        now = time.time()
+        elapsed = max(now - self.stage_started, 1e-9)
+        rate = self.stage_done / elapsed
+
+        remaining = None if self.total is None else max(self.total - self.done, 0)
+        eta = None if remaining is None or rate == 0 else round(remaining / rate, 1)
+
+        return {"event": EVENT,
+                "time": round(now, 3),
+                "run": self.label,
+                "stage": self.stage_name,
+                "done": self.done,
+                "total": self.total,
+                "remaining": remaining,
+                "participants_per_s": round(rate, 2),
+                "rows": self.rows,
+                "rows_per_s": round(self.rows / max(now - self.started, 1e-9), 1),
+                "bytes_read": self.bytes_read,
+                "rss_bytes": rss_bytes(),
+                "elapsed_s": round(now - self.started, 1),
+                "eta_s": eta}
+
+
+    def emit(self, EVENT="progress"):
+        """
+        EVENT => progress | stage | done | failed
+
+        Writes one event (nothing without a PATH)
+        """
+
+        self.last_emit = time.time()
+
+        if not self.path:
+            return
+
+        record = self.snapshot(EVENT)
+
+        if self.format == "prometheus":
+            self._write_textfile(record)
+            return
+
+        # Opened on first use ... a FIFO blocks here until the scheduler starts reading
+        if self.outgoing is None:
+            self.outgoing = open(self.path, "ab")
+
+        self.outgoing.write(jsonio.dumps(record, self.json_backend) + b"\n")
+        self.outgoing.flush()
+
+
+    def _write_textfile(self, RECORD):
+        """
+        RECORD => Dictionary from snapshot
+
+        One gauge per number, labelled with run and stage
+        """
+
+        labels = f'run="{self.label}",stage="{RECORD["stage"]}"'
+        lines = []
+
+        for field in ("done", "remaining", "participants_per_s", "rows", "rows_per_s", "bytes_read",
+                      "rss_bytes", "elapsed_s", "eta_s", "time"):
+            if RECORD[field] is None:
+                continue
+
+            name = f"wellping_{'last_update_timestamp_s' if field == 'time' else field}"
+            lines += [f"# TYPE {name} gauge", f"{name}{{{labels}}} {RECORD[field]}"]
+
+        lines += ["# TYPE wellping_finished gauge", f"wellping_finished{{{labels}}} {int(RECORD['event'] == 'done')}"]
+
+        with open(f"{self.path}.tmp", "w") as outgoing:
+            outgoing.write("\n".join(lines) + "\n")
+
+        os.replace(f"{self.path}.tmp", self.path)
+
+
+    def close(self):
+        """
+        Writes the final event and closes the stream
+        """
+
+        self.stage_name = "done"
+        self.emit("done")
+
+        if self.outgoing is not None:
+            self.outgoing.close()
+            self.outgoing = None
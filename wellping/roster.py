@@ -0,0 +1,207 @@
+#!/bin/python3
+
+"""
+About this Script
+
+Resolves nominees (the SU_Nom_1 .. NSU3_Rel slot columns) to IDs on a class roster.
+The roster is normalized and indexed by character trigrams once, then every distinct
+nominee string across all participants is scored against it in bulk. Results are
+cached by normalized name, so a name nominated a thousand times is scored once
+
+Ian Ferguson | Stanford University
+"""
+
+# ----------- Imports
+import re, unicodedata
+from collections import Counter, defaultdict
+import pandas as pd
+
+from .profile import SCP_2021
+from .answers import melt_nominations
+from .aggregate import iter_aggregate, aggregate_columns
+
+
+# ----------- Definitions
+MATCH_COLUMNS = ['username', 'login-node', 'id', 'nomination', 'slot', 'nominee',
+                 'roster_id', 'roster_name', 'score']
+
+
+def normalize_name(NAME):
+    """
+    NAME => Raw name string (nominee or roster entry)
+
+    Strips accents, punctuation, case, and repeated whitespace
+    E.g., "  Iñigo  O'Ruiz " => "inigo oruiz"
+    """
+
+    temp = unicodedata.normalize("NFKD", str(NAME))
+    temp = "".join(x for x in temp if not unicodedata.combining(x))
+    temp = re.sub(r"[^\w\s]", "", temp.lower())
+
+    return " ".join(temp.split())
+
+
+def trigrams(NAME):
+    """
+    NAME => Normalized name
+
+    Returns set of character trigrams (padded, so short names still index)
+    """
+
+    padded = f"  {NAME} "
+
+    return {padded[ix:ix + 3] for ix in range(len(padded) - 2)}
+
+
+class RosterIndex:
+    """
+    Trigram index over a class roster
+
+    * IDS: Roster IDs
+    * NAMES: Roster names (same order as IDS)
+    * THRESHOLD: Minimum similarity (Dice coefficient on trigrams) to accept a match
+    """
+
+    def __init__(self, IDS, NAMES, THRESHOLD=0.5):
+
+        self.ids = list(IDS)
+        self.names = list(NAMES)
+        self.threshold = THRESHOLD
+
+        self.normalized = [normalize_name(x) for x in self.names]
+        self.grams = [trigrams(x) for x in self.normalized]
+
+        # Exact normalized name => roster position (first wins)
+        self.exact = {}
+
+        # Trigram => roster positions containing it
+        self.postings = defaultdict(list)
+
+        for ix, (name, grams) in enumerate(zip(self.normalized, self.grams)):
+            self.exact.setdefault(name, ix)
+
+            for gram in grams:
+                self.postings[gram].append(ix)
+
+        # Normalized nominee => (roster ID, roster name, score)
+        self.cache = {}
+
+
+    @classmethod
+    def from_csv(cls, PATH, ID_COLUMN="id", NAME_COLUMNS="name", THRESHOLD=0.5):
+        """
+        PATH => Relative path to roster CSV
+        ID_COLUMN => Column holding the roster ID
+        NAME_COLUMNS => Column (or list of columns, e.g. first + last) holding the name
+        THRESHOLD => Minimum similarity to accept a match
+
+        Returns RosterIndex object
+        """
+
+        if isinstance(NAME_COLUMNS, str):
+            NAME_COLUMNS = [NAME_COLUMNS]
+
+        roster = pd.read_csv(PATH, dtype=str, keep_default_na=False)
+        names = roster[NAME_COLUMNS].agg(" ".join, axis=1)
+
+        return cls(roster[ID_COLUMN], names, THRESHOLD)
+
+
+    def match(self, NOMINEE):
+        """
+        NOMINEE => Raw nominee string
+
+        Returns tuple of (roster ID, roster name, score); ID and name are
+        None when nothing clears the threshold
+        """
+
+        name = normalize_name(NOMINEE)
+
+        if name in self.cache:
+            return self.cache[name]
+
+        if name in self.exact:
+            ix = self.exact[name]
+            result = (self.ids[ix], self.names[ix], 1.0)
+
+        else:
+            grams = trigrams(name)
+
+            # Count shared trigrams against every roster entry that has at least one
+            shared = Counter(ix for gram in grams for ix in self.postings.get(gram, []))
+
+            best_ix, best_score = None, 0.0
+
+            for ix, overlap in shared.items():
+                score = 2 * overlap / (len(grams) + len(self.grams[ix]))
+
+                if score > best_score:
+                    best_ix, best_score = ix, score
+
+            if best_ix is not None and best_score >= self.threshold:
+                result = (self.ids[best_ix], self.names[best_ix], round(best_score, 4))
+            else:
+                result = (None, None, round(best_score, 4))
+
+        self.cache[name] = result
+
+        return result
+
+
+    def match_many(self, NOMINEES):
+        """
+        NOMINEES => Iterable of raw nominee strings
+
+        Resolves every distinct nominee once
+        Returns DataFrame object (nominee, roster_id, roster_name, score)
+        """
+
+        unique = pd.unique(pd.Series(list(NOMINEES), dtype=object))
+        resolved = [self.match(x) for x in unique]
+
+        return pd.DataFrame(resolved, columns=['roster_id', 'roster_name', 'score']) \
+                 .assign(nominee=unique) \
+                 .loc[:, ['nominee', 'roster_id', 'roster_name', 'score']]
+
+
+def match_nominations(DF, INDEX, PROFILE=SCP_2021):
+    """
+    DF => Parsed DataFrame object (one row per ping, slot columns wide)
+    INDEX => RosterIndex object
+    PROFILE => StudyProfile object (nomination columns)
+
+    Melts every nomination slot into one long table and resolves the
+    distinct nominees against the roster in bulk
+    Returns DataFrame object with MATCH_COLUMNS
+    """
+
+    long = melt_nominations(DF, PROFILE)
+
+    matches = INDEX.match_many(long['nominee'])
+    long = long.merge(matches, on='nominee', how='left')
+
+    return long.reindex(columns=MATCH_COLUMNS)
+
+
+def match_aggregate(AGGREGATE_NAME, INDEX, PROFILE=SCP_2021, CHUNK_ROWS=100000):
+    """
+    AGGREGATE_NAME => Relative path to the aggregate (.csv or .parquet)
+    INDEX => RosterIndex object
+    PROFILE => StudyProfile object (nomination columns)
+    CHUNK_ROWS => Rows of the aggregate read at a time
+
+    Reads only the key and slot columns of the aggregate (in chunks),
+    so matching works the same after a chunked run
+    Returns DataFrame object with MATCH_COLUMNS
+    """
+
+    header = aggregate_columns(AGGREGATE_NAME)
+    wanted = set(['username', 'login-node', 'id'] + [x[0] for x in PROFILE.nomination_slots(header)])
+
+    keepers = [match_nominations(chunk, INDEX, PROFILE)
+               for chunk in iter_aggregate(AGGREGATE_NAME, lambda x: x in wanted, CHUNK_ROWS)]
+
+    if not keepers:
+        return pd.DataFrame(columns=MATCH_COLUMNS)
+
+    return pd.concat(keepers, ignore_index=True)
@@ -0,0 +1,327 @@
+#!/bin/python3
+
+"""
+About this Script
+
+Local parse service. One long-running process keeps pandas imported, every export it
+has been asked about indexed in memory (byte offsets, see shards.ShardedExport), and
+recently parsed tables cached, so repeated questions about the same export are answered
+without interpreter startup or a full JSON decode:
+
+    * GET /participant?export=PATH&name=scp001 => one participant's pings + answers (every login)
+    * GET /aggregate?export=PATH&stream=dailyStream => the pings aggregate, optionally one stream
+    * GET /keys?export=PATH => participant keys in the export
+    * GET /status => what is loaded
+
+Add format=json for JSON records instead of CSV, profile=scp-2023 for another study
+profile, and dedup= / typed=1 on /aggregate. Participants (or logins) that fail to parse
+are left out of /aggregate and /participant as in a full run, printed to the service's
+console, and counted in the X-Parse-Errors response header (and per table in /status).
+Exports and tables are evicted least recently used first; an export that changes on disk
+is indexed again. The lock is only held to look up and store, so a slow build doesn't hold
+up other requests. The server only listens on localhost. See ripper_client.py for the
+command-line client
+
+Ian Ferguson | Stanford University
+"""
+
+# ----------- Imports
+import io, os, json, threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import pandas as pd
+
+from .profile import get_profile
+from .shards import ShardedExport
+from .validate import validate_participant
+from .aggregate import concat_categorical, agg_drop_duplicates
+from .pipeline import parse_responses
+
+
+# ----------- Definitions
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+
+class ParseService:
+    """
+    Loaded exports and parsed tables, each held in a small LRU
+
+    * JSON_BACKEND: Decoder to use (see jsonio.BACKENDS)
+    * MAX_EXPORTS: Export indexes kept in memory
+    * MAX_TABLES: Parsed tables (participants + aggregates) kept in memory
+    """
+
+    def __init__(self, JSON_BACKEND="auto", MAX_EXPORTS=2, MAX_TABLES=32):
+
+        self.json_backend = JSON_BACKEND
+        self.max_exports = MAX_EXPORTS
+        self.max_tables = MAX_TABLES
+
+        self.exports = OrderedDict()                                        # Path => (signature, ShardedExport)
+        self.tables = OrderedDict()                                         # (signature, request) => DataFrame
+        self.lock = threading.RLock()
+
+
+    @staticmethod
+    def _touch(CACHE, KEY, VALUE, LIMIT):
+
+        CACHE[KEY] = VALUE
+        CACHE.move_to_end(KEY)
+
+        while len(CACHE) > LIMIT:
+            CACHE.popitem(last=False)
+
+
+    def export(self, PATH):
+        """
+        PATH => Path to a Wellping export
+
+        Indexed once (one byte scan), then served from memory until the file changes.
+        The scan runs outside the lock, so other requests aren't held up by it
+        Returns tuple of (signature, ShardedExport)
+        """
+
+        PATH = os.path.abspath(PATH)
+
+        if not PATH.endswith(".json") or not os.path.isfile(PATH):
+            raise FileNotFoundError(f"No Wellping export at {PATH}")
+
+        stat = os.stat(PATH)
+        signature = (PATH, stat.st_size, stat.st_mtime_ns)
+
+        with self.lock:
+            if PATH in self.exports and self.exports[PATH][0] == signature:
+                self.exports.move_to_end(PATH)
+                return self.exports[PATH]
+
+        export = ShardedExport.scan(PATH, self.json_backend)
+
+        with self.lock:
+
+            # New or changed on disk => every table built from the old bytes goes too
+            self.tables = OrderedDict((x, y) for x, y in self.tables.items() if x[0][0] != PATH or x[0] == signature)
+            self._touch(self.exports, PATH, (signature, export), self.max_exports)
+
+        return signature, export
+
+
+    def _cached(self, SIGNATURE, REQUEST):
+        """
+        Returns cached (table, errors) for this export and request, or None
+        """
+
+        with self.lock:
+            if (SIGNATURE, REQUEST) not in self.tables:
+                return None
+
+            self.tables.move_to_end((SIGNATURE, REQUEST))
+            return self.tables[(SIGNATURE, REQUEST)]
+
+
+    def _store(self, SIGNATURE, REQUEST, TABLE, ERRORS):
+
+        with self.lock:
+
+            # The export may have been indexed again while this table was built
+            if self.exports.get(SIGNATURE[0], (None,))[0] == SIGNATURE:
+                self._touch(self.tables, (SIGNATURE, REQUEST), (TABLE, ERRORS), self.max_tables)
+
+
+    def _parse(self, KEY, SUBSET, PROFILE, TYPED):
+        """
+        One participant through the usual pipeline, nothing written to disk
+        Returns DataFrame object, or None when there is nothing to parse
+        """
+
+        if validate_participant(SUBSET) or not SUBSET['answers']:
+            return None
+
+        return parse_responses(KEY, SUBSET, io.StringIO(), None, False, PROFILE, TYPED)
+
+
+    def _parse_all(self, KEYS, EXPORT, PROFILE, TYPED, PATH):
+        """
+        Every key through _parse ... one that fails is printed and reported, the rest go on
+        Returns tuple of (stacked DataFrame object, dictionary of participant key => error)
+        """
+
+        frames, errors = [], {}
+
+        for key in KEYS:
+            try:
+                parsed_data = self._parse(key, EXPORT[key], PROFILE, TYPED)
+            except Exception as e:
+                errors[key] = str(e)
+                print(f"Caught @ {key.split('-')[0]} ({os.path.basename(PATH)}): {e}")
+                continue
+
+            if parsed_data is not None:
+                frames.append(parsed_data)
+
+        return (concat_categorical(frames) if frames else pd.DataFrame()), errors
+
+
+    def participant(self, PATH, NAME, PROFILE="scp-2021", TYPED=False):
+        """
+        PATH => Path to a Wellping export
+        NAME => Username (every login) or one participant key
+        PROFILE => Study profile name (see profile.PROFILES)
+        TYPED => Boolean, typed answer columns (see typed.py)
+
+        Logins that fail to parse are left out and reported, as in aggregate
+        Returns tuple of (DataFrame object, dictionary of participant key => error)
+        """
+
+        signature, export = self.export(PATH)
+        request = ("participant", NAME, PROFILE, bool(TYPED))
+        cached = self._cached(signature, request)
+
+        if cached is not None:
+            return cached
+
+        keys = [x for x in export if x == NAME or x.split('-')[0] == NAME]
+
+        if not keys:
+            raise KeyError(f"{NAME} is not in {os.path.basename(PATH)}")
+
+        table, errors = self._parse_all(keys, export, get_profile(PROFILE), TYPED, PATH)
+        self._store(signature, request, table, errors)
+
+        return table, errors
+
+
+    def aggregate(self, PATH, STREAM=None, PROFILE="scp-2021", DEDUP=None, TYPED=False):
+        """
+        PATH => Path to a Wellping export
+        STREAM => Optional streamName to keep
+        PROFILE => Study profile name (see profile.PROFILES)
+        DEDUP => Optional dedup policy (see aggregate.DEDUP_POLICIES)
+        TYPED => Boolean, typed answer columns (see typed.py)
+
+        Built once per export and options, then filtered per request. Participants that
+        fail to parse are left out, as in run_study, and reported instead of dropped silently
+        Returns tuple of (DataFrame object, dictionary of participant key => error)
+        """
+
+        signature, export = self.export(PATH)
+        request = ("aggregate", PROFILE, DEDUP, bool(TYPED))
+        cached = self._cached(signature, request)
+
+        if cached is not None:
+            table, errors = cached
+
+        else:
+            table, errors = self._parse_all(list(export), export, get_profile(PROFILE), TYPED, PATH)
+
+            if table.empty:
+                table = pd.DataFrame(columns=['streamName'])
+            elif DEDUP:
+                table, _ = agg_drop_duplicates(table, DEDUP)
+
+            self._store(signature, request, table, errors)
+
+        if STREAM:
+            table = table.loc[table['streamName'] == STREAM]
+
+        return table, errors
+
+
+    def status(self):
+        """
+        Returns dictionary of loaded exports and cached tables
+        """
+
+        with self.lock:
+            return {"exports": [{"path": x, "participants": len(y[1])} for x, y in self.exports.items()],
+                    "tables": [{"export": x[0][0], "request": list(x[1]), "rows": len(y[0]), "errors": len(y[1])}
+                               for x, y in self.tables.items()]}
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    """
+    Maps GET requests onto the server's ParseService
+    """
+
+    def do_GET(self):
+
+        url = urlparse(self.path)
+        query = {x: y[-1] for x, y in parse_qs(url.query).items()}
+        service = self.server.service
+
+        try:
+            if url.path == "/status":
+                return self._send(200, json.dumps(service.status()).encode("utf-8"), "application/json")
+
+            if url.path == "/keys":
+                _, export = service.export(query["export"])
+                return self._send(200, json.dumps(list(export)).encode("utf-8"), "application/json")
+
+            if url.path == "/participant":
+                table, errors = service.participant(query["export"], query["name"],
+                                                    query.get("profile", "scp-2021"), query.get("typed") == "1")
+
+            elif url.path == "/aggregate":
+                table, errors = service.aggregate(query["export"], query.get("stream"),
+                                                  query.get("profile", "scp-2021"),
+                                                  query.get("dedup") or None, query.get("typed") == "1")
+
+            else:
+                return self._send(404, b'{"error": "unknown endpoint"}', "application/json")
+
+        except (KeyError, FileNotFoundError, ValueError) as e:
+            return self._send(400, json.dumps({"error": str(e)}).encode("utf-8"), "application/json")
+
+        except Exception as e:
+            return self._send(500, json.dumps({"error": f"{type(e).__name__}: {e}"}).encode("utf-8"),
+                              "application/json")
+
+        # Participants left out of the table are counted in a header, so the body stays a plain table
+        headers = {"X-Parse-Errors": str(len(errors))}
+
+        if query.get("format") == "json":
+            return self._send(200, table.to_json(orient="records").encode("utf-8"), "application/json", headers)
+
+        return self._send(200, table.to_csv(index=False).encode("utf-8"), "text/csv", headers)
+
+
+    def _send(self, STATUS, BODY, CONTENT_TYPE, HEADERS=None):
+
+        self.send_response(STATUS)
+        self.send_header("Content-Type", f"{CONTENT_TYPE}; charset=utf-8")
+        self.send_header("Content-Length", str(len(BODY)))
+
+        for name, value in (HEADERS or {}).items():
+            self.send_header(name, value)
+
+        self.end_headers()
+        self.wfile.write(BODY)
+
+
+    def log_message(self, format, *args):
+
+        # One short line per request instead of the default access log
+        print(f"{self.command} {self.path} => {args[1] if len(args) > 1 else ''}")
+
+
+def serve_exports(HOST=DEFAULT_HOST, PORT=DEFAULT_PORT, SERVICE=None):
+    """
+    HOST => Interface to listen on (localhost only by default)
+    PORT => Port to listen on
+    SERVICE => Optional ParseService object (e.g., with other cache sizes)
+
+    Returns nothing, runs until interrupted
+    """
+
+    server = ThreadingHTTPServer((HOST, PORT), ServiceHandler)
+    server.service = SERVICE or ParseService()
+
+    print(f"\nServing Wellping exports on http://{HOST}:{PORT} (Ctrl+C to stop)...\n")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
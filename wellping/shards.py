@@ -0,0 +1,287 @@
+#!/bin/python3
+
+"""
+About this Script
+
+Splits a monolithic Wellping export into per-participant pieces without decoding it.
+One pass over the raw bytes finds where every top-level participant key starts and
+ends; the result is a manifest of byte offsets (and, optionally, one shard file per
+participant). Workers then seek straight to their participants and decode only those
+
+    * split_export => One pass, writes manifest.json (+ shards) to the shard directory
+    * ShardedExport => Read-only mapping of key => participant dictionary, backed by the manifest
+    * assign_keys => Deterministic share of the keys for worker i of n
+    * select_keys => Named participants or a seeded sample, for quick previews
+
+Ian Ferguson | Stanford University
+"""
+
+# ----------- Imports
+import os, re, json, mmap, random, pathlib
+from collections.abc import Mapping
+
+from . import jsonio
+
+
+# ----------- Definitions
+MANIFEST_NAME = "manifest.json"
+SHARD_MODES = ["index", "shards"]
+
+# Strings (with escapes, unrolled so the regex engine doesn't backtrack per character)
+# and brackets are the only tokens that change nesting depth
+TOKEN = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"|[{}\[\]]', re.DOTALL)
+COLON = re.compile(rb'\s*:\s*')
+SCALAR = re.compile(rb'[^,}\s]*')
+
+
+def scan_offsets(PATH):
+    """
+    PATH => Relative path to the Wellping export
+
+    Walks the raw bytes once (memory-mapped, nothing is decoded but the keys)
+    Yields tuples of (key, byte offset, byte length) for every top-level participant
+    """
+
+    with open(PATH, "rb") as incoming, \
+         mmap.mmap(incoming.fileno(), 0, access=mmap.ACCESS_READ) as raw:
+
+        depth, key, start = 0, None, None
+
+        for token in TOKEN.finditer(raw):
+            first = raw[token.start()]
+
+            # String ... a key (or a bare string value) when it sits directly under the root
+            if first == 0x22:
+                if depth != 1:
+                    continue
+
+                if key is not None:
+                    yield key, start, token.end() - start
+                    key = None
+                    continue
+
+                key = json.loads(token.group())
+                start = COLON.match(raw, token.end()).end()
+
+                # Numbers, booleans, null ... no token of their own, so close them here
+                if raw[start:start + 1] not in (b"{", b"[", b'"'):
+                    end = SCALAR.match(raw, start).end()
+                    yield key, start, end - start
+                    key = None
+
+                continue
+
+            if first in (0x7b, 0x5b):
+                depth += 1
+                continue
+
+            depth -= 1
+
+            if depth == 1 and key is not None:
+                yield key, start, token.end() - start
+                key = None
+
+
+def split_export(PATH, OUTPUT_DIR, MODE="index", JSON_BACKEND="auto"):
+    """
+    PATH => Relative path to the Wellping export
+    OUTPUT_DIR => Relative path to the shard directory
+    MODE => One of SHARD_MODES
+        * index => Manifest of byte offsets into the export itself
+        * shards => Manifest + one { key }.json file per participant
+    JSON_BACKEND => Encoder to use for the manifest (see jsonio.BACKENDS)
+
+    Returns relative path to the manifest
+    """
+
+    if MODE not in SHARD_MODES:
+        raise ValueError(f"Unknown shard mode {MODE} ... choose from {SHARD_MODES}")
+
+    pathlib.Path(OUTPUT_DIR).mkdir(exist_ok=True, parents=True)
+
+    stat = os.stat(PATH)
+    participants = []
+
+    with open(PATH, "rb") as incoming:
+        for key, offset, length in scan_offsets(PATH):
+            entry = {"key": key, "offset": offset, "length": length}
+
+            if MODE == "shards":
+                shard_name = f"{key.replace(os.sep, '_')}.json"
+
+                incoming.seek(offset)
+
+                with open(os.path.join(OUTPUT_DIR, shard_name), "wb") as outgoing:
+                    outgoing.write(incoming.read(length))
+
+                entry["shard"] = shard_name
+
+            participants.append(entry)
+
+    manifest = {"source": os.path.relpath(PATH, OUTPUT_DIR),
+                "size": stat.st_size,
+                "mtime": stat.st_mtime,
+                "mode": MODE,
+                "participants": participants}
+
+    manifest_name = os.path.join(OUTPUT_DIR, MANIFEST_NAME)
+
+    with open(manifest_name, "wb") as outgoing:
+        jsonio.dump(manifest, outgoing, JSON_BACKEND, INDENT=2)
+
+    return manifest_name
+
+
+def assign_keys(KEYS, WORKER, WORKERS):
+    """
+    KEYS => Participant keys, in export order
+    WORKER => Integer, this worker (1 .. WORKERS)
+    WORKERS => Integer, total number of workers
+
+    Keys are dealt out by username, so every login of one participant lands on
+    the same worker (subject files and dedup stay consistent)
+    Returns list of keys for this worker
+    """
+
+    if not 1 <= WORKER <= WORKERS:
+        raise ValueError(f"Worker {WORKER} is outside 1 .. {WORKERS}")
+
+    usernames = list(dict.fromkeys(x.split('-')[0] for x in KEYS))
+    mine = set(usernames[WORKER - 1::WORKERS])
+
+    return [x for x in KEYS if x.split('-')[0] in mine]
+
+
+def select_keys(KEYS, PARTICIPANTS=None, SAMPLE=None, SEED=0):
+    """
+    KEYS => Participant keys, in export order
+    PARTICIPANTS => Optional list of usernames (or full keys) to keep
+    SAMPLE => Optional integer, keep this many usernames at random
+    SEED => Integer, the same seed picks the same sample every time
+
+    Every login of a chosen username is kept
+    Returns list of keys, in export order
+    """
+
+    usernames = list(dict.fromkeys(x.split('-')[0] for x in KEYS))
+    chosen = set(usernames)
+
+    if PARTICIPANTS:
+        wanted = set(PARTICIPANTS)
+        chosen = {x for x in usernames if x in wanted} | {x.split('-')[0] for x in KEYS if x in wanted}
+
+        missing = wanted - chosen - set(KEYS)
+
+        if missing:
+            print(f"\nNot found in export: {', '.join(sorted(missing))}\n")
+
+    if SAMPLE:
+        pool = [x for x in usernames if x in chosen]
+        chosen = set(random.Random(SEED).sample(pool, min(SAMPLE, len(pool))))
+
+    return [x for x in KEYS if x.split('-')[0] in chosen]
+
+
+class ShardedExport(Mapping):
+    """
+    Read-only key => participant dictionary, backed by a manifest (see split_export).
+    Participants are decoded on access, so only the ones touched are ever in memory
+
+    * MANIFEST: Relative path to manifest.json
+    * JSON_BACKEND: Decoder to use (see jsonio.BACKENDS)
+    * KEYS: Optional subset of keys to expose (e.g., from assign_keys)
+    """
+
+    def __init__(self, MANIFEST, JSON_BACKEND="auto", KEYS=None):
+
+        with open(MANIFEST, "rb") as incoming:
+            manifest = jsonio.load(incoming, JSON_BACKEND)
+
+        self.root = os.path.dirname(MANIFEST)
+        self.source = os.path.join(self.root, manifest["source"])
+        self.json_backend = JSON_BACKEND
+        self.entries = {x["key"]: x for x in manifest["participants"]}
+
+        # Offsets are only valid against the exact bytes that were scanned
+        if manifest["mode"] == "index" and os.path.getsize(self.source) != manifest["size"]:
+            raise ValueError(f"{self.source} changed since it was split ... run split again")
+
+        if KEYS is None:
+            self.keys_ = list(self.entries)
+        else:
+            missing = [x for x in KEYS if x not in self.entries]
+
+            if missing:
+                raise KeyError(f"Not in manifest: {', '.join(missing[:5])}")
+
+            self.keys_ = list(KEYS)
+
+        self.members = set(self.keys_)
+
+
+    @classmethod
+    def scan(cls, PATH, JSON_BACKEND="auto"):
+        """
+        PATH => Relative path to the Wellping export
+        JSON_BACKEND => Decoder to use (see jsonio.BACKENDS)
+
+        Same mapping without writing a manifest ... the export is scanned once
+        in memory (see scan_offsets)
+        Returns ShardedExport object
+        """
+
+        export = cls.__new__(cls)
+
+        export.root = os.path.dirname(PATH)
+        export.source = PATH
+        export.json_backend = JSON_BACKEND
+        export.entries = {key: {"key": key, "offset": offset, "length": length}
+                          for key, offset, length in scan_offsets(PATH)}
+        export.keys_ = list(export.entries)
+        export.members = set(export.keys_)
+
+        return export
+
+
+    def subset(self, KEYS):
+        """
+        KEYS => Keys to keep
+
+        Returns ShardedExport object exposing only KEYS (those this export exposes)
+        """
+
+        export = self.__class__.__new__(self.__class__)
+        export.__dict__.update(self.__dict__)
+        export.keys_ = [x for x in KEYS if x in self.members]
+        export.members = set(export.keys_)
+
+        return export
+
+
+    def __contains__(self, KEY):
+        return KEY in self.members
+
+
+    def __getitem__(self, KEY):
+
+        # The manifest covers the whole export ... only the exposed keys are part of this mapping
+        if KEY not in self.members:
+            raise KeyError(KEY)
+
+        entry = self.entries[KEY]
+
+        if "shard" in entry:
+            with open(os.path.join(self.root, entry["shard"]), "rb") as incoming:
+                return jsonio.load(incoming, self.json_backend)
+
+        with open(self.source, "rb") as incoming:
+            incoming.seek(entry["offset"])
+            return jsonio.loads(incoming.read(entry["length"]), self.json_backend)
+
+
+    def __iter__(self):
+        return iter(self.keys_)
+
+
+    def __len__(self):
+        return len(self.keys_)
@@ -0,0 +1,175 @@
+#!/bin/python3
+
+"""
+About this Script
+
+Typed answers: instead of stringifying every answer (see answers.cleanup_values),
+each question becomes a properly typed column. Types are declared per question in
+the StudyProfile (question_types) or inferred from the raw JSON values:
+
+    * int => Nullable Int64 (sliders, Likert scales)
+    * float => float64
+    * bool => Nullable boolean (yes / no)
+    * categorical => Pandas categorical of strings
+    * text => Pandas string
+    * list => Legacy cleaned string (nested / multi-value answers)
+
+Nomination, multi-select, and bracketed columns keep their legacy strings so the
+downstream stages parse them as before. Prefer-not-to-answer becomes a missing value,
+and the skipped questions are listed in a per-ping PNA column
+
+Ian Ferguson | Stanford University
+"""
+
+# ----------- Imports
+import pandas as pd
+import numpy as np
+
+from .profile import SCP_2021
+from .answers import cleanup_values
+
+
+# ----------- Definitions
+QUESTION_TYPES = ["int", "float", "bool", "categorical", "text", "list"]
+
+
+def raw_value(DATA):
+    """
+    DATA => The data dictionary of one answer
+
+    Single-value answers ({"value": 57}) are unwrapped to the value itself;
+    anything else is kept as-is (and treated as a list answer)
+    """
+
+    if isinstance(DATA, dict) and len(DATA) == 1:
+        return next(iter(DATA.values()))
+
+    return DATA
+
+
+def legacy_value(RAW):
+    """
+    RAW => Raw answer (see raw_value)
+
+    Returns the same string answers.derive_answers would produce
+    """
+
+    if RAW is None:
+        return cleanup_values(None)
+
+    if isinstance(RAW, dict):
+        return cleanup_values(list(RAW.values()))
+
+    return cleanup_values([RAW])
+
+
+def infer_type(SERIES):
+    """
+    SERIES => Pivoted column of raw answers
+
+    Returns one of QUESTION_TYPES
+    """
+
+    kinds = set(type(x) for x in SERIES if x is not None and not (isinstance(x, float) and np.isnan(x)))
+
+    # Nothing answered => all-missing float, which stacks with any numeric column
+    if not kinds:
+        return "float"
+    if kinds == {bool}:
+        return "bool"
+    if kinds <= {int}:
+        return "int"
+    if kinds <= {int, float}:
+        return "float"
+    if kinds == {str}:
+        return "text"
+
+    return "list"
+
+
+def coerce_column(SERIES, TYPE):
+    """
+    SERIES => Pivoted column of raw answers
+    TYPE => One of QUESTION_TYPES
+
+    Returns typed Series object
+    """
+
+    if TYPE == "int":
+        numeric = pd.to_numeric(SERIES, errors="coerce")
+
+        # Declared int but answered with fractions => keep the fractions
+        if (numeric.dropna() % 1 != 0).any():
+            return numeric.astype("float64")
+
+        return numeric.astype("Int64")
+
+    if TYPE == "float":
+        return pd.to_numeric(SERIES, errors="coerce").astype("float64")
+
+    if TYPE == "bool":
+        return SERIES.map({True: True, False: False, "True": True, "False": False}).astype("boolean")
+
+    if TYPE == "categorical":
+        return SERIES.map(lambda x: x if pd.isna(x) else str(x)).astype("category")
+
+    if TYPE == "text":
+        return SERIES.map(lambda x: x if pd.isna(x) else str(x)).astype("string")
+
+    return SERIES.map(lambda x: x if pd.isna(x) else legacy_value(x))
+
+
+def derive_typed_answers(SUBSET, LOG, USER, PROFILE=SCP_2021):
+    """
+    SUBSET => Reduced dictionary of subject information (pings/user/answers)
+    LOG => Text file to log issues
+    USER => Username, used in error log
+    PROFILE => StudyProfile object (question_types + columns that keep legacy strings)
+
+    Typed counterpart of answers.derive_answers ... one row per ping, one column per question
+    Returns DataFrame object
+    """
+
+    answers = pd.DataFrame(SUBSET['answers'])
+    answers = answers.drop_duplicates(subset="date", keep="first").reset_index(drop=True)
+
+    legacy = set(PROFILE.nominations) | set(PROFILE.multi_select) | set(PROFILE.strip_brackets)
+
+    pna = answers['preferNotToAnswer'].fillna(False).astype(bool).to_numpy()
+    keeps_legacy = answers['questionId'].isin(legacy).to_numpy()
+
+    values = []
+
+    for data, skipped, as_string in zip(answers['data'], pna, keeps_legacy):
+        if as_string:
+            values.append("PNA" if skipped else legacy_value(raw_value(data)))
+        else:
+            values.append(None if skipped else raw_value(data))
+
+    answers['value'] = values
+
+    # Pivot long to wide
+    wide = answers.pivot(index="pingId", columns="questionId", values="value")
+
+    for question in wide.columns:
+        if question in legacy:
+            continue
+
+        try:
+            question_type = PROFILE.question_types.get(question) or infer_type(wide[question])
+            wide[question] = coerce_column(wide[question], question_type)
+
+        except Exception as e:
+
+            # Write to error log, keep the raw column
+            LOG.write(f"\nCaught @ {USER} + coerce_column ({question}): {e}\n\n")
+
+    # Questions skipped with prefer-not-to-answer, per ping
+    skipped = answers.loc[pna & ~keeps_legacy].groupby("pingId")["questionId"].agg(";".join)
+    wide["PNA"] = skipped.reindex(wide.index).fillna("")
+
+    wide = wide.reset_index()
+    wide.columns.name = None
+
+    # Rename Ping ID column (for merge with pings DF)
+    return wide.rename(columns={'pingId': 'id'})
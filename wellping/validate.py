@@ -0,0 +1,116 @@
+#!/bin/python3
+
+"""
+About this Script
+
+Structural checks for one participant, run as each participant is read and before
+any DataFrame is built. Participants that would only fail deep inside parse_responses
+(e.g., no device info, answers without a ping ID) are written to quarantine.jsonl
+with the reasons, so the answer / ping / device stages only ever see well-formed data
+
+The checks cover exactly what the parsing stages index into; anything those stages
+already tolerate (e.g., a missing startTime on one ping) is left alone
+
+Ian Ferguson | Stanford University
+"""
+
+# ----------- Imports
+from . import jsonio
+from .pings import PING_COLUMNS
+
+
+# ----------- Definitions
+QUARANTINE_NAME = "quarantine.jsonl"
+
+# Every ping needs an ID; these must appear on at least one ping (derive_pings selects them)
+PING_FIELDS = PING_COLUMNS[2:]
+
+# Every answer needs these to be pivoted; the rest must appear on at least one answer
+ANSWER_KEYS = ['pingId', 'questionId']
+ANSWER_FIELDS = ['date', 'preferNotToAnswer', 'data']
+
+# Problems reported per participant before the scan moves on
+MAX_PROBLEMS = 5
+
+
+def validate_participant(SUBSET):
+    """
+    SUBSET => Reduced dictionary of participant-only data
+
+    One pass over the participant's pings and answers, no DataFrames
+    Returns list of problems (empty when the participant is well-formed)
+    """
+
+    if not isinstance(SUBSET, dict):
+        return [f"participant is {type(SUBSET).__name__}, not an object"]
+
+    problems = []
+
+    for field in ('pings', 'answers'):
+        if not isinstance(SUBSET.get(field), list):
+            problems.append(f"{field} missing or not a list")
+
+    try:
+        device = SUBSET['user']['installation']['device']
+    except (KeyError, TypeError):
+        device = None
+
+    if not isinstance(device, dict):
+        problems.append("user.installation.device missing or not an object")
+
+    if problems:
+        return problems
+
+    pings, answers = SUBSET['pings'], SUBSET['answers']
+
+    # Nothing answered => parent errors, which only need the raw pings
+    if not answers:
+        return problems
+
+    if not pings:
+        return ["answers but no pings"]
+
+    seen = set()
+
+    for ix, ping in enumerate(pings):
+        if not isinstance(ping, dict) or not isinstance(ping.get('id'), str):
+            problems.append(f"pings[{ix}] has no string id")
+        else:
+            seen.update(ping)
+
+        if len(problems) >= MAX_PROBLEMS:
+            return problems
+
+    problems += [f"no ping has {x}" for x in PING_FIELDS if x not in seen]
+    seen = set()
+
+    for ix, answer in enumerate(answers):
+        if not isinstance(answer, dict):
+            problems.append(f"answers[{ix}] is not an object")
+        else:
+            problems += [f"answers[{ix}] has no string {x}" for x in ANSWER_KEYS
+                         if not isinstance(answer.get(x), str)]
+            seen.update(answer)
+
+        if len(problems) >= MAX_PROBLEMS:
+            return problems[:MAX_PROBLEMS]
+
+    problems += [f"no answer has {x}" for x in ANSWER_FIELDS if x not in seen]
+
+    return problems[:MAX_PROBLEMS]
+
+
+def write_quarantine(OUTGOING, KEY, SUBSET, PROBLEMS, JSON_BACKEND="auto"):
+    """
+    OUTGOING => JSON-lines file object opened in binary mode
+    KEY => Key from JSON file
+    SUBSET => Participant data as read (kept whole, so it can be fixed and replayed)
+    PROBLEMS => List of problems from validate_participant
+    JSON_BACKEND => Encoder to use (see jsonio.BACKENDS)
+
+    Returns nothing, functions inplace
+    """
+
+    record = {"key": KEY, "username": KEY.split('-')[0], "problems": PROBLEMS, "data": SUBSET}
+
+    OUTGOING.write(jsonio.dumps(record, JSON_BACKEND) + b"\n")
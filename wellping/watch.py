@@ -0,0 +1,178 @@
+#!/bin/python3
+
+"""
+About this Script
+
+Watch mode for a drop folder. The directory is polled for Wellping exports; an export
+is parsed once it is complete (same size and modification time for a few polls in a
+row, and the JSON object is closed), then again only when it changes. Parsing happens
+in the same long-running process, so libraries are imported once and outputs are
+updated in place instead of wiped and rebuilt between exports
+
+    * find_exports => Exports currently in the directory (*.json only, so partial downloads are skipped)
+    * ExportWatcher => Tracks each export's size / mtime across polls and what has been parsed
+    * watch_exports => Poll loop that hands every ready export to a parse callback
+
+Ian Ferguson | Stanford University
+"""
+
+# ----------- Imports
+import os
+from time import sleep
+
+from . import jsonio
+
+
+# ----------- Definitions
+WATCH_STATE_NAME = ".watch-state"
+
+
+def find_exports(DIRECTORY):
+    """
+    DIRECTORY => Relative path to the drop folder
+
+    Returns list of export paths, oldest first
+    """
+
+    exports = [os.path.join(DIRECTORY, x) for x in os.listdir(DIRECTORY)
+               if x.endswith(".json") and os.path.isfile(os.path.join(DIRECTORY, x))]
+
+    return sorted(exports, key=os.path.getmtime)
+
+
+def export_signature(PATH):
+    """
+    PATH => Relative path to a Wellping export
+
+    Returns list of [size in bytes, mtime in nanoseconds]
+    """
+
+    stat = os.stat(PATH)
+
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def is_closed(PATH, TAIL=64):
+    """
+    PATH => Relative path to a Wellping export
+    TAIL => Bytes to read from the end of the file
+
+    A complete export is one JSON object ... the last non-whitespace byte is }
+    Returns boolean
+    """
+
+    with open(PATH, "rb") as incoming:
+        incoming.seek(max(os.path.getsize(PATH) - TAIL, 0))
+        return incoming.read().rstrip().endswith(b"}")
+
+
+class ExportWatcher:
+    """
+    Decides which exports in a drop folder are ready to parse. Signatures of parsed
+    exports are kept in DIRECTORY/.watch-state, so a restarted watcher doesn't parse
+    the same export twice
+
+    * DIRECTORY: Relative path to the drop folder
+    * SETTLE: Consecutive polls an export must go unchanged before it is parsed
+    * JSON_BACKEND: Encoder / decoder for the state file (see jsonio.BACKENDS)
+    """
+
+    def __init__(self, DIRECTORY, SETTLE=2, JSON_BACKEND="auto"):
+
+        self.directory = DIRECTORY
+        self.settle = SETTLE
+        self.json_backend = JSON_BACKEND
+        self.state_name = os.path.join(DIRECTORY, WATCH_STATE_NAME)
+
+        self.seen = {}                                                      # Path => [signature, unchanged polls]
+        self.parsed = {}                                                    # Filename => signature when last parsed
+
+        if os.path.exists(self.state_name):
+            with open(self.state_name, "rb") as incoming:
+                self.parsed = jsonio.load(incoming, JSON_BACKEND)
+
+
+    def poll(self):
+        """
+        Returns list of export paths that are complete and new or changed since they were last parsed
+        """
+
+        ready = []
+        exports = find_exports(self.directory)
+
+        # Forget exports that were removed or renamed
+        self.seen = {x: self.seen[x] for x in exports if x in self.seen}
+
+        for path in exports:
+            try:
+                signature = export_signature(path)
+            except FileNotFoundError:
+                continue
+
+            previous, unchanged = self.seen.get(path, (None, 0))
+            unchanged = unchanged + 1 if signature == previous else 0
+            self.seen[path] = [signature, unchanged]
+
+            if signature == self.parsed.get(os.path.basename(path)):
+                continue
+
+            if unchanged >= self.settle and is_closed(path):
+                ready.append(path)
+
+        return ready
+
+
+    def mark(self, PATH):
+        """
+        PATH => Export that was just parsed
+
+        Records the signature it had when parsing started (a write that lands mid-parse
+        changes the signature, so the export is picked up again)
+        """
+
+        self.parsed[os.path.basename(PATH)] = self.seen[PATH][0]
+
+        with open(f"{self.state_name}.tmp", "wb") as outgoing:
+            jsonio.dump(self.parsed, outgoing, self.json_backend)
+
+        os.replace(f"{self.state_name}.tmp", self.state_name)
+
+
+def watch_exports(DIRECTORY, PARSE, INTERVAL=30.0, SETTLE=2, ONCE=False, JSON_BACKEND="auto"):
+    """
+    DIRECTORY => Relative path to the drop folder
+    PARSE => Callable taking the path of one export
+    INTERVAL => Seconds between polls
+    SETTLE => Consecutive unchanged polls before an export counts as fully written
+    ONCE => Boolean, if True return after the first round of parsing (e.g., from cron)
+    JSON_BACKEND => Encoder / decoder for the state file (see jsonio.BACKENDS)
+
+    A failed parse is logged and marked, so it is retried when the export changes
+    rather than on every poll
+    Returns nothing, runs until interrupted
+    """
+
+    watcher = ExportWatcher(DIRECTORY, SETTLE, JSON_BACKEND)
+
+    print(f"\nWatching {DIRECTORY} every {INTERVAL:g}s...\n")
+
+    while True:
+        ready = watcher.poll()
+
+        for path in ready:
+            print(f"\nParsing {os.path.basename(path)}...\n")
+
+            try:
+                PARSE(path)
+                print(f"\nUpdated outputs for {os.path.basename(path)}\n")
+
+            # run_study exits when an export has no usable participants
+            except (Exception, SystemExit) as e:
+                print(f"\nCaught @ {os.path.basename(path)} + watch: {e}\n")
+
+            watcher.mark(path)
+
+        if ONCE and ready:
+            return
+
+        sleep(INTERVAL)